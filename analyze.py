@@ -1,32 +1,32 @@
 #!.venv/bin/python
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from dotenv import load_dotenv
 
 import argparse
+import atexit
 import logging
 import os
 from pathlib import Path
 
-from model import BatchService, DTUJobPosting, JobRepository, JobType, Prompt
-import time
-from json import load
-import openai
-from model import Job, JobList
-import random
-import json
+from model import AnalyzedUriStore, BatchScheduler, BatchService, DTUJobPosting, FetchEngine, HttpCache, JobRepository, Prompt
+from model import RunCheckpoint
+from model import BoilerplateCompactor, FingerprintIndex, Job, JobList, LLMDispatcher, LLMRouter, ModelBudget, Pipeline, ResponseCache, Wave, WavePacker
+from model.llm_router import load_providers
+from model.metrics import metrics
+from model.uri_memory import normalize_uri
+from model.wave_packer import BUDGETS
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Get API keys from environment variables
-deepseek_client = OpenAI(
-    api_key=os.getenv('DEEPSEEK_API_KEY'),
-    base_url="https://api.deepseek.com"
-)
 openai_client = OpenAI(
     api_key=os.getenv('OPENAI_API_KEY')
 )
+openai_async_client = AsyncOpenAI(
+    api_key=os.getenv('OPENAI_API_KEY')
+)
 
 def create_data_directory():
     base_dir = Path(__file__).parent / '.data'
@@ -37,12 +37,6 @@ def create_data_directory():
     for directory in directories:
         directory.mkdir(parents=True, exist_ok=True)
         logging.info(f"Created directory at {directory}")
-    
-    # Create file if does not exist
-    memory_file = Path(__file__).parent / '.data' / 'memory' / 'analyzed_uris.txt'
-    memory_file.parent.mkdir(parents=True, exist_ok=True)
-    if not memory_file.exists():
-        memory_file.touch()
 
     return base_dir
 
@@ -66,89 +60,143 @@ def load_input(file_path: str) -> list[str]:
     with open(file_path, 'r') as file:
         return [line.strip() for line in file]
 
+_analyzed_store: AnalyzedUriStore | None = None
+
+def analyzed_store() -> AnalyzedUriStore:
+    """Return the shared analyzed-URI store, opening (and migrating) it on first use."""
+    global _analyzed_store
+    if _analyzed_store is None:
+        _analyzed_store = AnalyzedUriStore()
+    return _analyzed_store
+
 def check_if_processed(uri: str) -> bool:
-    memory_file = Path(__file__).parent / '.data' / 'memory' / 'analyzed_uris.txt'
-    with open(memory_file, 'r') as f:
-        for line in f:
-            if uri == line.strip():
-                return True
-    return False
+    return uri in analyzed_store()
 
 def add_analyzed_uri(uri: str):
-    memory_file = Path(__file__).parent / '.data' / 'memory' / 'analyzed_uris.txt'
-    with open(memory_file, 'a') as f:
-        f.write(f"{uri}\n")
+    analyzed_store().add(uri)
 
-def process_uris(job_listings: list[str]) -> str:
+def add_analyzed_uris(uris: list[str]):
+    analyzed_store().add_many(uris)
 
+def filter_processed(job_listings: list[str]) -> list[str]:
+    """Drop URIs that were already analyzed with a single bulk lookup."""
+    processed = analyzed_store().contains_many(job_listings)
     for uri in job_listings:
-        if check_if_processed(uri):
+        if uri in processed:
             logging.warning(f"Skipping {uri}: Already processed")
-            job_listings.remove(uri)
-            continue
-    
-    messages = []
-    successful = 0
+    return [uri for uri in job_listings if uri not in processed]
+
+def process_uris(job_listings: list[str], engine: FetchEngine | None = None) -> list[DTUJobPosting]:
+    """Fetch the job listings that were not analyzed yet and return the non-empty postings."""
+
+    job_listings = filter_processed(job_listings)
+
+    postings = []
     failed = 0
     empty = 0
 
+    if engine is None:
+        engine = FetchEngine()
+
+    logging.info(f"Fetching {len(job_listings)} job listings with up to {engine.max_concurrency} concurrent requests")
+    pages = engine.fetch_many(job_listings)
+
     for uri in job_listings:
         try:
-            posting = DTUJobPosting(uri)
-            posting.extract_job_description()
+            posting = DTUJobPosting(uri, engine.cache)
+            html = pages.get(uri)
+            if html is None:
+                # Fall back to the Cloudflare-aware scraper for pages the engine could not get
+                posting.extract_job_description()
+            else:
+                posting.parse_html(html)
 
             if posting.job_description == "" or posting.job_description is None:
                 logging.warning(f"Skipping {uri}: Empty job description")
-                job_listings.remove(uri)
                 empty += 1
                 continue
-            messages.append(posting.to_message())
-            successful += 1
+            postings.append(posting)
             logging.info(f"Successfully processed job listing: {uri}")
-
-            sleep_time = random.randint(60, 300)
-            logging.info(f"Sleeping for {sleep_time} seconds to avoid web scraping rate limits")
-            for i in range(sleep_time, 0, -1):
-                minutes = i // 60
-                seconds = i % 60
-                print(f"\rTime remaining: {minutes}m {seconds}s", end='', flush=True)
-                time.sleep(1)
-            print("\rSleep complete.              ")
         except Exception as e:
             logging.error(f"Failed to process {uri}: {str(e)}")
             failed += 1
             continue
 
-    logging.info(f"Processing summary: {successful} successful, {failed} failed, {empty} empty")
-    
-    if not messages:
-        logging.info("No valid job descriptions found, exiting")
-        return None
-        
-    logging.info(f"Prompting ChatGPT-4o with {len(messages)} messages")
-    
-    try:
-        
-        response = Prompt(client=openai_client).prompt(messages)
-        return response
-    
-    except openai.BadRequestError as e:
-        logging.error(f"Bad Request: {e}")
-    except openai.AuthenticationError as e:
-        logging.error(f"Authentication Error: {e}")
-    except openai.RateLimitError as e:
-        logging.error(f"Rate Limit Exceeded: {e}")
-    except openai.OpenAIError as e:
-        logging.error(f"OpenAI API Error: {e}")
-    except Exception as e:
-        logging.error(f"Unexpected Error: {str(e)}")
+    logging.info(f"Processing summary: {len(postings)} successful, {failed} failed, {empty} empty")
 
-    return None
+    return postings
 
-def save_and_catalog_results(results: str):
+def split_cached(postings: list[DTUJobPosting], models: list[str], cache: ResponseCache | None) -> list[DTUJobPosting]:
+    """Save the postings already answered by any of ``models`` in the response cache and return the rest."""
+    if cache is None:
+        return postings
+
+    misses = []
+    job_repository = JobRepository()
+    cached_uris = []
+    for posting in postings:
+        job = cache.get_any(models, posting.job_description)
+        if job is None:
+            misses.append(posting)
+            continue
+        job_repository.add_job(job)
+        cached_uris.append(posting.uri)
+        logging.info(f"Using cached analysis for {posting.uri}")
+
+    if cached_uris:
+        job_repository.save_jobs()
+        add_analyzed_uris(cached_uris)
+    return misses
+
+def skip_duplicate(posting: DTUJobPosting, fingerprints: FingerprintIndex, packer: WavePacker, keep: bool = False) -> bool:
+    """
+    Fingerprint a posting and tell whether it should be skipped as a near-duplicate
+    of one analyzed before. With ``keep``, duplicates are only logged.
+    A duplicate is only skipped once its canonical posting's jobs are saved: a
+    canonical still in flight may yet fail, which would lose both. Only skipped
+    duplicates are linked to their canonical and count towards the savings.
+    """
+    uri = normalize_uri(posting.uri)
+    duplicate = fingerprints.match(uri, posting.job_description)
+    if duplicate is None:
+        fingerprints.record(uri, posting.job_description)
+        return False
+
+    canonical, similarity = duplicate
+    if keep:
+        reason = "analyzing anyway"
+    elif not check_if_processed(canonical) and canonical not in JobRepository().store:
+        reason = f"analyzing it since {canonical} is not saved yet"
+    else:
+        input_tokens, output_tokens = packer.measure(posting)
+        fingerprints.record(uri, posting.job_description, duplicate, input_tokens + output_tokens)
+        logging.info(f"Skipping {posting.uri}: near-duplicate of {canonical} ({similarity:.0%} similar)")
+        add_analyzed_uri(posting.uri)
+        return True
+
+    fingerprints.record(uri, posting.job_description)
+    fingerprints.flagged += 1
+    logging.info(f"{posting.uri} is a near-duplicate of {canonical} ({similarity:.0%} similar), {reason}")
+    return False
+
+def compact_posting(posting: DTUJobPosting, compactor: BoilerplateCompactor):
+    """Send the model a compacted description of the posting instead of its full text."""
+    if not posting.blocks:
+        return
+    compaction = compactor.compact(posting.blocks)
+    posting.compacted = compaction.text
+    posting.tokens_saved = compaction.saved
+    logging.info(f"Compacted {posting.uri}: {compaction.describe()}")
+
+def save_and_catalog_results(results: str) -> JobList:
 
     # Convert string to JobList object
-    job_list = JobList.model_validate_json(results)
+    try:
+        with metrics.timed("validation"):
+            job_list = JobList.model_validate_json(results)
+    except ValueError:
+        metrics.inc("validation_errors_total")
+        raise
 
     # Initialize Job repositories
     job_repository = JobRepository()
@@ -163,17 +211,143 @@ def save_and_catalog_results(results: str):
 
     logging.info("Successfully saved job data to local repository")
 
+    return job_list
+
+def save_wave(wave: Wave, content: str, model: str, cache: ResponseCache | None = None):
+    """Save the analysis of a wave, remember its postings as analyzed and cache their results."""
+    job_list = save_and_catalog_results(content)
+    add_analyzed_uris(wave.uris)
+    if cache is not None:
+        cache.put_wave(model, wave.postings, job_list)
+
+def save_job(posting: DTUJobPosting | None, job: Job, model: str, cache: ResponseCache | None = None):
+    """Save one streamed job as soon as it is complete, remember its posting as analyzed and cache it."""
+    job_repository = JobRepository()
+    job_repository.add_job(job)
+    job_repository.save_jobs()
+    logging.info(f"Saved streamed job: {job.job_title}")
+    if posting is None:
+        return
+    add_analyzed_uri(posting.uri)
+    if cache is not None:
+        cache.put(model, posting.job_description, job)
+
+def replay_responses(checkpoint: RunCheckpoint):
+    """Save the responses an interrupted run received but did not save."""
+    for uris, content in checkpoint.staged_responses():
+        try:
+            save_and_catalog_results(content)
+        except ValueError as e:
+            logging.error(f"Staged response for {len(uris)} postings is invalid, analyzing them again: {e}")
+            checkpoint.requeue(uris)
+            continue
+        add_analyzed_uris(uris)
+        checkpoint.saved(uris)
+        logging.info(f"Saved the staged response for {len(uris)} postings")
+
+def submit_batches(postings: list[DTUJobPosting], model: str = "gpt-4o",
+                   scheduler: BatchScheduler | None = None) -> list[BatchService]:
+    """Submit one Batch API request per posting, sharded over as many batches as needed."""
+    services = BatchService.create_from_postings(postings, openai_client, model)
+    for service in services:
+        service.upload_batch()
+        if scheduler is not None:
+            scheduler.track(service)
+        logging.info(f"Uploaded batch {service.id} with {len(service.uris())} postings")
+    return services
+
+def save_posting_result(uri: str, content: str) -> bool:
+    """Save the analysis of a single posting and remember it as analyzed."""
+    try:
+        save_and_catalog_results(content)
+        add_analyzed_uri(uri)
+        return True
+    except Exception as e:
+        logging.error(f"Failed to save results for {uri}: {str(e)}")
+        return False
+
+def ingest_batch(service: BatchService) -> list[str]:
+    """
+    Save every posting answered by a completed batch as its record is read and
+    remember it as analyzed. Returns the URIs that failed and should be retried.
+    """
+    saved = 0
+
+    def save(uri: str, content: str) -> bool:
+        nonlocal saved
+        ok = save_posting_result(uri, content)
+        saved += ok
+        return ok
+
+    errors = service.download_results(save)
+
+    retry = [error['uri'] for error in errors if error['uri']]
+    for error in errors:
+        logging.warning(f"Batch {service.id}: request for {error['uri']} failed: {error['error']}")
+    logging.info(f"Batch {service.id}: saved {saved} postings, {len(retry)} to retry")
+
+    if retry:
+        retry_file = BatchService.RESPONSE / f"batch_{service.id}_retry.txt"
+        with open(retry_file, 'w') as f:
+            f.writelines(f"{uri}\n" for uri in retry)
+        logging.info(f"Retry the failed postings with: python analyze.py -f {retry_file} -b")
+
+    return retry
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Job Description Analyzer Bot",
         epilog="Example usage:\n"
-               "  python analyze_jobs.py -f [file path] \n"
-               "  python analyze_jobs.py -b [batch file path] \n",
+               "  python analyze.py -f [file path] \n"
+               "  python analyze.py -f [file path] -b --watch \n"
+               "  python analyze.py --watch \n"
+               "  python analyze.py --collect [batch id] ... \n"
+               "  python analyze.py --export-jobs [directory] \n"
+               "  python analyze.py --snapshot [path] \n",
         formatter_class=argparse.RawTextHelpFormatter
     )
     parser.add_argument('-d', '--debug', action='store_true', help='Enable debug logging')
-    parser.add_argument('-f', '--file', type=str, help='Input file with job URIs', required=True)
+    parser.add_argument('-f', '--file', type=str, help='Input file with job URIs')
+    parser.add_argument('-b', '--batch', action='store_true', help='Submit the postings through the Batch API instead of prompting directly')
+    parser.add_argument('--export-jobs', type=str, nargs='?', const='results/jobs', metavar='DIRECTORY', help='Write every stored job as a JSON file per job type directory (default: results/jobs)')
+    parser.add_argument('--snapshot', type=str, nargs='?', const='results/jobs.snapshot', metavar='PATH', help='Write every stored job to a memory-mappable columnar snapshot (default: results/jobs.snapshot)')
+    parser.add_argument('--collect', type=str, nargs='+', metavar='BATCH_ID', help='Download and save the results of completed batches')
+    parser.add_argument('--watch', action='store_true', help='Poll all tracked batches until their results are saved, resubmitting failed ones')
+    parser.add_argument('--max-concurrency', type=int, default=4, help='Maximum number of job postings fetched at once (default: 4)')
+    parser.add_argument('--rate', type=float, default=0.2, help='Requests per second allowed per host (default: 0.2)')
+    parser.add_argument('--burst', type=int, default=2, help='Requests per host allowed back to back before rate limiting (default: 2)')
+    parser.add_argument('--cache-dir', type=str, help='Directory of the HTTP response cache (default: .data/cache/http)')
+    parser.add_argument('--no-cache', action='store_true', help='Always download job postings, bypassing the cache')
+    parser.add_argument('--fetch-size', type=int, default=20, help='Number of job listings fetched per chunk in batch mode (default: 20)')
+    parser.add_argument('--stream', action='store_true', help='Stream responses and save each job as soon as it is complete; postings a cut-off response left unanswered are sent again')
+    parser.add_argument('--queue-size', type=int, default=20, help='Items allowed to wait between pipeline stages (default: 20)')
+    parser.add_argument('--model', type=str, default='gpt-4o', help='Model used to analyze the postings (default: gpt-4o)')
+    parser.add_argument('--input-budget', type=int, help='Input tokens allowed per wave (default: per model)')
+    parser.add_argument('--output-budget', type=int, help='Expected output tokens allowed per wave (default: per model)')
+    parser.add_argument('--llm-concurrency', type=int, default=4, help='Maximum number of waves sent to the model at once (default: 4)')
+    parser.add_argument('--rpm', type=int, default=500, help='Requests per minute allowed by the model API (default: 500)')
+    parser.add_argument('--tpm', type=int, default=30000, help='Tokens per minute allowed by the model API (default: 30000)')
+    parser.add_argument('--providers', type=str, metavar='NAME[,NAME...]', help='Route waves over these providers (openai, openai-mini, deepseek or ones from --providers-file), cheapest healthy first, instead of --model')
+    parser.add_argument('--providers-file', type=str, help='JSON list of extra or overridden providers: name, model, base_url, api_key_env, limits and prices')
+    parser.add_argument('--hedge-after', type=float, metavar='SECONDS', help='Also send a wave to the next provider when the first has not answered after this long')
+    parser.add_argument('--max-provider-latency', type=float, metavar='SECONDS', help='p90 latency above which a provider counts as unhealthy')
+    parser.add_argument('--dedupe-threshold', type=float, default=0.8, help='Similarity above which a posting is a near-duplicate of an earlier one (default: 0.8)')
+    parser.add_argument('--keep-duplicates', action='store_true', help='Analyze near-duplicates anyway, only logging and linking them')
+    parser.add_argument('--no-dedupe', action='store_true', help='Do not look for near-duplicate postings')
+    parser.add_argument('--max-description-tokens', type=int, default=2000, help='Cap on the tokens of a compacted description; deadline and contact details are always kept (default: 2000)')
+    parser.add_argument('--boilerplate-min-postings', type=int, default=3, help='Postings that must share a paragraph before it is stripped as boilerplate (default: 3)')
+    parser.add_argument('--no-compact', action='store_true', help='Send full descriptions, without stripping boilerplate')
+    parser.add_argument('--no-llm-cache', action='store_true', help='Analyze every posting again, bypassing the response cache')
+    parser.add_argument('--metrics-out', type=str, help='Write run metrics on exit: a JSON report for .json paths, otherwise a Prometheus text file')
+    parser.add_argument('--resume', action='store_true', help='Continue the last direct run where it stopped, reusing the descriptions and responses it staged')
+    parser.add_argument('--llm-cache-ttl', type=float, default=30, help='Days a cached posting analysis stays valid (default: 30)')
     args = parser.parse_args()
+    if not args.file and not args.resume and not args.collect and not args.watch and not args.export_jobs and not args.snapshot:
+        parser.error("one of -f/--file, --resume, --collect, --watch, --export-jobs or --snapshot is required")
+    if args.resume and args.batch:
+        parser.error("--resume continues direct runs; tracked batches are resumed with --watch")
+    if args.providers and args.batch:
+        parser.error("--providers routes direct prompts; the Batch API is OpenAI only")
 
     setup_logging(args.debug)
     logging.info("Starting Job Description Analyzer Bot")
@@ -181,19 +355,174 @@ if __name__ == "__main__":
     data_dir = create_data_directory()
     logging.info(f"Data directory initialized at: {data_dir}")
 
-    job_listings = load_input(args.file)
+    if args.metrics_out:
+        # Every exit path below ends the run, so the report is written whichever is taken
+        atexit.register(metrics.write, args.metrics_out)
 
-    wave_size = 10
-    
-    for i in range(0, len(job_listings), wave_size):
-        wave = job_listings[i:i + wave_size]
-        print()
-        logging.info(f"Processing wave {i//wave_size + 1} with {len(wave)} listings")
-        response = process_uris(wave)
-        if response:
+    if args.export_jobs:
+        exported = JobRepository().export_jobs(args.export_jobs)
+        logging.info(f"Exported {exported} jobs to {args.export_jobs}")
+
+    if args.snapshot:
+        written = JobRepository().export_snapshot(args.snapshot)
+        logging.info(f"Wrote a snapshot of {written} jobs to {args.snapshot}")
+
+    if (args.export_jobs or args.snapshot) and not args.file and not args.collect and not args.watch:
+        raise SystemExit(0)
+
+    scheduler = BatchScheduler(openai_client, save_posting_result)
+
+    if args.collect:
+        for batch_id in args.collect:
+            service = BatchService(batch_id, openai_client)
             try:
-                save_and_catalog_results(response)
-                for uri in wave:
-                    add_analyzed_uri(uri)
+                status = service.refresh().status
+                if status == "completed":
+                    ingest_batch(service)
+                    # Collected here, so --watch must not ingest it again
+                    scheduler.forget(batch_id)
+                elif status in BatchScheduler.RESUBMIT and batch_id in scheduler.batches:
+                    # Its files are needed to resubmit it
+                    logging.error(f"Batch {batch_id} {status}; python analyze.py --watch resubmits it")
+                elif status in BatchScheduler.RESUBMIT:
+                    service._cleanup()
+                    logging.error(f"Batch {batch_id} {status}")
+                else:
+                    logging.info(f"Batch {batch_id} is not completed yet")
             except Exception as e:
-                logging.error(f"Failed to save results: {str(e)}")
\ No newline at end of file
+                logging.error(f"Failed to collect batch {batch_id}: {str(e)}")
+        raise SystemExit(0)
+
+    if not args.file and not args.resume:
+        logging.info(f"Resuming {len(scheduler)} tracked batches")
+        scheduler.run()
+        raise SystemExit(0)
+
+    job_listings = load_input(args.file) if args.file else []
+    cache = None if args.no_cache else HttpCache(args.cache_dir)
+    engine = FetchEngine(max_concurrency=args.max_concurrency, rate=args.rate, burst=args.burst, cache=cache)
+
+    if args.providers:
+        specs = load_providers([name.strip() for name in args.providers.split(',')], args.providers_file)
+        dispatcher = LLMRouter.from_specs(specs, hedge_after=args.hedge_after, max_latency=args.max_provider_latency)
+        budget = dispatcher.budget
+        tokens_per_minute = min(spec.tokens_per_minute for spec in specs)
+        models = dispatcher.models
+    else:
+        dispatcher = LLMDispatcher(openai_async_client, args.model, requests_per_minute=args.rpm,
+                                   tokens_per_minute=args.tpm, max_concurrency=args.llm_concurrency)
+        budget = BUDGETS.get(args.model, BUDGETS["gpt-4o"])
+        tokens_per_minute = args.tpm
+        models = [args.model]
+    budget = ModelBudget(
+        input_tokens=args.input_budget or budget.input_tokens,
+        output_tokens=args.output_budget or budget.output_tokens,
+        max_tokens=budget.max_tokens,
+        output_tokens_per_posting=budget.output_tokens_per_posting
+    )
+    # A wave over the tokens-per-minute limit is rejected by the API however long it waits
+    if (args.input_budget or args.output_budget) and budget.input_tokens + budget.max_tokens > tokens_per_minute:
+        parser.error(f"--input-budget plus the {budget.max_tokens} max_tokens of a wave exceed the "
+                     f"{tokens_per_minute} tokens per minute allowed")
+    try:
+        capped = budget.within(tokens_per_minute)
+    except ValueError as e:
+        parser.error(str(e))
+    if capped is not budget:
+        logging.info(f"Wave budgets lowered to {capped.input_tokens} input and {capped.max_tokens} max output tokens "
+                     f"to fit {tokens_per_minute} tokens per minute")
+        budget = capped
+    # Token counts are estimated for the first (preferred) model
+    packer = WavePacker(models[0], budget, Prompt.SYSTEM_PROMPT)
+    response_cache = None if args.no_llm_cache else ResponseCache(
+        prompt_version=Prompt.PROMPT_VERSION, ttl=args.llm_cache_ttl * 24 * 3600
+    )
+
+    fingerprints = None if args.no_dedupe else FingerprintIndex(threshold=args.dedupe_threshold)
+    compactor = None if args.no_compact else BoilerplateCompactor(
+        min_postings=args.boilerplate_min_postings, max_tokens=args.max_description_tokens, model=models[0]
+    )
+
+    def prepare(posting: DTUJobPosting) -> bool:
+        if compactor is not None:
+            # Every posting counts towards what is boilerplate, even the ones not sent
+            compactor.learn(normalize_uri(posting.uri), posting.blocks)
+        if fingerprints is not None and skip_duplicate(posting, fingerprints, packer, args.keep_duplicates):
+            return False
+        if not split_cached([posting], models, response_cache):
+            return False
+        # Caches and fingerprints key on the full text; only the prompt is compacted
+        if compactor is not None:
+            compact_posting(posting, compactor)
+        return True
+
+    batch_postings = []
+
+    if args.batch:
+        for i in range(0, len(job_listings), args.fetch_size):
+            chunk = job_listings[i:i + args.fetch_size]
+            print()
+            logging.info(f"Fetching listings {i + 1}-{i + len(chunk)} of {len(job_listings)}")
+            postings = process_uris(chunk, engine)
+            if not postings:
+                logging.info("No valid job descriptions found in this chunk")
+                continue
+
+            batch_postings.extend(posting for posting in postings if prepare(posting))
+    else:
+        checkpoint = RunCheckpoint()
+        staged = []
+        if args.resume:
+            if args.file:
+                logging.info(f"Resuming the last run; ignoring {args.file}")
+            logging.info("Resuming: " + ", ".join(f"{count} {state}" for state, count in checkpoint.counts().items()))
+            replay_responses(checkpoint)
+            staged = checkpoint.staged()
+            uris = checkpoint.uris('queued')
+        else:
+            if checkpoint.unfinished():
+                logging.warning(f"Discarding the unfinished last run ({checkpoint.unfinished()} postings left); "
+                                f"use --resume to continue it instead")
+            uris = filter_processed(job_listings)
+            checkpoint.start(uris)
+
+        # Scraping, analysis and saving overlap; a slow stage holds back the ones feeding it
+        pipeline = Pipeline(
+            engine, packer, dispatcher,
+            persist=lambda wave, content: save_wave(wave, content, wave.model or models[0], response_cache),
+            prepare=prepare,
+            max_tokens=budget.max_tokens, queue_size=args.queue_size,
+            persist_job=(lambda posting, job, model: save_job(posting, job, model or models[0], response_cache))
+            if args.stream else None,
+            checkpoint=checkpoint
+        )
+        pipeline.run(uris, staged)
+        if checkpoint.unfinished():
+            logging.warning(f"{checkpoint.unfinished()} postings were not saved; run again with --resume to retry them")
+        checkpoint.close()
+        if isinstance(dispatcher, LLMRouter):
+            for line in dispatcher.describe():
+                logging.info(f"Provider {line}")
+
+    if fingerprints is not None:
+        logging.info(f"Near-duplicates: {fingerprints.found} skipped, saving ~{fingerprints.found_tokens} tokens "
+                     f"(~{fingerprints.tokens_saved()} tokens over all runs), {fingerprints.flagged} analyzed anyway")
+
+    if compactor is not None and compactor.original_tokens:
+        logging.info(f"Compaction: ~{compactor.saved()} of ~{compactor.original_tokens} description tokens removed "
+                     f"({compactor.saved() / compactor.original_tokens:.0%})")
+
+    if response_cache is not None:
+        logging.info(f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses "
+                     f"({response_cache.hit_ratio():.0%} hit ratio)")
+
+    if args.batch and batch_postings:
+        submit_batches(batch_postings, args.model, scheduler)
+        if args.watch:
+            scheduler.run()
+        else:
+            logging.info("Collect the results later with: python analyze.py --watch")
+
+    for model, usage in metrics.to_dict()["models"].items():
+        logging.info(f"{model}: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens, "
+                     f"~${usage['cost_usd']:.4f}")
@@ -0,0 +1,201 @@
+"""
+End-to-end throughput benchmark against local stand-ins for the careers site
+and the OpenAI API (see benchmarks/stand_in.py), so nothing hits the real
+site or spends tokens.
+
+Crawls the stand-in search with fetch_dtu_job_offers, then analyzes every
+posting either through the direct pipeline (fetch, extract, prompt waves,
+save) or, with --batch, through process_uris, BatchService and the batch
+scheduler. Prints latency percentiles per stage and postings per minute.
+Add --stream to stream responses and save every job as it completes.
+Exits with status 1 if not every posting was saved.
+
+All state (analyzed URIs, jobs, cookies, batch files) goes to a temporary
+directory instead of .data and results.
+
+    python -m benchmarks.bench_end_to_end [--pages 10] [--per-page 20] [--llm-latency 0.5] [--rate-limit 0.1] [--tpm 2000000] [--batch]
+                                          [--stream [--truncate 0.2]]
+                                          [--metrics-out run.json]
+"""
+import argparse
+import contextlib
+import functools
+import inspect
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openai import AsyncOpenAI, OpenAI
+
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+import analyze
+import scraper.DTUScraper as DTUScraper
+from model import (AnalyzedUriStore, BatchScheduler, BatchService, DTUJobPosting, FetchEngine, JobStore,
+                   LLMDispatcher, Pipeline, Prompt, SessionPool, WavePacker)
+from model.wave_packer import BUDGETS
+from model import job_store, session_pool
+from model.metrics import metrics
+from benchmarks.stand_in import CareersSite, FakeOpenAI
+
+
+class StageTimer:
+    """Collects the latency of every call to the wrapped functions, per stage."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = {}
+        # When each stage first finished a call, on the perf_counter clock
+        self.first: dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.samples.setdefault(stage, []).append(seconds)
+        self.first.setdefault(stage, time.perf_counter())
+
+    def wrap(self, stage: str, function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    @staticmethod
+    def percentile(samples: list[float], fraction: float) -> float:
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def report(self) -> None:
+        print(f"{'stage':<10}{'calls':>7}{'p50':>11}{'p90':>11}{'p99':>11}{'max':>11}")
+        for stage, samples in self.samples.items():
+            cells = [self.percentile(samples, fraction) * 1000 for fraction in (0.5, 0.9, 0.99)] + [max(samples) * 1000]
+            print(f"{stage:<10}{len(samples):>7}" + "".join(f"{cell:>8.1f} ms" for cell in cells))
+
+
+def isolate(directory: Path) -> None:
+    """Point every store the analyzer uses at ``directory``."""
+    analyze._analyzed_store = AnalyzedUriStore(directory / 'analyzed_uris.db', directory / 'analyzed_uris.txt')
+    job_store._shared_store = JobStore(directory / 'jobs.db', directory / 'jobs')
+    session_pool._shared_pool = SessionPool(cookie_file=directory / 'cookies.json')
+    BatchService.REQUEST = directory / 'batch' / 'request'
+    BatchService.RESPONSE = directory / 'batch' / 'response'
+    BatchService.OBJECT = directory / 'batch' / 'object'
+    for path in (BatchService.REQUEST, BatchService.RESPONSE, BatchService.OBJECT):
+        path.mkdir(parents=True, exist_ok=True)
+
+
+def crawl(site: CareersSite, timer: StageTimer, workers: int, verbose: bool = False) -> list[str]:
+    DTUScraper.fetch_page_html = timer.wrap('crawl', DTUScraper.fetch_page_html)
+    # The scraper prints its progress per page
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        return DTUScraper.fetch_dtu_job_offers(site.search_url, max_workers=workers)
+
+
+def run_direct(uris: list[str], api: FakeOpenAI, timer: StageTimer, args) -> None:
+    engine = FetchEngine(max_concurrency=args.fetch_concurrency, rate=1000, burst=1000)
+    engine.fetch = timer.wrap('fetch', engine.fetch)
+    dispatcher = LLMDispatcher(AsyncOpenAI(api_key='benchmark', base_url=api.base_url),
+                               requests_per_minute=100_000, tokens_per_minute=args.tpm,
+                               max_concurrency=args.llm_concurrency)
+    dispatcher.prompt = timer.wrap('prompt', dispatcher.prompt)
+    dispatcher.stream = timer.wrap('prompt', dispatcher.stream)
+    # As in analyze.py, waves never ask for more tokens than the limit allows per minute
+    packer = WavePacker("gpt-4o", BUDGETS["gpt-4o"].within(args.tpm), Prompt.SYSTEM_PROMPT)
+
+    save = timer.wrap('save', lambda wave, content: analyze.save_wave(wave, content, wave.model))
+    save_job = timer.wrap('save', lambda posting, job, model: analyze.save_job(posting, job, model))
+    pipeline = Pipeline(engine, packer, dispatcher, persist=save, max_tokens=packer.budget.max_tokens,
+                        flush_after=0.5, report_every=3600, persist_job=save_job if args.stream else None)
+    pipeline.run(uris)
+
+
+def run_batch(uris: list[str], api: FakeOpenAI, timer: StageTimer, args, directory: Path) -> None:
+    client = OpenAI(api_key='benchmark', base_url=api.base_url, max_retries=0)
+    engine = FetchEngine(max_concurrency=args.fetch_concurrency, rate=1000, burst=1000)
+    engine.fetch = timer.wrap('fetch', engine.fetch)
+
+    postings = timer.wrap('process', analyze.process_uris)(uris, engine)
+    services = timer.wrap('submit', BatchService.create_from_postings)(postings, client)
+
+    scheduler = BatchScheduler(client, timer.wrap('save', analyze.save_posting_result),
+                               registry=directory / 'batch' / 'registry.json', min_delay=0.2, max_delay=1.0)
+    for service in services:
+        timer.wrap('upload', service.upload_batch)()
+        scheduler.track(service)
+    timer.wrap('batches', scheduler.run)()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='End-to-end benchmark against local stand-in servers')
+    parser.add_argument('--pages', type=int, default=10, help='Search result pages (default: 10)')
+    parser.add_argument('--per-page', type=int, default=20, help='Postings per search page (default: 20)')
+    parser.add_argument('--site-latency', type=float, default=0.02, help='Seconds added to every site request (default: 0.02)')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='Seconds added to every chat completion (default: 0.5)')
+    parser.add_argument('--rate-limit', type=float, default=0.1, help='Share of chat completions answered with a 429 (default: 0.1)')
+    parser.add_argument('--batch-latency', type=float, default=2.0, help='Seconds until a batch completes (default: 2)')
+    parser.add_argument('--crawl-workers', type=int, default=4, help='Search pages fetched at once (default: 4)')
+    parser.add_argument('--fetch-concurrency', type=int, default=8, help='Postings fetched at once (default: 8)')
+    parser.add_argument('--llm-concurrency', type=int, default=4, help='Waves sent at once (default: 4)')
+    parser.add_argument('--tpm', type=int, default=2_000_000,
+                        help='Tokens per minute allowed, per request by the stand-in API too (default: 2000000)')
+    parser.add_argument('--batch', action='store_true', help='Analyze through the Batch API instead of direct prompts')
+    parser.add_argument('--stream', action='store_true', help='Stream responses and save each job as it completes')
+    parser.add_argument('--truncate', type=float, default=0.0, help='Share of streamed responses cut off early (default: 0)')
+    parser.add_argument('--metrics-out', type=str, help='Also write the run metrics (.json report or Prometheus text)')
+    parser.add_argument('-d', '--debug', action='store_true', help='Show the analyzer logs')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.debug else logging.CRITICAL,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    expected = args.pages * args.per_page
+    timer = StageTimer()
+
+    with tempfile.TemporaryDirectory() as directory, \
+            CareersSite(args.pages, args.per_page, args.site_latency) as site, \
+            FakeOpenAI(args.llm_latency, args.rate_limit, batch_latency=args.batch_latency,
+                       truncate_ratio=args.truncate, tokens_per_minute=args.tpm) as api:
+        directory = Path(directory)
+        isolate(directory)
+
+        DTUJobPosting.parse_html = timer.wrap('extract', DTUJobPosting.parse_html)
+        start = time.perf_counter()
+        uris = crawl(site, timer, args.crawl_workers, args.debug)
+        if args.batch:
+            run_batch(uris, api, timer, args, directory)
+        else:
+            run_direct(uris, api, timer, args)
+        elapsed = time.perf_counter() - start
+        saved = len(job_store.shared_store())
+
+    print()
+    print(f"Mode: {'batch' if args.batch else 'direct'}, {len(uris)}/{expected} postings crawled, "
+          f"{saved} saved, {api.counts.get('rate_limited', 0)} rate limited responses")
+    timer.report()
+    print(f"End to end: {elapsed:.1f} s, {saved / elapsed * 60:.0f} postings/minute")
+    if 'save' in timer.first and 'crawl' in timer.first:
+        print(f"First job saved {timer.first['save'] - timer.first['crawl']:.2f} s after the first search page")
+    report = metrics.to_dict()
+    for model, usage in report["models"].items():
+        print(f"{model}: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens, "
+              f"~${usage['cost_usd']:.4f}, {report['retries']['llm']:.0f} LLM retries")
+    if args.metrics_out:
+        metrics.write(args.metrics_out)
+    return 0 if saved == expected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
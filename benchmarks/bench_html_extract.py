@@ -0,0 +1,87 @@
+"""
+Compare the full-tree HTML parsing used before with the targeted extraction in
+model/html_extract.py on recorded fixtures.
+
+Checks that both paths give identical output, then prints the per-page parse
+time of each. Exits with status 1 if any output differs.
+
+    python -m benchmarks.bench_html_extract [--repeat 200]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from model.html_extract import PARSER, extract_job_blocks, extract_job_text, extract_last_page, extract_posting_links
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+BASE_URL = "https://dtu.jobteaser.com"
+
+
+def full_tree_job_text(html: str) -> str:
+    soup = BeautifulSoup(html, 'html.parser')
+    main_content = soup.find('main', id='job-ad-detail-content')
+    if not main_content:
+        return ""
+    return " ".join(main_content.get_text(strip=True, separator=' ').split())
+
+
+def full_tree_posting_links(html: str) -> list[str] | None:
+    soup = BeautifulSoup(html, 'html.parser')
+    results_ul = soup.find('ul', class_=lambda x: x and x.startswith('PageContent_results'))
+    if not results_ul:
+        return None
+    return [BASE_URL + a_tag.get('href') for a_tag in results_ul.find_all('a') if a_tag.get('href')]
+
+
+def full_tree_last_page(html: str) -> int:
+    soup = BeautifulSoup(html, 'html.parser')
+    nav = soup.find('nav', class_=lambda x: x and x.startswith('Pagination_main__'))
+    if nav:
+        last_link = nav.find('a', class_=lambda x: x and 'Pagination_item___last__' in x)
+        if last_link:
+            last_page_text = last_link.get_text()
+            return int(last_page_text) if last_page_text else 1
+    return 1
+
+
+CASES = [
+    ("job description", 'job_posting.html', full_tree_job_text, extract_job_text),
+    # What DTUJobPosting.parse_html sends: the description blocks, joined
+    ("job description blocks", 'job_posting.html', full_tree_job_text, lambda html: " ".join(extract_job_blocks(html))),
+    ("posting links", 'search_results.html', full_tree_posting_links, extract_posting_links),
+    ("last page", 'search_results.html', full_tree_last_page, extract_last_page),
+    # Pages without the target element must give the same empty result
+    ("job description (search page)", 'search_results.html', full_tree_job_text, extract_job_text),
+    ("posting links (job page)", 'job_posting.html', full_tree_posting_links, extract_posting_links),
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark HTML extraction on recorded fixtures')
+    parser.add_argument('--repeat', type=int, default=200, help='Parses per measurement (default: 200)')
+    args = parser.parse_args()
+
+    print(f"Fast path parser backend: {PARSER}")
+    print(f"{'case':<32}{'full tree':>14}{'targeted':>14}{'speedup':>10}")
+
+    mismatches = 0
+    for name, fixture, before, after in CASES:
+        html = (FIXTURES / fixture).read_text(encoding='utf-8')
+
+        if before(html) != after(html):
+            print(f"{name}: OUTPUT MISMATCH\n  full tree: {before(html)!r}\n  targeted:  {after(html)!r}")
+            mismatches += 1
+            continue
+
+        before_ms = min(timeit.repeat(lambda: before(html), number=args.repeat, repeat=3)) / args.repeat * 1000
+        after_ms = min(timeit.repeat(lambda: after(html), number=args.repeat, repeat=3)) / args.repeat * 1000
+        print(f"{name:<32}{before_ms:>11.3f} ms{after_ms:>11.3f} ms{before_ms / after_ms:>9.1f}x")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
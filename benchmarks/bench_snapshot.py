@@ -0,0 +1,98 @@
+"""
+Compare loading the job corpus as one JSON file per job (through pydantic)
+with the memory-mapped columnar snapshot in model/snapshot.py.
+
+Generates a synthetic corpus, checks that every job reads back from the
+snapshot unchanged, then times opening the corpus, a job type + deadline
+scan and a company scan. Exits with status 1 if any job differs.
+
+    python -m benchmarks.bench_snapshot [--jobs 20000]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from model.Job import Job, JobType
+from model.job_store import parse_date
+from model.snapshot import Snapshot, write_snapshot
+
+COMPANIES = ["Novo Nordisk", "Ørsted", "Maersk", "Netcompany", "DTU", "Danske Bank", "Vestas", "Carlsberg"]
+LOCATIONS = ["Bagsværd", "Copenhagen", "Kongens Lyngby", "Aarhus", "Odense"]
+SKILLS = ["Python", "Kubernetes", "Docker", "C#", "C++", ".NET", "Java", "SQL", "Machine Learning", "AWS", "React"]
+
+
+def synthetic_jobs(count: int) -> list[Job]:
+    rng = random.Random(7)
+    return [
+        Job(job_type=rng.choice(list(JobType)), published=f"2025-01-{rng.randint(1, 28):02d}",
+            deadline=f"{rng.randint(1, 28)}.{rng.randint(1, 12)}.2025", start="As soon as possible",
+            contract="Full-time", language=rng.choice(["English", "Danish"]), job_title=f"Engineer {i}",
+            company_name=rng.choice(COMPANIES), location=rng.choice(LOCATIONS),
+            description="Work on data platforms and services. " * rng.randint(3, 12),
+            requirements=[f"Experience with {skill}" for skill in rng.sample(SKILLS, 3)],
+            key_skills=rng.sample(SKILLS, 4), contacts="hr@example.com", cv_photo_details="No photo",
+            apply_uri=f"https://dtu.jobteaser.com/en/job-offers/{i}")
+        for i in range(count)
+    ]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the columnar job snapshot')
+    parser.add_argument('--jobs', type=int, default=20000, help='Synthetic jobs in the corpus (default: 20000)')
+    args = parser.parse_args()
+
+    jobs = synthetic_jobs(args.jobs)
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        files = directory / 'jobs'
+        files.mkdir()
+        for i, job in enumerate(jobs):
+            (files / f"{i}.json").write_text(job.model_dump_json(indent=2), encoding='utf-8')
+        write_snapshot(jobs, directory / 'jobs.snapshot')
+
+        snapshot = Snapshot(directory / 'jobs.snapshot')
+        mismatches = sum(snapshot[i] != job for i, job in enumerate(jobs))
+        snapshot.close()
+        if mismatches:
+            print(f"{mismatches} jobs differ after a snapshot round trip")
+            return 1
+
+        def load_files() -> list[Job]:
+            return [Job.model_validate_json(path.read_text(encoding='utf-8')) for path in files.glob('*.json')]
+
+        corpus, files_ms = timed(load_files)
+        _, files_type_ms = timed(lambda: [job for job in corpus if job.job_type == JobType.SOFTWARE_DEVELOPMENT
+                                          and (parse_date(job.deadline) or "") >= "2025-06-01"])
+        _, files_company_ms = timed(lambda: [job for job in corpus if job.company_name == "Maersk"])
+
+        snapshot, snapshot_ms = timed(lambda: Snapshot(directory / 'jobs.snapshot'))
+
+        def type_and_deadline() -> list[int]:
+            rows = set(snapshot.with_job_type(JobType.SOFTWARE_DEVELOPMENT)) & set(snapshot.deadline_between("2025-06-01"))
+            return sorted(rows)
+
+        rows, snapshot_type_ms = timed(type_and_deadline)
+        matches, snapshot_build_ms = timed(lambda: list(snapshot.jobs(rows)))
+        _, snapshot_company_ms = timed(lambda: snapshot.with_company("Maersk"))
+        snapshot.close()
+
+    print(f"{args.jobs} jobs, {len(matches)} software jobs with a deadline from 2025-06-01")
+    print(f"{'step':<36}{'JSON files':>14}{'snapshot':>14}")
+    print(f"{'open corpus':<36}{files_ms:>11.1f} ms{snapshot_ms:>11.1f} ms")
+    print(f"{'type + deadline scan':<36}{files_type_ms:>11.1f} ms{snapshot_type_ms:>11.1f} ms")
+    print(f"{'build the matching jobs':<36}{'-':>14}{snapshot_build_ms:>11.1f} ms")
+    print(f"{'company scan':<36}{files_company_ms:>11.1f} ms{snapshot_company_ms:>11.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
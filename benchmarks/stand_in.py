@@ -0,0 +1,373 @@
+"""
+Local stand-ins for the careers site and the OpenAI API, for benchmarks.
+
+``CareersSite`` serves search result pages and job postings built from the
+recorded fixtures, with ``pages`` pages of ``per_page`` postings each.
+``FakeOpenAI`` answers chat completions, file uploads, batches and their
+(paginated) listings in the
+shape the OpenAI SDK expects, returning one job per posting. Both add a
+configurable latency to every request, and ``FakeOpenAI`` answers a
+``rate_limit_ratio`` share of chat completions with a 429. Streamed chat
+completions arrive in server-sent events, ``chunk_delay`` apart (other
+completions take as long to generate), and a
+``truncate_ratio`` share of them is cut off as if ``max_tokens`` ran out.
+With ``tokens_per_minute``, a completion whose prompt plus ``max_tokens``
+exceeds it is refused with the API's "request too large" 429.
+"""
+import email.parser
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+SNAPSHOTS = {'gpt-4o': 'gpt-4o-2024-08-06', 'gpt-4o-mini': 'gpt-4o-mini-2024-07-18'}
+
+RESULTS = re.compile(r'(<ul class="PageContent_results__\w+">).*?(</ul></div></li></ul>|</ul>\s*</section>)', re.S)
+LAST_PAGE = re.compile(r'(Pagination_item___last__\w+" href="\?page=)\d+(">)\d+(<)')
+POSTING_PATH = re.compile(r'^/(?:da|en)/job-offers/(\d+)-bench$')
+POSTING_URI = re.compile(r'https?://\S+?/job-offers/\d+-bench')
+
+
+class _Server:
+    def __init__(self, handler: type[BaseHTTPRequestHandler]) -> None:
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stand_in = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def handle(self) -> None:
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request, like a hedged request that lost
+            self.close_connection = True
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        self.send_body(status, json.dumps(payload).encode('utf-8'), 'application/json', headers)
+
+    def send_events(self, events: list[dict], delay: float, headers: dict | None = None) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for event in events:
+            self.wfile.write(b"data: " + json.dumps(event).encode('utf-8') + b"\n\n")
+            self.wfile.flush()
+            time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class _SiteHandler(_Handler):
+    def do_GET(self) -> None:
+        site: CareersSite = self.server.stand_in
+        time.sleep(site.latency)
+        parts = urlsplit(self.path)
+
+        match = POSTING_PATH.match(parts.path)
+        if match:
+            self.send_body(200, site.posting(int(match.group(1))).encode('utf-8'), 'text/html; charset=utf-8')
+        elif parts.path.endswith('/job-offers'):
+            page = int(parse_qs(parts.query).get('page', ['1'])[-1])
+            self.send_body(200, site.search_page(page).encode('utf-8'), 'text/html; charset=utf-8')
+        else:
+            self.send_body(404, b"Not found", 'text/plain')
+
+
+class CareersSite(_Server):
+    """Serves ``pages`` search pages of ``per_page`` distinct postings each."""
+
+    def __init__(self, pages: int = 10, per_page: int = 20, latency: float = 0.0) -> None:
+        super().__init__(_SiteHandler)
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.search_template = (FIXTURES / 'search_results.html').read_text(encoding='utf-8')
+        self.posting_template = (FIXTURES / 'job_posting.html').read_text(encoding='utf-8')
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.url}/da/job-offers?contract=internship"
+
+    def search_page(self, page: int) -> str:
+        cards = "".join(
+            f'<li class="PageContent_resultItem__c1Aa9"><div class="JobAdCard_main__1mI9c">'
+            f'<a class="JobAdCard_link__LMtBN" href="/da/job-offers/{page * 1000 + i}-bench">'
+            f'<h3 class="JobAdCard_title__vdXZ6">Posting {page}.{i}</h3></a></div></li>'
+            for i in range(self.per_page)
+        ) if 1 <= page <= self.pages else ""
+        html = RESULTS.sub(lambda m: m.group(1) + cards + "</ul>", self.search_template, count=1)
+        return LAST_PAGE.sub(lambda m: f"{m.group(1)}{self.pages}{m.group(2)}{self.pages}{m.group(3)}", html, count=1)
+
+    def posting(self, posting_id: int) -> str:
+        # A distinct reference keeps every posting's text unique
+        return self.posting_template.replace(
+            '<section class="JobDescription_section',
+            f'<p>Reference number {posting_id}.</p><section class="JobDescription_section', 1
+        )
+
+
+class _OpenAIHandler(_Handler):
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self) -> None:
+        api: FakeOpenAI = self.server.stand_in
+        body = self._read_body()
+        path = urlsplit(self.path).path
+
+        if path.endswith('/chat/completions'):
+            time.sleep(api.latency)
+            if api.rng.random() < api.rate_limit_ratio:
+                api.count('rate_limited')
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                               "code": "rate_limit_exceeded"}},
+                               {'retry-after-ms': str(int(api.retry_after * 1000)),
+                                'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': f"{api.retry_after}s"})
+                return
+            request = json.loads(body)
+            requested = api.requested_tokens(request)
+            if api.tokens_per_minute is not None and requested > api.tokens_per_minute:
+                api.count('too_large')
+                self.send_json(429, {"error": {
+                    "message": f"Request too large for {request.get('model')} on tokens per min (TPM): "
+                               f"Limit {api.tokens_per_minute}, Requested {requested}.",
+                    "type": "tokens", "code": "rate_limit_exceeded"}})
+                return
+            api.count('completions')
+            headers = {'x-ratelimit-remaining-requests': '10000', 'x-ratelimit-remaining-tokens': '10000000'}
+            if request.get('stream'):
+                self.send_events(api.stream_chunks(request), api.chunk_delay, headers)
+            else:
+                completion = api.completion(request)
+                # As long as streaming the same content would take
+                time.sleep(len(completion["choices"][0]["message"]["content"]) / 32 * api.chunk_delay)
+                self.send_json(200, completion, headers)
+        elif path.endswith('/files'):
+            self.send_json(200, api.upload(self.headers['Content-Type'], body))
+        elif path.endswith('/batches'):
+            self.send_json(200, api.create_batch(json.loads(body)))
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {path}"}})
+
+    def do_GET(self) -> None:
+        api: FakeOpenAI = self.server.stand_in
+        path = urlsplit(self.path).path
+
+        match = re.match(r'.*/files/([\w-]+)/content$', path)
+        if match and match.group(1) in api.files:
+            self.send_body(200, api.files[match.group(1)], 'application/octet-stream')
+            return
+        match = re.match(r'.*/batches/([\w-]+)$', path)
+        if match and match.group(1) in api.batches:
+            self.send_json(200, api.retrieve_batch(match.group(1)))
+            return
+        query = {key: values[-1] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        if path.endswith('/files'):
+            objects = [file for file in api.file_objects.values()
+                       if file["id"] in api.files and query.get('purpose', file["purpose"]) == file["purpose"]]
+            self.send_json(200, api.page(objects, query))
+            return
+        if path.endswith('/batches'):
+            self.send_json(200, api.page([api.retrieve_batch(batch_id) for batch_id in api.batches], query))
+            return
+        self.send_json(404, {"error": {"message": f"Unknown path {path}"}})
+
+    def do_DELETE(self) -> None:
+        api: FakeOpenAI = self.server.stand_in
+        file_id = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        api.files.pop(file_id, None)
+        self.send_json(200, {"id": file_id, "object": "file", "deleted": True})
+
+
+class FakeOpenAI(_Server):
+    """
+    OpenAI-compatible chat completions, files and batches.
+
+    Each posting in a request (recognized by its URI) is answered with one
+    job. Batches complete ``batch_latency`` seconds after they are created.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_ratio: float = 0.0, retry_after: float = 0.2,
+                 batch_latency: float = 1.0, seed: int = 1, chunk_delay: float = 0.002,
+                 truncate_ratio: float = 0.0, tokens_per_minute: int | None = None) -> None:
+        super().__init__(_OpenAIHandler)
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.chunk_delay = chunk_delay
+        self.truncate_ratio = truncate_ratio
+        self.tokens_per_minute = tokens_per_minute
+        self.retry_after = retry_after
+        self.batch_latency = batch_latency
+        self.rng = random.Random(seed)
+        self.files: dict[str, bytes] = {}
+        self.file_objects: dict[str, dict] = {}
+        self.batches: dict[str, dict] = {}
+        self.counts: dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    @staticmethod
+    def requested_tokens(request: dict) -> int:
+        """Tokens a request counts against the limit: its prompt (~4 characters a token) plus max_tokens."""
+        prompt = sum(len(message['content']) for message in request['messages'])
+        return prompt // 4 + (request.get('max_tokens') or 0)
+
+    @staticmethod
+    def job(uri: str) -> dict:
+        return {
+            "job_type": "SOFTWARE_DEVELOPMENT", "published": "03-02-2025", "deadline": "28-02-2025",
+            "start": "As soon as possible", "contract": "Student job", "language": "English",
+            "job_title": "Student Software Developer", "company_name": "Netcompany", "location": "København",
+            "description": "Build software used by millions of Danes.", "requirements": ["Studying computer science"],
+            "key_skills": ["Python", "Java"], "contacts": "", "cv_photo_details": "", "apply_uri": uri,
+        }
+
+    def completion(self, request: dict) -> dict:
+        prompt = "".join(message['content'] for message in request['messages'] if message['role'] == 'user')
+        uris = list(dict.fromkeys(POSTING_URI.findall(prompt)))
+        content = json.dumps({"jobs": [self.job(uri) for uri in uris]})
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": self._id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            # Like the API: the dated snapshot that answered, not the alias requested
+            "model": SNAPSHOTS.get(request.get('model', 'gpt-4o'), request.get('model', 'gpt-4o')),
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                         "message": {"role": "assistant", "content": content, "refusal": None}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def stream_chunks(self, request: dict, size: int = 32) -> list[dict]:
+        """The completion of ``request`` as stream chunks of ``size`` characters of content."""
+        completion = self.completion(request)
+        content = completion["choices"][0]["message"]["content"]
+        finish_reason = "stop"
+        if self.rng.random() < self.truncate_ratio:
+            self.count('truncated')
+            content = content[:int(len(content) * 0.6)]
+            finish_reason = "length"
+
+        def chunk(delta: dict, finish: str | None = None) -> dict:
+            return {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+                    "model": completion["model"],
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish, "logprobs": None}]}
+
+        chunks = [chunk({"role": "assistant", "content": ""})]
+        chunks += [chunk({"content": content[i:i + size]}) for i in range(0, len(content), size)]
+        chunks.append(chunk({}, finish_reason))
+        if (request.get('stream_options') or {}).get('include_usage'):
+            chunks.append({**chunk({}), "choices": [], "usage": completion["usage"]})
+        return chunks
+
+    def upload(self, content_type: str, body: bytes) -> dict:
+        message = email.parser.BytesParser().parsebytes(
+            b"Content-Type: " + content_type.encode('latin-1') + b"\r\n\r\n" + body
+        )
+        file_id = self._id("file")
+        filename, purpose = "upload.jsonl", "batch"
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            if name == 'file':
+                filename = part.get_filename() or filename
+                self.files[file_id] = part.get_payload(decode=True)
+            elif name == 'purpose':
+                purpose = part.get_payload(decode=True).decode()
+        return self.add_file(file_id, filename, purpose)
+
+    def add_file(self, file_id: str, filename: str, purpose: str, created_at: int | None = None) -> dict:
+        self.file_objects[file_id] = {
+            "id": file_id, "object": "file", "bytes": len(self.files.get(file_id, b"")),
+            "created_at": created_at if created_at is not None else int(time.time()), "filename": filename,
+            "purpose": purpose, "status": "processed",
+        }
+        return self.file_objects[file_id]
+
+    @staticmethod
+    def page(objects: list[dict], query: dict) -> dict:
+        """One page of a cursor-paginated list, like the API's ``after`` and ``limit``."""
+        ids = [item["id"] for item in objects]
+        start = ids.index(query['after']) + 1 if query.get('after') in ids else 0
+        limit = int(query.get('limit', 20))
+        data = objects[start:start + limit]
+        return {"object": "list", "data": data, "has_more": start + limit < len(objects),
+                "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None}
+
+    def create_batch(self, request: dict) -> dict:
+        batch = {
+            "id": self._id("batch"), "object": "batch", "endpoint": request['endpoint'],
+            "input_file_id": request['input_file_id'], "completion_window": request['completion_window'],
+            "status": "in_progress", "created_at": int(time.time()), "output_file_id": None,
+            "error_file_id": None, "metadata": request.get('metadata'),
+        }
+        batch["_ready"] = time.monotonic() + self.batch_latency
+        self.batches[batch["id"]] = batch
+        return {key: value for key, value in batch.items() if not key.startswith('_')}
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress" and time.monotonic() >= batch["_ready"]:
+            lines = []
+            for line in self.files[batch["input_file_id"]].splitlines():
+                request = json.loads(line)
+                lines.append(json.dumps({
+                    "id": self._id("batch_req"), "custom_id": request['custom_id'],
+                    "response": {"status_code": 200, "request_id": self._id("req"),
+                                 "body": self.completion(request['body'])},
+                    "error": None,
+                }))
+            output_id = self._id("file")
+            self.files[output_id] = ("\n".join(lines) + "\n").encode('utf-8')
+            self.add_file(output_id, f"{batch_id}_output.jsonl", "batch_output")
+            batch.update(status="completed", output_file_id=output_id, completed_at=int(time.time()))
+        return {key: value for key, value in batch.items() if not key.startswith('_')}
@@ -1,7 +1,16 @@
 from openai import OpenAI
+from openai.types import FileObject
+import argparse
 import datetime
+import fnmatch
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import os
+
+from model.batch_scheduler import BatchScheduler
+from model.batch_service import BatchService
 # Load environment variables
 load_dotenv()
 
@@ -18,19 +27,118 @@ def upload_file():
     except FileNotFoundError:
         print("File not found. Please make sure the filename and path are correct.")
 
+def list_all_files(purpose: str | None = None) -> list[FileObject]:
+    """Every remote file (of ``purpose``), following the list's pagination."""
+    if purpose:
+        return list(client.files.list(purpose=purpose, limit=10000))
+    return list(client.files.list(limit=10000))
+
+def protected_file_ids() -> dict[str, str]:
+    """
+    Return the ids of remote files that batches still need, each with the reason.
+    Batches with local state in .data/batch (a stored batch object, or an entry
+    in the scheduler registry) keep their input, output and error files until
+    their results are ingested. Any other batch that is still running keeps
+    its input file.
+    """
+    protected = {}
+    local_batches = {}
+    for path in BatchService.OBJECT.glob('batch_*.json'):
+        with open(path, 'r') as f:
+            batch = json.load(f)
+        local_batches[batch['id']] = path.stem
+        for key in ('input_file_id', 'output_file_id', 'error_file_id'):
+            if batch.get(key):
+                protected[batch[key]] = f"local batch {path.stem}"
+
+    if BatchScheduler.REGISTRY.exists():
+        with open(BatchScheduler.REGISTRY, 'r') as f:
+            for local_id in json.load(f):
+                if f"batch_{local_id}" not in local_batches.values():
+                    print(f"Warning: tracked batch {local_id} has no stored batch object; its files cannot be protected")
+
+    # The stored objects may predate the output files, so ask for the current ones
+    for batch in client.batches.list(limit=100):
+        if batch.id in local_batches:
+            keys, reason = ('input_file_id', 'output_file_id', 'error_file_id'), f"local batch {local_batches[batch.id]}"
+        elif batch.status in BatchScheduler.IN_FLIGHT:
+            keys, reason = ('input_file_id',), f"{batch.status} batch {batch.id}"
+        else:
+            continue
+        for key in keys:
+            if getattr(batch, key):
+                protected[getattr(batch, key)] = reason
+    return protected
+
+def select_files(files: list[FileObject], purposes: list[str] | None = None, older_than: float | None = None,
+                 min_size: int | None = None, max_size: int | None = None,
+                 pattern: str | None = None) -> list[FileObject]:
+    """Files matching every given filter; ``older_than`` is in days and ``pattern`` a shell-style filename pattern."""
+    cutoff = time.time() - older_than * 86400 if older_than is not None else None
+    return [
+        file for file in files
+        if (not purposes or file.purpose in purposes)
+        and (cutoff is None or file.created_at < cutoff)
+        and (min_size is None or (file.bytes or 0) >= min_size)
+        and (max_size is None or (file.bytes or 0) <= max_size)
+        and (pattern is None or fnmatch.fnmatch(file.filename, pattern))
+    ]
+
+def delete_files(files: list[FileObject], workers: int = 8) -> tuple[list[FileObject], list[tuple[FileObject, Exception]]]:
+    """Delete files concurrently and return the deleted ones and the failures."""
+    deleted, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(client.files.delete, file.id): file for file in files}
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                future.result()
+                deleted.append(file)
+            except Exception as e:
+                failed.append((file, e))
+    return deleted, failed
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def bulk_delete(args) -> int:
+    """Delete every remote file matching the filters, except the ones batches still need."""
+    files = select_files(list_all_files(), args.purpose, args.older_than, args.min_size, args.max_size, args.name)
+    protected = protected_file_ids()
+    kept = [file for file in files if file.id in protected]
+    files = [file for file in files if file.id not in protected]
+
+    for file in kept:
+        print(f"Keeping {file.filename} [{file.id}]: needed by {protected[file.id]}")
+    if args.dry_run:
+        for file in files:
+            print(f"Would delete {file.filename} [{file.id}], {format_bytes(file.bytes or 0)}")
+        print(f"Dry run: {len(files)} files, {format_bytes(sum(file.bytes or 0 for file in files))} would be reclaimed; "
+              f"{len(kept)} kept for batches")
+        return 0
+
+    deleted, failed = delete_files(files, args.workers)
+    for file, e in failed:
+        print(f"Failed to delete {file.filename} [{file.id}]: {e}")
+    print(f"Deleted {len(deleted)} files, reclaimed {format_bytes(sum(file.bytes or 0 for file in deleted))}; "
+          f"{len(kept)} kept for batches, {len(failed)} failed")
+    return 1 if failed else 0
+
 def list_files():
-    response = client.files.list(purpose="file")
-    if len(response.data) == 0:
+    files = list_all_files()
+    if len(files) == 0:
         print("No files found.")
         return
-    for file in response.data:
+    for file in files:
         created_date = datetime.datetime.utcfromtimestamp(file.created_at).strftime('%Y-%m-%d')
         print(f"{file.filename} [{file.id}], Created: {created_date}")
 
 def list_and_delete_file():
     while True:
-        response = client.files.list(purpose="batch_output")
-        files = list(response.data)
+        files = list_all_files(purpose="batch_output")
         if len(files) == 0:
             print("No files found.")
             return
@@ -47,10 +155,11 @@ def list_and_delete_file():
 def delete_all_files():
     confirmation = input("This will delete all OpenAI files with purpose 'batch'.\n Type 'YES' to confirm: ")
     if confirmation == "YES":
-        response = client.files.list(purpose="batch_output")
-        for file in response.data:
-            client.files.delete(file.id)
-        print("All files with purpose 'batch' have been deleted.")
+        protected = protected_file_ids()
+        files = list_all_files(purpose="batch_output")
+        deleted, failed = delete_files([file for file in files if file.id not in protected])
+        print(f"{len(deleted)} files with purpose 'batch' have been deleted, "
+              f"{sum(file.id in protected for file in files)} kept for batches, {len(failed)} failed.")
     else:
         print("Operation cancelled.")
 
@@ -78,4 +187,17 @@ def main():
             print("Invalid choice. Please try again.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage the OpenAI files left by batches; interactive without --bulk')
+    parser.add_argument('--bulk', action='store_true', help='Delete every file matching the filters, without prompting')
+    parser.add_argument('--purpose', nargs='+', help='Only files with these purposes, e.g. batch batch_output')
+    parser.add_argument('--older-than', type=float, metavar='DAYS', help='Only files created more than this many days ago')
+    parser.add_argument('--min-size', type=int, metavar='BYTES', help='Only files of at least this size')
+    parser.add_argument('--max-size', type=int, metavar='BYTES', help='Only files of at most this size')
+    parser.add_argument('--name', type=str, metavar='PATTERN', help="Only files whose name matches this pattern, e.g. 'batch_*.jsonl'")
+    parser.add_argument('--dry-run', action='store_true', help='List what would be deleted and the bytes reclaimed, deleting nothing')
+    parser.add_argument('--workers', type=int, default=8, help='Files deleted at once (default: 8)')
+    args = parser.parse_args()
+
+    if args.bulk:
+        raise SystemExit(bulk_delete(args))
     main()
\ No newline at end of file
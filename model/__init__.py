@@ -3,4 +3,24 @@ from .batch_request import BatchRequest
 from .job_posting import DTUJobPosting
 from .JobRepository import JobRepository
 from .Job import Job, JobType, JobList
-from .prompt import Prompt
\ No newline at end of file
+from .prompt import Prompt
+from .uri_memory import AnalyzedUriStore, normalize_uri
+from .fetch_engine import FetchEngine
+from .session_pool import SessionPool, shared_pool
+from .html_extract import extract_job_text, extract_last_page, extract_posting_links
+from .http_cache import HttpCache
+from .wave_packer import ModelBudget, Wave, WavePacker, estimate_tokens
+from .batch_scheduler import BatchScheduler
+from .response_cache import ResponseCache
+from .llm_dispatcher import LLMDispatcher
+from .pipeline import Pipeline, StageStats
+from .job_store import JobStore, parse_date, shared_store
+from .job_index import JobIndex, QueryError, parse_query
+from .fingerprint import FingerprintIndex, MinHash
+from .snapshot import Snapshot, write_snapshot
+from .metrics import MetricsRegistry, metrics
+from .compaction import BoilerplateCompactor, Compaction
+from .stream_parser import JobStreamParser
+from .llm_router import LLMRouter, Provider, ProviderSpec
+from .crawl_watermark import CrawlResult, CrawlWatermarks
+from .run_checkpoint import RunCheckpoint
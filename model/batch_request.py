@@ -18,6 +18,7 @@ class RequestBody:
     model: str
     messages: List[Message]
     max_tokens: int
+    response_format: Dict[str, Any] | None = None
 
 @dataclass
 class BatchRequest:
@@ -27,12 +28,13 @@ class BatchRequest:
     body: RequestBody
 
     @classmethod
-    def from_messages(cls, id: str, messages: List[Message]) -> 'BatchRequest':
+    def from_messages(cls, id: str, messages: List[Message], model: str = "gpt-4o", max_tokens: int = 16000,
+                      response_format: Dict[str, Any] | None = None) -> 'BatchRequest':
         return BatchRequest(
             id,
             "POST",
             "/v1/chat/completions",
-            RequestBody("gpt-4o", messages, 16000)
+            RequestBody(model, messages, max_tokens, response_format)
         )
 
     @classmethod
@@ -41,7 +43,8 @@ class BatchRequest:
         body = RequestBody(
             model=data['body']['model'],
             messages=messages,
-            max_tokens=data['body']['max_tokens']
+            max_tokens=data['body']['max_tokens'],
+            response_format=data['body'].get('response_format')
         )
         return cls(
             custom_id=data['custom_id'],
@@ -51,15 +54,18 @@ class BatchRequest:
         )
 
     def to_dict(self) -> Dict[str, Any]:
+        body = {
+            'model': self.body.model,
+            'messages': [{'role': msg.role, 'content': msg.content} for msg in self.body.messages],
+            'max_tokens': self.body.max_tokens
+        }
+        if self.body.response_format is not None:
+            body['response_format'] = self.body.response_format
         return {
             'custom_id': self.custom_id,
             'method': self.method,
             'url': self.url,
-            'body': {
-                'model': self.body.model,
-                'messages': [{'role': msg.role, 'content': msg.content} for msg in self.body.messages],
-                'max_tokens': self.body.max_tokens
-            }
+            'body': body
         }
     
     def __str__(self) -> str:
@@ -0,0 +1,197 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from openai import OpenAI
+from openai.types import Batch
+
+from .batch_service import BatchService
+
+
+class BatchScheduler:
+    """
+    Track in-flight batches until their results are ingested.
+
+    Every tracked batch is kept in a registry file under ``.data/batch/object``
+    so a restarted process resumes where it stopped. Due batches are polled
+    concurrently with exponential backoff and jitter. Results are handed to
+    ``on_result(uri, content)`` as soon as a batch completes. Failed, expired
+    or cancelled batches, failed requests and results ``on_result`` could not
+    save (it returns False) are resubmitted up to ``max_attempts`` times.
+
+    Polling runs on worker threads, but results are always ingested on the
+    thread that calls :meth:`poll_once` or :meth:`run`.
+    """
+
+    REGISTRY = BatchService.OBJECT / 'registry.json'
+
+    IN_FLIGHT = {"validating", "in_progress", "finalizing", "cancelling"}
+    RESUBMIT = {"failed", "expired", "cancelled"}
+
+    def __init__(self, client: OpenAI, on_result: Callable[[str, str], bool], registry: Path | None = None,
+                 min_delay: float = 30.0, max_delay: float = 1800.0, max_attempts: int = 3, workers: int = 4) -> None:
+        if client is None:
+            raise ValueError("OpenAI client must be provided")
+
+        self.client = client
+        self.on_result = on_result
+        self.registry = Path(registry) if registry is not None else self.REGISTRY
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self.batches: dict[str, dict] = self._load()
+
+    def _load(self) -> dict[str, dict]:
+        if not self.registry.exists():
+            return {}
+        with open(self.registry, 'r') as f:
+            return json.load(f)
+
+    def _save(self) -> None:
+        """Write the registry atomically so a crash never leaves it half written."""
+        with self._lock:
+            self.registry.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.registry.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(self.batches, f, indent=2)
+            tmp_path.replace(self.registry)
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(0.5, 1.5)
+
+    def track(self, service: BatchService, attempts: int = 1) -> None:
+        """Start tracking an uploaded batch."""
+        self.batches[service.id] = {
+            'status': 'submitted',
+            'attempts': attempts,
+            'delay': self.min_delay,
+            'next_poll': time.time() + self._jittered(self.min_delay),
+        }
+        self._save()
+
+    def forget(self, local_id: str) -> None:
+        """Stop tracking a batch, e.g. after it was collected by hand."""
+        if self.batches.pop(local_id, None) is not None:
+            self._save()
+
+    def __len__(self) -> int:
+        return len(self.batches)
+
+    def _refresh(self, local_id: str) -> Batch | Exception:
+        try:
+            return BatchService(local_id, self.client).refresh()
+        except Exception as e:
+            return e
+
+    def poll_once(self) -> int:
+        """Poll every due batch, ingest or resubmit the finished ones and return how many are still tracked."""
+        now = time.time()
+        due = [local_id for local_id, entry in self.batches.items() if entry['next_poll'] <= now]
+
+        for local_id in [local_id for local_id in due if self.batches[local_id]['status'] == 'pending_upload']:
+            due.remove(local_id)
+            self._upload(BatchService(local_id, self.client), self.batches[local_id]['attempts'])
+
+        if not due:
+            self._save()
+            return len(self.batches)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(zip(due, executor.map(self._refresh, due)))
+
+        for local_id, batch_object in results.items():
+            entry = self.batches[local_id]
+
+            if isinstance(batch_object, Exception):
+                logging.warning(f"Polling batch {local_id} failed: {batch_object}")
+                self._back_off(entry)
+            elif batch_object.status in self.IN_FLIGHT:
+                entry['status'] = batch_object.status
+                self._back_off(entry)
+            elif batch_object.status == "completed" or (batch_object.status == "expired" and batch_object.output_file_id):
+                # Expired batches still return whatever finished within the window
+                try:
+                    self._ingest(local_id, batch_object.status)
+                except Exception as e:
+                    # A failed download or retry upload is tried again later, without ending the polling
+                    logging.error(f"Ingesting batch {local_id} failed: {e}")
+                    self._back_off(entry)
+            elif batch_object.status in self.RESUBMIT:
+                self._resubmit(local_id, batch_object.status)
+            else:
+                logging.warning(f"Batch {local_id} has unknown status {batch_object.status}")
+                self._back_off(entry)
+
+        self._save()
+        return len(self.batches)
+
+    def _back_off(self, entry: dict) -> None:
+        entry['delay'] = min(self.max_delay, entry['delay'] * 2)
+        entry['next_poll'] = time.time() + self._jittered(entry['delay'])
+
+    def _ingest(self, local_id: str, status: str) -> None:
+        service = BatchService(local_id, self.client)
+        attempts = self.batches[local_id]['attempts']
+
+        errors = service.download_results(self.on_result, cleanup=False)
+        logging.info(f"Batch {local_id} {status}: ingested, {len(errors)} requests failed")
+
+        retry_ids = [error['custom_id'] for error in errors if error['uri']]
+        if retry_ids and attempts < self.max_attempts:
+            retry = service.retry_subset(retry_ids)
+            self._upload(retry, attempts + 1)
+        elif retry_ids:
+            logging.error(f"Batch {local_id}: giving up on {len(retry_ids)} requests after {attempts} attempts")
+
+        service._cleanup()
+        del self.batches[local_id]
+
+    def _resubmit(self, local_id: str, status: str) -> None:
+        service = BatchService(local_id, self.client)
+        attempts = self.batches[local_id]['attempts']
+
+        if attempts >= self.max_attempts:
+            logging.error(f"Batch {local_id} {status} after {attempts} attempts, giving up")
+            service._cleanup()
+            del self.batches[local_id]
+            return
+
+        logging.warning(f"Batch {local_id} {status}, resubmitting (attempt {attempts + 1}/{self.max_attempts})")
+        self._upload(service, attempts + 1)
+
+    def _upload(self, service: BatchService, attempts: int) -> None:
+        try:
+            service.upload_batch()
+            self.track(service, attempts)
+        except Exception as e:
+            # Keep it tracked so the next poll tries the upload again
+            logging.error(f"Failed to submit batch {service.id}: {e}")
+            previous = self.batches.get(service.id)
+            delay = min(self.max_delay, previous['delay'] * 2) if previous else self.min_delay
+            self.batches[service.id] = {
+                'status': 'pending_upload',
+                'attempts': attempts,
+                'delay': delay,
+                'next_poll': time.time() + self._jittered(delay),
+            }
+
+    def run(self, stop: threading.Event | None = None) -> None:
+        """Poll until no batches are left or ``stop`` is set."""
+        while self.batches and not (stop and stop.is_set()):
+            self.poll_once()
+            if not self.batches:
+                break
+            wait = max(0.0, min(entry['next_poll'] for entry in self.batches.values()) - time.time())
+            logging.info(f"{len(self.batches)} batches in flight, next poll in {wait:.0f}s")
+            if stop:
+                stop.wait(wait)
+            else:
+                time.sleep(wait)
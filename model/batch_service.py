@@ -3,8 +3,14 @@ import os
 from pathlib import Path
 from openai import OpenAI
 from openai.types import Batch, FileObject
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, Iterator, List
 from .batch_request import BatchRequest, RequestBody, Message
+from .Job import JobList
+from .job_posting import DTUJobPosting
+from .metrics import metrics
+from .prompt import Prompt
+from .uri_memory import normalize_uri
+import hashlib
 import uuid
 
 class BatchService:
@@ -12,6 +18,13 @@ class BatchService:
     RESPONSE = Path(__file__).parent.parent / '.data' / 'batch' / 'response'
     OBJECT = Path(__file__).parent.parent / '.data' / 'batch' / 'object'
 
+    # Download chunk size for batch output files
+    CHUNK_SIZE = 1024 * 1024
+
+    # Batch API input file limits
+    MAX_REQUESTS_PER_FILE = 50_000
+    MAX_FILE_BYTES = 200 * 1024 * 1024
+
     def __init__(self, id: str, client: OpenAI | None = None) -> None:
         if id is None:
             raise ValueError("Batch ID must be provided")
@@ -23,56 +36,95 @@ class BatchService:
 
     @staticmethod
     def __system_setup_message() -> Message:
-        prompt = "From now on, a user request will contain job description information. Each job description is composed of a URI and a description in Danish or English. You should reply with a JSON object for each job description, translate everything to English. Add all Objects on a JSON Array. For each description, a corresponding response should have the following format:\n\n" \
-            '[' \
-            '{' \
-            '"type": "The position type, available values are CYBERSECURITY, SOFTWARE_DEVELOPMENT, IT_CONSULTANT, IT_SUPPORT, CUSTOMER_SERVICE and OTHER",' \
-            '"published": "When the job posting was published, format should be Day-Month Numeric code-Year",' \
-            '"deadline": "Expected deadline to apply for this job",' \
-            '"contractType": "The contract type (full-time, part-time, student job, etc.)",' \
-            '"start": "When the candidate is expected to start",' \
-            '"language": "Original posting language (Danish/English)",' \
-            '"jobTitle": "Position title",' \
-            '"companyName": "Hiring organization",' \
-            '"location": "Job location",' \
-            '"description": "Summarized job description",' \
-            '"requirements": "Described job requirements separated with commas",' \
-            '"keySkills": "Critical skills/keywords to put on CV separated by commas",' \
-            '"contacts": "Relevant recruiter/manager contacts",' \
-            '"cvPhotoRequired": "What is mentioned about having a CV photo",' \
-            '"applyUri": "Original job posting URL"' \
-            '}\n\n' \
-            ']\n\n' \
-        "If some of the information is missing, please write 'Not mentioned'."
-        "You should only reply with the JSON content, without any additional text."
-
-        return Message("system", prompt)
+        # Same instructions as the synchronous path, so both produce a JobList
+        return Message("system", Prompt.SYSTEM_PROMPT)
 
     @staticmethod
-    def create_from_messages(messages: List[Message], client: OpenAI) -> 'BatchService':
-        """Create a new batch service from a list of request objects."""
-        
-        # Generate unique filename
-        requests_id = uuid.uuid4().hex
-        filename = f"batch_{requests_id}.jsonl"
-        
-        # Create request data directory if it doesn't exist
+    def custom_id(uri: str) -> str:
+        """Stable per-posting request id derived from the normalized posting URI."""
+        return "job-" + hashlib.sha1(normalize_uri(uri).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def create_from_postings(postings: List[DTUJobPosting], client: OpenAI, model: str = "gpt-4o",
+                             max_tokens: int = 4000) -> List['BatchService']:
+        """
+        Create batches with one chat request per posting.
+
+        Requests are sharded over as many request files as needed to stay under
+        the Batch API's per-file request count and size limits. Each shard gets a
+        map file from custom_id back to the posting URI.
+        """
         data_path = BatchService.REQUEST
         data_path.mkdir(parents=True, exist_ok=True)
 
-        messages = [BatchService.__system_setup_message()] + messages 
-        request = BatchRequest.from_messages(requests_id, messages)
+        system_message = BatchService.__system_setup_message()
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {"name": "JobList", "schema": JobList.model_json_schema()}
+        }
 
-        # Write requests to file
-        file_path = data_path / filename
-        with open(file_path, 'w') as f:
-            f.write(str(request) + '\n')
-        
-        return BatchService(requests_id, client)
+        services = []
+        shard = None
+
+        def close_shard() -> None:
+            shard['file'].close()
+            with open(data_path / f"batch_{shard['id']}.map.json", 'w') as f:
+                json.dump(shard['uris'], f, indent=2)
+            services.append(BatchService(shard['id'], client))
+
+        seen = set()
+        for posting in postings:
+            custom_id = BatchService.custom_id(posting.uri)
+            # custom_id must be unique, and the same posting twice would be billed twice
+            if custom_id in seen:
+                continue
+            seen.add(custom_id)
+
+            request = BatchRequest.from_messages(custom_id, [system_message, posting.to_message()],
+                                                 model, max_tokens, response_format)
+            line = (str(request) + '\n').encode('utf-8')
+
+            if shard is None or len(shard['uris']) >= BatchService.MAX_REQUESTS_PER_FILE \
+                    or shard['bytes'] + len(line) > BatchService.MAX_FILE_BYTES:
+                if shard is not None:
+                    close_shard()
+                requests_id = uuid.uuid4().hex
+                shard = {
+                    'id': requests_id,
+                    'file': open(data_path / f"batch_{requests_id}.jsonl", 'wb'),
+                    'uris': {},
+                    'bytes': 0
+                }
+
+            shard['file'].write(line)
+            shard['uris'][custom_id] = posting.uri
+            shard['bytes'] += len(line)
+
+        if shard is not None:
+            close_shard()
+
+        return services
 
     def __request_file_path(self) -> str:
         return str(BatchService.REQUEST / f"batch_{self.id}.jsonl")
 
+    def __map_file_path(self) -> str:
+        return str(BatchService.REQUEST / f"batch_{self.id}.map.json")
+
+    def uris(self) -> Dict[str, str]:
+        """Return the custom_id to posting URI map of this batch."""
+        with open(self.__map_file_path(), 'r') as f:
+            return json.load(f)
+
+    def requested_model(self) -> str | None:
+        """The model the requests were submitted with, as opposed to the dated snapshot that answers."""
+        try:
+            with open(self.__request_file_path(), 'r', encoding='utf-8') as f:
+                line = f.readline()
+        except OSError:
+            return None
+        return json.loads(line)['body']['model'] if line.strip() else None
+
     def __object_file_path(self) -> str:
         return str(BatchService.OBJECT / f"batch_{self.id}.json")
     
@@ -84,24 +136,26 @@ class BatchService:
 
         # Upload the file
         try:
-            file_path = self.__request_file_path()
-            file_object: FileObject = self.client.files.create(
-                file=open(file_path, "rb"),
-                purpose="batch"
-            )
-            # Create the batch
-            batch_object: Batch = self.client.batches.create(
-                input_file_id=file_object.id,
-                endpoint="/v1/chat/completions",
-                completion_window="24h",
-                metadata={
-                    "description": "job analysis batch"
-                }
-            )
+            with metrics.timed("batch_upload"):
+                file_path = self.__request_file_path()
+                with open(file_path, "rb") as file:
+                    file_object: FileObject = self.client.files.create(
+                        file=file,
+                        purpose="batch"
+                    )
+                # Create the batch
+                batch_object: Batch = self.client.batches.create(
+                    input_file_id=file_object.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h",
+                    metadata={
+                        "description": "job analysis batch"
+                    }
+                )
             # Save the batch object to a file
             self.__save_batch_object(batch_object)
         except Exception as e:
-            raise Exception(f"Failed to upload batch: {e.message}")
+            raise Exception(f"Failed to upload batch: {e}")
 
     def __load_batch_object(self) -> Batch:
         """Load the batch object from stored file if it exists."""
@@ -113,60 +167,133 @@ class BatchService:
     def __save_batch_object(self, batch_object: Batch) -> None:
         """Save the batch object to a file."""
         batch_object_path = self.OBJECT / f"batch_{self.id}.json"
+        self.OBJECT.mkdir(parents=True, exist_ok=True)
         
         with open(batch_object_path, 'w') as f:
             json.dump(batch_object.to_dict(), f, indent=2)
 
+    def refresh(self) -> Batch:
+        """Retrieve the current batch object from OpenAI and store it."""
+        batch_object = self.__load_batch_object()
+        self.__save_batch_object(batch_object)
+        return batch_object
+
     def status(self) -> bool:
         """Check if the batch is ready. Returns True if batch is completed, False otherwise.
-        Raises exception if batch has failed, expired, or cancelled."""
-        batch_object = self.__load_batch_object()
+        Raises exception if batch has failed, expired, or cancelled. Local files are
+        kept, since a scheduler tracking the batch resubmits it from them."""
+        batch_object = self.refresh()
 
         if batch_object.status in ["failed", "expired", "cancelled"]:
-            self._cleanup()
             raise Exception(f"Batch {batch_object.status}")
-        
-        self.__save_batch_object(batch_object)
 
         return batch_object.status == "completed"
+
+    def retry_subset(self, custom_ids: List[str]) -> 'BatchService':
+        """Create a new batch from the requests of this one with the given custom_ids."""
+        wanted = set(custom_ids)
+        uris = {custom_id: uri for custom_id, uri in self.uris().items() if custom_id in wanted}
+
+        requests_id = uuid.uuid4().hex
+        with open(self.__request_file_path(), 'r', encoding='utf-8') as source, \
+                open(BatchService.REQUEST / f"batch_{requests_id}.jsonl", 'w', encoding='utf-8') as target:
+            for line in source:
+                if line.strip() and json.loads(line)['custom_id'] in wanted:
+                    target.write(line)
+        with open(BatchService.REQUEST / f"batch_{requests_id}.map.json", 'w') as f:
+            json.dump(uris, f, indent=2)
+
+        return BatchService(requests_id, self.client)
     
     def _cleanup(self) -> None:
-        """Remove the request and object files."""
+        """Remove the request, map and object files."""
         request_file = Path(self.__request_file_path())
+        map_file = Path(self.__map_file_path())
         object_file = Path(self.__object_file_path())
 
         if request_file.exists():
             request_file.unlink()
+        if map_file.exists():
+            map_file.unlink()
         if object_file.exists():
             object_file.unlink()
 
-    def download_results(self) -> str:
-        """Retrieve the batch results and store them in a text file.
-        Returns the path to the results file."""
+    def __download_file(self, file_id: str, path: Path) -> None:
+        """Stream a remote file to disk in chunks."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with metrics.timed("batch_download"), self.client.files.with_streaming_response.content(file_id) as response:
+            with open(path, 'wb') as f:
+                for chunk in response.iter_bytes(self.CHUNK_SIZE):
+                    f.write(chunk)
+
+    @staticmethod
+    def __iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+        """Yield the JSONL records of a downloaded file one at a time."""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def download_results(self, on_result: Callable[[str, str], bool], cleanup: bool = True) -> List[Dict[str, Any]]:
+        """
+        Stream the batch output to disk and hand each successful response content
+        to ``on_result(uri, content)`` as soon as its record is read. It returns
+        whether the content could be saved.
+
+        Returns the failed postings for retry, as records with ``custom_id``,
+        ``uri`` and ``error``. They include errored requests, responses that
+        ``on_result`` could not save and requests that are missing from the output. Keep the local files with ``cleanup=False``
+        to build a retry batch with :meth:`retry_subset`.
+        """
         batch_object = self.__load_batch_object()
-        file_response = self.client.files.content(batch_object.output_file_id)
-        
-        # Create results file
-        response_filename = f"batch_{self.id}_response.json"
-        response_path = self.RESPONSE / response_filename
-        
-        # Read the content of the file response
-        results = file_response.read().decode('utf-8')
+        uris = self.uris()
+        # Metrics and prices use the requested model name, as the direct paths do
+        requested_model = self.requested_model()
+        answered = set()
+        errors = []
+
+        if batch_object.output_file_id:
+            output_path = self.RESPONSE / f"batch_{self.id}_response.jsonl"
+            self.__download_file(batch_object.output_file_id, output_path)
 
-        # Parse the JSON string and extract the message content
-        parsed_results = json.loads(results)
-        message_content = parsed_results['response']['body']['choices'][0]['message']['content']
+            for record in self.__iter_records(output_path):
+                custom_id = record.get('custom_id')
+                answered.add(custom_id)
+                response = record.get('response') or {}
 
-        # Remove the first and last line of the message content
-        message_lines = message_content.split('\n')
-        if len(message_lines) > 2:
-            message_content = '\n'.join(message_lines[1:-1])
+                body = response.get('body') or {}
+                model = requested_model or body.get('model', "unknown")
 
-        # Write the message content to the response file
-        with open(response_path, 'w') as f:
-            f.write(message_content)
+                if record.get('error') or response.get('status_code') != 200:
+                    error = record.get('error') or body.get('error')
+                    errors.append({'custom_id': custom_id, 'uri': uris.get(custom_id), 'error': error})
+                    metrics.inc("llm_requests_total", model=model, api="batch", outcome="error")
+                    continue
+                metrics.inc("llm_requests_total", model=model, api="batch", outcome="ok")
+                metrics.record_usage(model, body.get('usage'), api="batch")
+                if custom_id not in uris:
+                    continue
+
+                if not on_result(uris[custom_id], body['choices'][0]['message']['content']):
+                    errors.append({'custom_id': custom_id, 'uri': uris[custom_id], 'error': 'invalid content'})
+
+        if batch_object.error_file_id:
+            error_path = self.RESPONSE / f"batch_{self.id}_errors.jsonl"
+            self.__download_file(batch_object.error_file_id, error_path)
+
+            for record in self.__iter_records(error_path):
+                custom_id = record.get('custom_id')
+                answered.add(custom_id)
+                response = record.get('response') or {}
+                error = record.get('error') or response.get('body', {}).get('error')
+                errors.append({'custom_id': custom_id, 'uri': uris.get(custom_id), 'error': error})
+
+        for custom_id, uri in uris.items():
+            if custom_id not in answered:
+                errors.append({'custom_id': custom_id, 'uri': uri, 'error': 'missing from batch output'})
 
         # Cleanup the request and object files
-        self._cleanup()
+        if cleanup:
+            self._cleanup()
         
-        return response_path
\ No newline at end of file
+        return errors
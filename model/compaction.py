@@ -0,0 +1,184 @@
+import hashlib
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+
+from .metrics import metrics
+from .wave_packer import estimate_tokens
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=[A-ZÆØÅ0-9"(])')
+
+MONTHS = (r'jan(?:uary|uar)?|feb(?:ruary|ruar)?|mar(?:ch|ts)?|apr(?:il)?|ma[iy]|jun[ei]?|jul[iy]?|aug(?:ust)?'
+          r'|sep(?:tember)?|o[ck]t(?:ober)?|nov(?:ember)?|dec(?:ember)?')
+# Blocks the model needs for the deadline, start, publication and contact fields; never dropped
+PROTECTED = re.compile(
+    r'deadline|ans[øo]gningsfrist|\bfrist|apply (?:by|before)|s[øo]g senest|published|udgivet|\bstart|tiltr[æa]delse'
+    r'|contact|kontakt|e-?mail|phone|telefon|\btlf|@|\+\d{2}\s?\d'
+    r'|\b\d{1,2}[./-]\d{1,2}[./-]\d{2,4}\b|\b\d{1,2}\.?\s+(?:' + MONTHS + r')\w*\.?\s+\d{4}\b',
+    re.IGNORECASE
+)
+
+
+def normalize_block(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def block_hash(text: str) -> int:
+    digest = hashlib.blake2b(normalize_block(text).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+def sentences(text: str) -> list[str]:
+    return [sentence for sentence in SENTENCE_END.split(text) if sentence]
+
+
+@dataclass
+class Compaction:
+    """The compacted description of a posting and what was taken out."""
+    text: str
+    original_tokens: int
+    tokens: int
+    boilerplate_blocks: int = 0
+    duplicate_sentences: int = 0
+    truncated_blocks: int = 0
+
+    @property
+    def saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+    def describe(self) -> str:
+        reduction = self.saved / self.original_tokens if self.original_tokens else 0.0
+        return (f"~{self.original_tokens} -> ~{self.tokens} tokens ({reduction:.0%} less): "
+                f"{self.boilerplate_blocks} boilerplate blocks, {self.duplicate_sentences} repeated sentences, "
+                f"{self.truncated_blocks} blocks over the length cap")
+
+
+class BoilerplateCompactor:
+    """
+    Shrink job descriptions before they are sent to the model.
+
+    Every posting's blocks (paragraphs, list items) are recorded in SQLite. A
+    block of at least ``min_words`` words that ``min_postings`` different
+    postings share, like a company's "about us" text, benefits or cookie
+    notices, is boilerplate: only its first sentence is kept, so the company
+    stays named. A posting whose blocks are mostly shared (over
+    ``max_shared``) is a variant of one template, like a company's series of
+    similar roles, rather than unique text wrapped in boilerplate, so nothing
+    is stripped from it. Sentences repeated within a posting are dropped, and
+    blocks past ``max_tokens`` are left out. Blocks that mention deadlines,
+    dates, start or contact details are always kept whole.
+    """
+
+    DATABASE = Path(__file__).parent.parent / '.data' / 'memory' / 'boilerplate.db'
+
+    def __init__(self, path: Path | None = None, min_postings: int = 3, min_words: int = 6,
+                 max_tokens: int = 2000, max_shared: float = 0.5, model: str = "gpt-4o") -> None:
+        if min_postings < 2:
+            raise ValueError("A block must be shared by at least 2 postings to be boilerplate")
+
+        self.path = Path(path) if path is not None else self.DATABASE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.min_postings = min_postings
+        self.min_words = min_words
+        self.max_tokens = max_tokens
+        self.max_shared = max_shared
+        self.model = model
+        # Totals of this instance, for the end of run report
+        self.original_tokens = 0
+        self.tokens = 0
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "hash INTEGER PRIMARY KEY, "
+            "postings INTEGER NOT NULL DEFAULT 0, "
+            "sample TEXT NOT NULL"
+            ")"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS block_postings ("
+            "hash INTEGER NOT NULL, "
+            "uri TEXT NOT NULL, "
+            "PRIMARY KEY (hash, uri)"
+            ") WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def learn(self, uri: str, blocks: list[str]) -> None:
+        """Count the blocks of a posting; a posting seen before is not counted twice."""
+        candidates = {block_hash(block): block for block in blocks if len(block.split()) >= self.min_words}
+        with self.connection:
+            for digest, block in candidates.items():
+                added = self.connection.execute(
+                    "INSERT OR IGNORE INTO block_postings (hash, uri) VALUES (?, ?)", (digest, uri)
+                ).rowcount
+                if added:
+                    self.connection.execute(
+                        "INSERT INTO blocks (hash, postings, sample) VALUES (?, 1, ?) "
+                        "ON CONFLICT (hash) DO UPDATE SET postings = postings + 1", (digest, block)
+                    )
+
+    def boilerplate(self, blocks: list[str]) -> set[int]:
+        """Hashes of the given blocks that enough postings share, or none for a template variant."""
+        digests = list({block_hash(block) for block in blocks if len(block.split()) >= self.min_words})
+        if not digests:
+            return set()
+        placeholders = ", ".join("?" * len(digests))
+        rows = self.connection.execute(
+            f"SELECT hash FROM blocks WHERE postings >= ? AND hash IN ({placeholders})", (self.min_postings, *digests)
+        )
+        shared = {digest for (digest,) in rows}
+        return shared if len(shared) <= self.max_shared * len(digests) else set()
+
+    def compact(self, blocks: list[str]) -> Compaction:
+        """Compact the blocks of one posting (learn the corpus first with :meth:`learn`)."""
+        original_tokens = estimate_tokens("\n".join(blocks), self.model)
+        shared = self.boilerplate(blocks)
+        seen: set[str] = set()
+        kept: list[str] = []
+        used = 0
+        result = Compaction("", original_tokens, 0)
+
+        for block in blocks:
+            protected = PROTECTED.search(block) is not None
+            parts = sentences(block)
+            if not protected and block_hash(block) in shared:
+                result.boilerplate_blocks += 1
+                if len(parts) == 1:
+                    continue
+                parts = parts[:1]
+
+            unique = []
+            for sentence in parts:
+                key = normalize_block(sentence)
+                if key in seen and len(sentence.split()) >= 3:
+                    result.duplicate_sentences += 1
+                    continue
+                seen.add(key)
+                unique.append(sentence)
+            if not unique:
+                continue
+
+            text = " ".join(unique)
+            tokens = estimate_tokens(text, self.model)
+            if not protected and used + tokens > self.max_tokens:
+                result.truncated_blocks += 1
+                continue
+            used += tokens
+            kept.append(text)
+
+        result.text = "\n".join(kept)
+        result.tokens = estimate_tokens(result.text, self.model)
+        self.original_tokens += result.original_tokens
+        self.tokens += result.tokens
+        metrics.inc("compaction_tokens_total", result.original_tokens, kind="original")
+        metrics.inc("compaction_tokens_total", result.tokens, kind="compacted")
+        return result
+
+    def saved(self) -> int:
+        """Tokens taken out of the descriptions compacted by this instance."""
+        return self.original_tokens - self.tokens
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,152 @@
+import hashlib
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .uri_memory import normalize_uri
+
+
+def search_key(url: str) -> str:
+    """The search a results page belongs to: its URL without the page number."""
+    parts = urlsplit(url)
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != 'page'])
+    return normalize_uri(urlunsplit(parts._replace(query=query)), keep_query=True, keep_locale=True)
+
+
+def card_hash(text: str) -> int:
+    digest = hashlib.blake2b(" ".join(text.split()).casefold().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+@dataclass
+class CrawlResult:
+    """What a crawl of one search found, compared to the crawls before it."""
+    full: bool
+    pages: int = 0
+    # Postings never listed in this search before
+    new: list[str] = field(default_factory=list)
+    # Postings listed before whose card (title, company, tags) changed
+    edited: list[str] = field(default_factory=list)
+    # Postings a full crawl no longer found
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def urls(self) -> list[str]:
+        return self.new + self.edited
+
+
+class CrawlWatermarks:
+    """
+    SQLite memory of the postings each search listed, and when it was crawled.
+
+    For every search URL it keeps the postings seen (with a hash of their
+    search card, to notice edits) and the times of the last crawl and the
+    last full crawl.
+    """
+
+    DATABASE = Path(__file__).parent.parent / '.data' / 'memory' / 'crawl_watermarks.db'
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = Path(path) if path is not None else self.DATABASE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            "search TEXT PRIMARY KEY, "
+            "last_crawl REAL, "
+            "last_full_crawl REAL"
+            ") WITHOUT ROWID"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS search_postings ("
+            "search TEXT NOT NULL, "
+            "uri TEXT NOT NULL, "
+            "original TEXT NOT NULL, "
+            "card INTEGER NOT NULL, "
+            "first_seen REAL NOT NULL, "
+            "last_seen REAL NOT NULL, "
+            "PRIMARY KEY (search, uri)"
+            ") WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def _times(self, url: str) -> tuple[float | None, float | None]:
+        row = self.connection.execute(
+            "SELECT last_crawl, last_full_crawl FROM searches WHERE search = ?", (search_key(url),)
+        ).fetchone()
+        return row if row is not None else (None, None)
+
+    def last_crawl(self, url: str) -> float | None:
+        return self._times(url)[0]
+
+    def last_full_crawl(self, url: str) -> float | None:
+        return self._times(url)[1]
+
+    def full_crawl_due(self, url: str, full_every: float | None = None) -> bool:
+        """Whether the search was never crawled in full, or not within ``full_every`` seconds."""
+        last_full_crawl = self.last_full_crawl(url)
+        if last_full_crawl is None:
+            return True
+        return full_every is not None and time.time() - last_full_crawl >= full_every
+
+    def known(self, url: str) -> int:
+        """Number of postings remembered for the search."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM search_postings WHERE search = ?", (search_key(url),)
+        ).fetchone()[0]
+
+    def observe(self, url: str, cards: list[tuple[str, str]]) -> tuple[list[str], list[str]]:
+        """Record the (link, card text) of a results page and return its new and edited links."""
+        search = search_key(url)
+        now = time.time()
+        new, edited = [], []
+        with self.connection:
+            for link, text in cards:
+                uri = normalize_uri(link)
+                digest = card_hash(text)
+                row = self.connection.execute(
+                    "SELECT card FROM search_postings WHERE search = ? AND uri = ?", (search, uri)
+                ).fetchone()
+                if row is None:
+                    new.append(link)
+                    self.connection.execute(
+                        "INSERT INTO search_postings (search, uri, original, card, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", (search, uri, link, digest, now, now)
+                    )
+                    continue
+                if row[0] != digest:
+                    edited.append(link)
+                self.connection.execute(
+                    "UPDATE search_postings SET card = ?, original = ?, last_seen = ? WHERE search = ? AND uri = ?",
+                    (digest, link, now, search, uri)
+                )
+        return new, edited
+
+    def finish(self, url: str, started: float, full: bool) -> list[str]:
+        """
+        Record a completed crawl that started at ``started``. After a full
+        crawl, postings it did not see are forgotten and returned as removed.
+        """
+        search = search_key(url)
+        removed = []
+        with self.connection:
+            if full:
+                removed = [original for (original,) in self.connection.execute(
+                    "SELECT original FROM search_postings WHERE search = ? AND last_seen < ?", (search, started)
+                )]
+                self.connection.execute(
+                    "DELETE FROM search_postings WHERE search = ? AND last_seen < ?", (search, started)
+                )
+            self.connection.execute(
+                "INSERT INTO searches (search, last_crawl, last_full_crawl) VALUES (?, ?, ?) "
+                "ON CONFLICT (search) DO UPDATE SET last_crawl = excluded.last_crawl, "
+                "last_full_crawl = COALESCE(excluded.last_full_crawl, last_full_crawl)",
+                (search, started, started if full else None)
+            )
+        return removed
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import random
+from typing import Iterable
+from urllib.parse import urlsplit
+
+import httpx
+
+from .http_cache import HttpCache
+from .metrics import metrics
+from .rate_limit import TokenBucket
+
+
+class FetchEngine:
+    """
+    Concurrent HTML fetcher for job postings.
+
+    Requests run on a shared HTTP/2 client, capped at ``max_concurrency`` in
+    flight overall and ``rate`` requests per second (bursting up to ``burst``)
+    for each host. The per-host budget replaces the old fixed sleep between
+    postings. With a ``cache``, requests are conditional and 304s are served
+    from disk.
+    """
+
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:135.0) Gecko/20100101 Firefox/135.0',
+        'Accept': 'text/html, text/plain',
+        'Accept-Language': 'en-US,en;q=0.5',
+    }
+
+    # Statuses worth retrying; anything else that is not 200 fails immediately
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_concurrency: int = 4, rate: float = 0.2, burst: int = 2,
+                 retries: int = 3, timeout: float = 30.0, cache: HttpCache | None = None) -> None:
+        if max_concurrency < 1:
+            raise ValueError("Max concurrency must be at least 1")
+
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.timeout = timeout
+        self.cache = cache
+        self.buckets: dict[str, TokenBucket] = {}
+
+    def _bucket(self, uri: str) -> TokenBucket:
+        host = urlsplit(uri).netloc.lower()
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    async def fetch(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, uri: str) -> str | None:
+        """Fetch one page on ``client``, returning None if it could not be fetched."""
+        bucket = self._bucket(uri)
+        conditional = self.cache is not None
+
+        for attempt in range(self.retries):
+            if attempt:
+                metrics.inc("http_retries_total", source="engine")
+            headers = self.cache.conditional_headers(uri) if conditional else {}
+            await bucket.acquire()
+            async with semaphore:
+                try:
+                    with metrics.timed("fetch", source="engine"):
+                        response = await client.get(uri, headers=headers)
+                except httpx.HTTPError as e:
+                    logging.warning(f"Fetch of {uri} failed (attempt {attempt + 1}/{self.retries}): {e}")
+                    response = None
+
+            if response is not None:
+                metrics.inc("http_requests_total", source="engine", status=response.status_code)
+                if response.status_code == 304 and conditional:
+                    cached = self.cache.load(uri)
+                    if cached is not None:
+                        metrics.inc("http_cache_total", result="hit")
+                        body, encoding = cached
+                        return body.decode(encoding or 'utf-8', errors='replace')
+                    # Validators without a body: ask again unconditionally
+                    conditional = False
+                    continue
+                if response.status_code == 200:
+                    if self.cache is not None:
+                        metrics.inc("http_cache_total", result="miss")
+                        self.cache.store(uri, response.content, response.headers.get('ETag'),
+                                         response.headers.get('Last-Modified'), response.encoding)
+                    return response.text
+                logging.warning(f"Fetch of {uri} returned HTTP {response.status_code} (attempt {attempt + 1}/{self.retries})")
+                if response.status_code not in self.RETRY_STATUSES:
+                    return None
+
+            # Back off before trying again, on top of the host budget
+            await asyncio.sleep(2 ** attempt + random.random())
+
+        return None
+
+    def open_client(self) -> httpx.AsyncClient:
+        """Create the HTTP/2 client fetches are made on; use it as an async context manager."""
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        return httpx.AsyncClient(http2=True, headers=self.HEADERS, limits=limits,
+                                 timeout=self.timeout, follow_redirects=True)
+
+    async def fetch_many_async(self, uris: Iterable[str]) -> dict[str, str | None]:
+        """Fetch all ``uris`` concurrently. Failed fetches map to None."""
+        uris = list(dict.fromkeys(uris))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self.open_client() as client:
+            pages = await asyncio.gather(*(self.fetch(client, semaphore, uri) for uri in uris))
+
+        return dict(zip(uris, pages))
+
+    def fetch_many(self, uris: Iterable[str]) -> dict[str, str | None]:
+        """Blocking wrapper around :meth:`fetch_many_async`."""
+        return asyncio.run(self.fetch_many_async(uris))
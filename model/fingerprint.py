@@ -0,0 +1,226 @@
+import hashlib
+import random
+import re
+import sqlite3
+from array import array
+from pathlib import Path
+
+from .metrics import metrics
+
+WORD = re.compile(r"\w+")
+
+# Modulus of the permutation hashes, a Mersenne prime above the 64-bit shingle hashes
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def shingles(text: str, size: int = 5) -> set[str]:
+    """Overlapping ``size``-word shingles of the normalized text."""
+    words = WORD.findall(text.casefold())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class MinHash:
+    """MinHash signatures whose agreement estimates the Jaccard similarity of shingle sets."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, text: str) -> array:
+        hashes = [_hash(shingle) for shingle in shingles(text)]
+        if not hashes:
+            return array('Q', [MERSENNE_PRIME] * self.num_perm)
+        return array('Q', (min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations))
+
+    @staticmethod
+    def similarity(left: array, right: array) -> float:
+        return sum(x == y for x, y in zip(left, right)) / len(left)
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """
+    Pick the LSH band count and rows per band. The candidate threshold of
+    ``b`` bands of ``r`` rows is about ``(1/b) ** (1/r)``; the largest ``r``
+    that stays at or below ``threshold`` keeps recall high while filtering
+    out most unrelated postings before their signatures are compared.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class FingerprintIndex:
+    """
+    Persistent near-duplicate index of job descriptions.
+
+    Every description is reduced to a MinHash signature over its word
+    shingles, and split into LSH bands whose buckets are stored in SQLite, so
+    re-posted and lightly edited postings are found across runs without
+    comparing against every earlier posting. A posting whose estimated
+    similarity to an indexed one reaches ``threshold`` is a duplicate of that
+    (canonical) posting. :meth:`match` only looks it up; :meth:`record` indexes
+    a posting, linking it to its canonical when it was skipped as a duplicate.
+    """
+
+    DATABASE = Path(__file__).parent.parent / '.data' / 'memory' / 'fingerprints.db'
+
+    def __init__(self, path: Path | None = None, threshold: float = 0.8, num_perm: int = 128) -> None:
+        if not 0 < threshold <= 1:
+            raise ValueError("Threshold must be in (0, 1]")
+
+        self.path = Path(path) if path is not None else self.DATABASE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.minhash = MinHash(num_perm)
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        # Duplicates skipped by this instance and what analyzing them would have cost
+        self.found = 0
+        self.found_tokens = 0
+        # Duplicates found but analyzed anyway (kept, or their canonical was not saved yet)
+        self.flagged = 0
+        # The signature of the last text matched, so recording it does not hash it again
+        self._last: tuple[str, array] | None = None
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "uri TEXT PRIMARY KEY, "
+            "signature BLOB NOT NULL, "
+            "canonical TEXT, "
+            "similarity REAL, "
+            "tokens INTEGER NOT NULL DEFAULT 0, "
+            "added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP"
+            ")"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "rows INTEGER NOT NULL, "
+            "band INTEGER NOT NULL, "
+            "bucket INTEGER NOT NULL, "
+            "uri TEXT NOT NULL, "
+            "PRIMARY KEY (rows, band, bucket, uri)"
+            ") WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS buckets_uri ON buckets (uri)")
+        self.connection.commit()
+        self._rebucket()
+
+    def _rebucket(self) -> None:
+        """Bucket the originals indexed under a different threshold (and so a different banding)."""
+        rows = self.connection.execute(
+            "SELECT uri, signature FROM fingerprints WHERE canonical IS NULL "
+            "AND uri NOT IN (SELECT uri FROM buckets WHERE rows = ?)", (self.rows,)
+        ).fetchall()
+        with self.connection:
+            for uri, signature in rows:
+                self._insert_buckets(uri, array('Q', signature))
+
+    def _insert_buckets(self, uri: str, signature: array) -> None:
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO buckets (rows, band, bucket, uri) VALUES (?, ?, ?, ?)",
+            ((self.rows, band, bucket, uri) for band, bucket in self._buckets(signature))
+        )
+
+    def _buckets(self, signature: array) -> list[tuple[int, int]]:
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(rows, digest_size=8).digest()
+            buckets.append((band, int.from_bytes(digest, 'little', signed=True)))
+        return buckets
+
+    def _candidates(self, uri: str, signature: array) -> set[str]:
+        candidates = set()
+        for band, bucket in self._buckets(signature):
+            rows = self.connection.execute(
+                "SELECT uri FROM buckets WHERE rows = ? AND band = ? AND bucket = ?", (self.rows, band, bucket)
+            )
+            candidates.update(candidate for (candidate,) in rows)
+        candidates.discard(uri)
+        return candidates
+
+    def _signature_of(self, uri: str) -> array | None:
+        row = self.connection.execute("SELECT signature FROM fingerprints WHERE uri = ?", (uri,)).fetchone()
+        return array('Q', row[0]) if row else None
+
+    def _signature(self, text: str) -> array:
+        if self._last is None or self._last[0] != text:
+            self._last = (text, self.minhash.signature(text))
+        return self._last[1]
+
+    def match(self, uri: str, text: str) -> tuple[str, float] | None:
+        """Return the canonical posting ``text`` duplicates and their similarity, if any. Records nothing."""
+        return self._match(uri, self._signature(text))
+
+    def _match(self, uri: str, signature: array) -> tuple[str, float] | None:
+        best = None
+        for candidate in self._candidates(uri, signature):
+            similarity = MinHash.similarity(signature, self._signature_of(candidate))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        if best is None:
+            return None
+
+        # Link to the original, not to another duplicate of it
+        (canonical,) = self.connection.execute(
+            "SELECT COALESCE(canonical, uri) FROM fingerprints WHERE uri = ?", (best[0],)
+        ).fetchone()
+        return canonical, best[1]
+
+    def record(self, uri: str, text: str, duplicate: tuple[str, float] | None = None, tokens: int = 0) -> None:
+        """
+        Index a posting. Pass the ``duplicate`` :meth:`match` found only when the
+        posting is skipped for it: it is then linked to its canonical and counted
+        with the ``tokens`` skipping it saved. Anything else is indexed as an original.
+        """
+        signature = self._signature(text)
+        canonical, similarity = duplicate if duplicate else (None, None)
+        if duplicate:
+            self.found += 1
+            self.found_tokens += tokens
+            metrics.inc("duplicates_total")
+        else:
+            tokens = 0
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO fingerprints (uri, signature, canonical, similarity, tokens) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (uri, signature.tobytes(), canonical, similarity, tokens)
+            )
+            self.connection.execute("DELETE FROM buckets WHERE uri = ?", (uri,))
+            if canonical is None:
+                # Only originals are bucketed: duplicates are found through them
+                self._insert_buckets(uri, signature)
+
+    def canonical(self, uri: str) -> str | None:
+        """Return the posting ``uri`` was linked to as a duplicate, if any."""
+        row = self.connection.execute("SELECT canonical FROM fingerprints WHERE uri = ?", (uri,)).fetchone()
+        return row[0] if row else None
+
+    def duplicates(self, canonical: str) -> list[str]:
+        rows = self.connection.execute("SELECT uri FROM fingerprints WHERE canonical = ? ORDER BY uri", (canonical,))
+        return [uri for (uri,) in rows]
+
+    def tokens_saved(self) -> int:
+        """Tokens not spent on every duplicate recorded so far."""
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(tokens), 0) FROM fingerprints WHERE canonical IS NOT NULL"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
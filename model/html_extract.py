@@ -0,0 +1,126 @@
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+BASE_URL = "https://dtu.jobteaser.com"
+
+JOB_CONTENT_ID = 'job-ad-detail-content'
+RESULTS_CLASS = re.compile(r'^PageContent_results')
+RESULT_ITEM_CLASS = re.compile(r'^PageContent_resultItem')
+PAGINATION_CLASS = re.compile(r'^Pagination_main__')
+LAST_PAGE_CLASS = re.compile(r'Pagination_item___last__')
+
+# Elements whose text is a paragraph of its own rather than part of the surrounding text
+BLOCK_TAGS = frozenset({'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'footer', 'h1', 'h2',
+                        'h3', 'h4', 'h5', 'h6', 'header', 'li', 'main', 'ol', 'p', 'section', 'table', 'td', 'th',
+                        'tr', 'ul'})
+
+# Only these subtrees are ever built; the rest of the page is skipped by the tokenizer
+JOB_CONTENT = SoupStrainer('main', id=JOB_CONTENT_ID)
+RESULTS = SoupStrainer('ul', class_=RESULTS_CLASS)
+PAGINATION = SoupStrainer('nav', class_=PAGINATION_CLASS)
+
+
+def extract_job_blocks(html: str) -> list[str]:
+    """
+    Return the text of ``main#job-ad-detail-content`` as whitespace-normalized
+    blocks (paragraphs, list items, headings), in document order, or [].
+    Joined with spaces, the blocks give the same text as :func:`extract_job_text`.
+    """
+    if JOB_CONTENT_ID not in html:
+        return []
+
+    soup = BeautifulSoup(html, PARSER, parse_only=JOB_CONTENT)
+    main_content = soup.find('main', id=JOB_CONTENT_ID)
+    if not main_content:
+        return []
+
+    blocks: list[str] = []
+    current: list[str] = []
+    owner = None
+    for string in main_content.strings:
+        text = " ".join(string.split())
+        if not text:
+            continue
+        block = next(parent for parent in string.parents if parent.name in BLOCK_TAGS)
+        if block is not owner and current:
+            blocks.append(" ".join(current))
+            current = []
+        owner = block
+        current.append(text)
+    if current:
+        blocks.append(" ".join(current))
+    return blocks
+
+
+def extract_job_text(html: str) -> str:
+    """Return the whitespace-normalized text of ``main#job-ad-detail-content``, or ""."""
+    if JOB_CONTENT_ID not in html:
+        return ""
+
+    soup = BeautifulSoup(html, PARSER, parse_only=JOB_CONTENT)
+    main_content = soup.find('main', id=JOB_CONTENT_ID)
+    if not main_content:
+        return ""
+
+    return " ".join(main_content.get_text(strip=True, separator=' ').split())
+
+
+def extract_posting_links(html: str, base_url: str = BASE_URL) -> list[str] | None:
+    """Return the posting links of a search results page, or None without a results list."""
+    if 'PageContent_results' not in html:
+        return None
+
+    soup = BeautifulSoup(html, PARSER, parse_only=RESULTS)
+    results_ul = soup.find('ul', class_=RESULTS_CLASS)
+    if not results_ul:
+        return None
+
+    return [base_url + a_tag['href'] for a_tag in results_ul.find_all('a') if a_tag.get('href')]
+
+
+def extract_posting_cards(html: str, base_url: str = BASE_URL) -> list[tuple[str, str]] | None:
+    """
+    Return (link, card text) for every posting of a search results page, or
+    None without a results list. The card text (title, company, tags) changes
+    when a posting is edited.
+    """
+    if 'PageContent_results' not in html:
+        return None
+
+    soup = BeautifulSoup(html, PARSER, parse_only=RESULTS)
+    results_ul = soup.find('ul', class_=RESULTS_CLASS)
+    if not results_ul:
+        return None
+
+    cards = []
+    for a_tag in results_ul.find_all('a'):
+        if not a_tag.get('href'):
+            continue
+        card = a_tag.find_parent('li', class_=RESULT_ITEM_CLASS) or a_tag
+        cards.append((base_url + a_tag['href'], " ".join(card.get_text(separator=' ').split())))
+    return cards
+
+
+def extract_last_page(html: str) -> int:
+    """Return the number of the last search results page, 1 without pagination."""
+    if 'Pagination_main__' not in html:
+        return 1
+
+    soup = BeautifulSoup(html, PARSER, parse_only=PAGINATION)
+    nav = soup.find('nav', class_=PAGINATION_CLASS)
+    if not nav:
+        return 1
+
+    last_link = nav.find('a', class_=LAST_PAGE_CLASS)
+    if not last_link:
+        return 1
+
+    last_page_text = last_link.get_text()
+    return int(last_page_text) if last_page_text else 1
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .uri_memory import normalize_uri
+
+
+class HttpCache:
+    """
+    Local cache of raw HTML responses for conditional requests.
+
+    Bodies are stored gzip-compressed under the SHA-256 of their content, so
+    identical pages share one blob. An SQLite index maps each normalized URL
+    to its blob, ETag, Last-Modified and last access time. When the blobs
+    exceed ``max_bytes``, the least recently used entries are evicted first.
+    """
+
+    DIRECTORY = Path(__file__).parent.parent / '.data' / 'cache' / 'http'
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.directory = Path(directory) if directory is not None else self.DIRECTORY
+        self.blobs = self.directory / 'blobs'
+        self.blobs.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.directory / 'index.db', check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, "
+            "digest TEXT NOT NULL, "
+            "etag TEXT, "
+            "last_modified TEXT, "
+            "encoding TEXT, "
+            "accessed REAL NOT NULL"
+            ")"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest)")
+        self.connection.commit()
+
+    @staticmethod
+    def key(url: str) -> str:
+        # Locale and query both change the page content, so both are part of the key
+        return normalize_uri(url, keep_query=True, keep_locale=True)
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blobs / digest[:2] / f"{digest}.gz"
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        """Return If-None-Match / If-Modified-Since headers for a cached URL."""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified FROM entries WHERE key = ?", (self.key(url),)
+            ).fetchone()
+
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def load(self, url: str) -> tuple[bytes, str | None] | None:
+        """Return the cached body and its encoding, or None if it is not cached."""
+        key = self.key(url)
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT digest, encoding FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            digest, encoding = row
+
+            try:
+                with gzip.open(self._blob_path(digest), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                # The blob is gone, so forget the entry and let the caller refetch
+                self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.connection.commit()
+                return None
+
+            self.connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+        return body, encoding
+
+    def store(self, url: str, body: bytes, etag: str | None = None,
+              last_modified: str | None = None, encoding: str | None = None) -> None:
+        """Cache a 200 response body. Responses without validators are not worth keeping."""
+        if not etag and not last_modified:
+            return
+
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+
+        with self._lock:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix('.tmp')
+                with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                    f.write(body)
+                tmp_path.replace(path)
+
+            previous = self.connection.execute(
+                "SELECT digest FROM entries WHERE key = ?", (self.key(url),)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO blobs (digest, size) VALUES (?, ?)", (digest, path.stat().st_size)
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries (key, digest, etag, last_modified, encoding, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(url), digest, etag, last_modified, encoding, time.time())
+            )
+            if previous and previous[0] != digest:
+                self._release_blob(previous[0])
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the blobs fit in ``max_bytes``."""
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        entries = self.connection.execute("SELECT key, digest FROM entries ORDER BY accessed").fetchall()
+        for key, digest in entries:
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= self._release_blob(digest)
+
+    def _release_blob(self, digest: str) -> int:
+        """Delete a blob once no entry points to it and return the bytes freed."""
+        if self.connection.execute("SELECT 1 FROM entries WHERE digest = ?", (digest,)).fetchone():
+            return 0
+
+        row = self.connection.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        self.connection.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        self._blob_path(digest).unlink(missing_ok=True)
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        self.connection.close()
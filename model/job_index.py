@@ -0,0 +1,192 @@
+import re
+import sqlite3
+from typing import Iterable
+
+from .Job import Job
+
+FIELDS = ("skill", "term", "company", "location")
+
+# Keeps the symbols that matter in skill names: c++, c#, node.js, .net
+TOKEN = re.compile(r"[\w+#.]+")
+QUERY_TOKEN = re.compile(r'\w+:"[^"]*"|"[^"]*"|\(|\)|[^\s()]+')
+
+STOPWORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "have", "in", "is", "it", "of", "on",
+    "or", "our", "the", "to", "we", "will", "with", "you", "your", "experience", "knowledge", "ability",
+    "good", "strong", "skills", "years", "etc",
+    # Danish
+    "af", "at", "de", "den", "det", "du", "en", "er", "et", "for", "har", "i", "med", "og", "om", "på",
+    "som", "til", "vi", "erfaring", "kendskab", "gode", "god",
+}
+
+
+def normalize_term(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = (token.strip(".") for token in TOKEN.findall(text.casefold()))
+    return [token for token in tokens if token and token not in STOPWORDS]
+
+
+def job_terms(job: Job) -> set[tuple[str, str]]:
+    """The (field, term) pairs a job is indexed under."""
+    terms = set()
+    for skill in job.key_skills:
+        if normalize_term(skill):
+            terms.add(("skill", normalize_term(skill)))
+    for text in job.requirements + job.key_skills:
+        terms.update(("term", token) for token in tokenize(text))
+    for field, text in (("company", job.company_name), ("location", job.location)):
+        if normalize_term(text):
+            terms.add((field, normalize_term(text)))
+        terms.update((field, token) for token in tokenize(text))
+    return terms
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_query(text: str):
+    """
+    Parse a boolean query into a tree of ``("and" | "or", left, right)``,
+    ``("not", operand)`` and ``("match", field | None, value)`` nodes.
+
+    Terms are joined with ``AND`` (also implied between adjacent terms), ``OR``
+    and ``NOT``, grouped with parentheses and quoted for phrases. A term can be
+    restricted to one field, e.g. ``company:"novo nordisk"`` or ``location:aarhus``.
+    """
+    tokens = QUERY_TOKEN.findall(text)
+    position = 0
+
+    def peek() -> str | None:
+        return tokens[position] if position < len(tokens) else None
+
+    def take() -> str:
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == "NOT":
+            take()
+            return ("not", parse_not())
+        return parse_atom()
+
+    def parse_atom():
+        token = peek()
+        if token is None:
+            raise QueryError("Unexpected end of query")
+        take()
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise QueryError("Missing closing parenthesis")
+            take()
+            return node
+        if token in (")", "AND", "OR"):
+            raise QueryError(f"Unexpected {token!r}")
+
+        field = None
+        name, colon, value = token.partition(":")
+        if colon and name.lower() in FIELDS:
+            field, token = name.lower(), value
+        return ("match", field, token.strip('"'))
+
+    if not tokens:
+        raise QueryError("Empty query")
+    tree = parse_or()
+    if peek() is not None:
+        raise QueryError(f"Unexpected {peek()!r}")
+    return tree
+
+
+class JobIndex:
+    """
+    Inverted index from normalized skills, requirement terms, company and
+    location to the keys of stored jobs, kept in the job store's database so it is updated in
+    the same transaction as the jobs themselves. Keys, unlike rowids, survive a VACUUM.
+    """
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+        columns = {name: kind for _, name, kind, *_ in self.connection.execute("PRAGMA table_info(job_terms)")}
+        if columns.get("job") == "INTEGER":
+            # Earlier versions indexed rowids; the job store re-indexes every job on keys
+            self.connection.execute("DROP TABLE job_terms")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS job_terms ("
+            "field TEXT NOT NULL, "
+            "term TEXT NOT NULL, "
+            "job TEXT NOT NULL, "
+            "PRIMARY KEY (field, term, job)"
+            ") WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS job_terms_job ON job_terms (job)")
+
+    def update(self, entries: Iterable[tuple[str, Job]]) -> None:
+        """Re-index jobs by key. Runs inside the caller's transaction."""
+        for key, job in entries:
+            self.connection.execute("DELETE FROM job_terms WHERE job = ?", (key,))
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO job_terms (field, term, job) VALUES (?, ?, ?)",
+                ((field, term, key) for field, term in job_terms(job))
+            )
+
+    def _match(self, field: str | None, value: str) -> tuple[str, list[str]]:
+        phrase = normalize_term(value)
+        tokens = tokenize(value)
+        lookup = "SELECT job FROM job_terms WHERE field = ? AND term = ?"
+
+        if field is None:
+            # A bare term matches a skill by name or a word of the skills and requirements
+            parts, parameters = [lookup], ["skill", phrase]
+            field = "term"
+        else:
+            parts, parameters = [lookup], [field, phrase]
+        if field != "skill" and tokens:
+            # Every word of a phrase, anywhere in the field
+            parts.append(" INTERSECT ".join([lookup] * len(tokens)))
+            for token in tokens:
+                parameters += [field, token]
+        return " UNION ".join(f"SELECT job FROM ({part})" for part in parts), parameters
+
+    def _compile(self, node) -> tuple[str, list[str]]:
+        kind = node[0]
+        if kind == "match":
+            return self._match(node[1], node[2])
+        if kind == "not":
+            sql, parameters = self._compile(node[1])
+            return f"SELECT key AS job FROM jobs EXCEPT SELECT job FROM ({sql})", parameters
+
+        left, left_parameters = self._compile(node[1])
+        right, right_parameters = self._compile(node[2])
+        operator = "INTERSECT" if kind == "and" else "UNION"
+        # Compound operators chain left to right, so every operand is wrapped
+        return f"SELECT job FROM ({left}) {operator} SELECT job FROM ({right})", left_parameters + right_parameters
+
+    def compile(self, query: str) -> tuple[str, list[str]]:
+        """Translate a boolean query (see :func:`parse_query`) into a SELECT of matching job keys."""
+        return self._compile(parse_query(query))
+
+    def search(self, query: str) -> set[str]:
+        """Return the keys of the jobs matching a boolean query."""
+        sql, parameters = self.compile(query)
+        return {key for (key,) in self.connection.execute(sql, parameters)}
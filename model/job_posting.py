@@ -1,23 +1,30 @@
-import cloudscraper
-from bs4 import BeautifulSoup
 from .batch_request import BatchRequest, RequestBody, Message
 import uuid
 from abc import abstractmethod
 from requests import Response
+from .html_extract import extract_job_blocks
+from .http_cache import HttpCache
+from .metrics import metrics
+from .session_pool import shared_pool
 
     
 class DTUJobPosting:
-    def __init__(self, uri: str) -> None:
+    def __init__(self, uri: str, cache: HttpCache | None = None) -> None:
         self.uri = uri
+        self.cache = cache
         self.job_description = ""
+        # Paragraphs of the description, and the compacted text sent instead of it when set
+        self.blocks: list[str] = []
+        self.compacted: str | None = None
+        self.tokens_saved = 0
     
     def __cloud_scrape(self, uri: str) -> Response:
-        scraper = cloudscraper.create_scraper()
-        return scraper.get(uri)
+        return shared_pool().get(uri, cache=self.cache)
 
     def to_message(self) -> Message:
+        description = self.compacted if self.compacted is not None else self.job_description
         message = f"{self.uri}" \
-                    f"{self.job_description}" \
+                    f"{description}" \
                     + "\n" + "=" * 50 + "\n" \
         
         return Message("user", message)
@@ -26,23 +33,27 @@ class DTUJobPosting:
         retries = 3
         html_content = None
         
-        for _ in range(retries):
-            response = self.__cloud_scrape(self.uri)
-            if response.status_code == 200:
-                html_content = response.text
-                break
+        with metrics.timed("fetch", source="posting"):
+            for attempt in range(retries):
+                if attempt:
+                    metrics.inc("http_retries_total", source="posting")
+                response = self.__cloud_scrape(self.uri)
+                if response.status_code == 200:
+                    html_content = response.text
+                    break
             
         if not html_content:
             return ""
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Find main content div
-        main_content = soup.find('main', id='job-ad-detail-content')
-        
-        if not main_content:
+
+        return self.parse_html(html_content)
+
+    def parse_html(self, html_content: str) -> str:
+        """Extract the job description from an already fetched posting page."""
+        with metrics.timed("parse"):
+            blocks = extract_job_blocks(html_content)
+        if not blocks:
             return ""
-        
-        # Extract all text, removing extra whitespace
-        job_text = " ".join(main_content.get_text(strip=True, separator=' ').split())
-        self.job_description = job_text
\ No newline at end of file
+
+        self.blocks = blocks
+        self.job_description = " ".join(blocks)
+        return self.job_description
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import urlsplit
+
+from .Job import Job, JobType
+from .job_index import JobIndex
+from .uri_memory import normalize_uri
+
+DATE_FORMATS = ["%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y"]
+
+
+def parse_date(text: str) -> str | None:
+    """Normalize the free-form dates the model returns to ISO ``YYYY-MM-DD``, or None if unrecognized."""
+    text = " ".join(text.replace(",", ", ").split()).strip(". ")
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def job_key(job: Job) -> str:
+    """
+    Identity of a job: its normalized apply URI, or a hash of what it says when
+    that is no absolute http(s) URL (the model writes e.g. "Not mentioned").
+    """
+    parts = urlsplit(job.apply_uri.strip())
+    if parts.scheme in ("http", "https") and parts.netloc:
+        return normalize_uri(job.apply_uri)
+    material = "\0".join([job.company_name, job.job_title, job.published]).casefold()
+    return "sha1:" + hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+class JobStore:
+    """
+    SQLite store of analyzed jobs.
+
+    Jobs are upserted on their normalized apply URI, so a re-analyzed posting
+    replaces its earlier version instead of adding a file next to it. Job
+    type, company, deadline and publication date are indexed columns; dates
+    are kept as ISO strings when they can be parsed. The full job is stored
+    as JSON, and :meth:`export` writes the old ``results/jobs/<type>``
+    directory layout on demand.
+    """
+
+    DATABASE = Path(__file__).parent.parent / 'results' / 'jobs.db'
+    LEGACY_DIRECTORY = Path(__file__).parent.parent / 'results' / 'jobs'
+
+    def __init__(self, path: Path | None = None, legacy_directory: Path | None = None) -> None:
+        self.path = Path(path) if path is not None else self.DATABASE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "key TEXT PRIMARY KEY, "
+            "apply_uri TEXT NOT NULL, "
+            "job_type TEXT NOT NULL, "
+            "company TEXT NOT NULL, "
+            "title TEXT NOT NULL, "
+            "deadline TEXT, "
+            "published TEXT, "
+            "data TEXT NOT NULL, "
+            "updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP"
+            ")"
+        )
+        for column in ("job_type", "company", "deadline", "published"):
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS jobs_{column} ON jobs ({column})")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)")
+        self.index = JobIndex(self.connection)
+        self.connection.commit()
+
+        self._migrate_legacy_directory(
+            Path(legacy_directory) if legacy_directory is not None else self.LEGACY_DIRECTORY
+        )
+        self._migrate_index()
+        self._migrate_keys()
+
+    def _migrate_legacy_directory(self, directory: Path) -> None:
+        """Import the jobs saved as one JSON file each, once."""
+        done = self.connection.execute("SELECT 1 FROM migrations WHERE name = 'results/jobs'").fetchone()
+        if done:
+            return
+
+        jobs = []
+        for file_path in sorted(directory.glob('*/*.json')) if directory.exists() else []:
+            try:
+                jobs.append(Job.model_validate_json(file_path.read_text(encoding='utf-8')))
+            except Exception as e:
+                logging.warning(f"Skipping {file_path} while importing saved jobs: {e}")
+        if jobs:
+            self.upsert_many(jobs)
+            logging.info(f"Imported {len(jobs)} saved jobs from {directory}")
+
+        self.connection.execute("INSERT INTO migrations (name) VALUES ('results/jobs')")
+        self.connection.commit()
+
+    def _migrate_index(self) -> None:
+        """Index the jobs stored before the inverted index existed (or was keyed on rowids), once."""
+        done = self.connection.execute("SELECT 1 FROM migrations WHERE name = 'job_terms_by_key'").fetchone()
+        if done:
+            return
+
+        with self.connection:
+            rows = self.connection.execute("SELECT key, data FROM jobs").fetchall()
+            self.index.update((key, Job.model_validate_json(data)) for key, data in rows)
+            self.connection.execute("INSERT INTO migrations (name) VALUES ('job_terms_by_key')")
+
+    def _migrate_keys(self) -> None:
+        """Re-key the jobs stored under an apply "URI" that is no URL, once."""
+        done = self.connection.execute("SELECT 1 FROM migrations WHERE name = 'job_keys'").fetchone()
+        if done:
+            return
+
+        with self.connection:
+            rows = self.connection.execute("SELECT key, data FROM jobs").fetchall()
+            for key, data in rows:
+                new_key = job_key(Job.model_validate_json(data))
+                if new_key == key:
+                    continue
+                moved = self.connection.execute(
+                    "UPDATE OR IGNORE jobs SET key = ? WHERE key = ?", (new_key, key)
+                ).rowcount
+                if moved:
+                    self.connection.execute("DELETE FROM job_terms WHERE job = ?", (key,))
+                    self.index.update([(new_key, Job.model_validate_json(data))])
+            self.connection.execute("INSERT INTO migrations (name) VALUES ('job_keys')")
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def __contains__(self, apply_uri: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM jobs WHERE key = ?", (normalize_uri(apply_uri),)
+        ).fetchone()
+        return row is not None
+
+    def upsert(self, job: Job) -> str:
+        """Insert or replace a job and return its key."""
+        return self.upsert_many([job])[0]
+
+    def upsert_many(self, jobs: Iterable[Job]) -> list[str]:
+        """Insert or replace jobs in a single transaction and return their keys."""
+        jobs = list(jobs)
+        rows = [
+            (job_key(job), job.apply_uri, job.job_type.value, job.company_name, job.job_title,
+             parse_date(job.deadline), parse_date(job.published), job.model_dump_json())
+            for job in jobs
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO jobs (key, apply_uri, job_type, company, title, deadline, published, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "apply_uri = excluded.apply_uri, job_type = excluded.job_type, company = excluded.company, "
+                "title = excluded.title, deadline = excluded.deadline, published = excluded.published, "
+                "data = excluded.data, updated_at = CURRENT_TIMESTAMP",
+                rows
+            )
+            self.index.update((row[0], job) for row, job in zip(rows, jobs))
+        return [row[0] for row in rows]
+
+    def get(self, apply_uri: str) -> Job | None:
+        row = self.connection.execute(
+            "SELECT data FROM jobs WHERE key = ?", (normalize_uri(apply_uri),)
+        ).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+    @staticmethod
+    def _filters(job_type: JobType | None, company: str | None,
+                 deadline_after: str | None, published_after: str | None) -> tuple[list[str], list]:
+        clauses, parameters = [], []
+        if job_type is not None:
+            clauses.append("job_type = ?")
+            parameters.append(job_type.value)
+        if company is not None:
+            clauses.append("company = ? COLLATE NOCASE")
+            parameters.append(company)
+        if deadline_after is not None:
+            clauses.append("deadline >= ?")
+            parameters.append(deadline_after)
+        if published_after is not None:
+            clauses.append("published >= ?")
+            parameters.append(published_after)
+        return clauses, parameters
+
+    def find(self, job_type: JobType | None = None, company: str | None = None,
+             deadline_after: str | None = None, published_after: str | None = None) -> Iterator[Job]:
+        """Yield the jobs matching every given filter. Dates are ISO ``YYYY-MM-DD`` strings."""
+        clauses, parameters = self._filters(job_type, company, deadline_after, published_after)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        for (data,) in self.connection.execute(f"SELECT data FROM jobs{where} ORDER BY key", parameters):
+            yield Job.model_validate_json(data)
+
+    def search(self, query: str, job_type: JobType | None = None, deadline_after: str | None = None,
+               published_after: str | None = None, limit: int | None = None) -> tuple[list[Job], int]:
+        """
+        Find the jobs matching a boolean skill query (see :func:`~model.job_index.parse_query`)
+        and every given filter, soonest deadline first. Returns up to ``limit``
+        jobs and the total number of matches.
+        """
+        sql, parameters = self.index.compile(query)
+        clauses, filter_parameters = self._filters(job_type, None, deadline_after, published_after)
+        where = " AND ".join([f"key IN ({sql})"] + clauses)
+
+        rows = self.connection.execute(
+            f"SELECT data, COUNT(*) OVER () FROM jobs WHERE {where} "
+            f"ORDER BY deadline IS NULL, deadline, key LIMIT ?",
+            parameters + filter_parameters + [-1 if limit is None else limit]
+        ).fetchall()
+        total = rows[0][1] if rows else 0
+        return [Job.model_validate_json(data) for data, _ in rows], total
+
+    def export(self, directory: Path | None = None) -> int:
+        """
+        Write every job as its own JSON file in the old ``<type>`` sub-directory
+        layout. Filenames end with a hash of the job's key so they never collide.
+        Returns the number of files written.
+        """
+        directory = Path(directory) if directory is not None else self.LEGACY_DIRECTORY
+        written = 0
+        for key, job_type, data in self.connection.execute("SELECT key, job_type, data FROM jobs"):
+            job = Job.model_validate_json(data)
+            type_directory = directory / job_type.lower()
+            type_directory.mkdir(parents=True, exist_ok=True)
+
+            stem = "".join(c if c.isalnum() else "_" for c in job.published + "_" + job.job_title)
+            digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+            with open(type_directory / f"{stem}_{digest}.json", 'w', encoding='utf-8') as f:
+                f.write(job.model_dump_json(indent=2))
+            written += 1
+        return written
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+_shared_store: JobStore | None = None
+
+
+def shared_store() -> JobStore:
+    """Return the job store shared by every repository in this process."""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = JobStore()
+    return _shared_store
+
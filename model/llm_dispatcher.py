@@ -0,0 +1,266 @@
+import asyncio
+import contextlib
+import inspect
+import logging
+import random
+import re
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from .Job import Job, JobList
+from .job_posting import DTUJobPosting
+from .metrics import metrics
+from .prompt import Prompt
+from .rate_limit import TokenBucket
+from .stream_parser import JobStreamParser
+from .wave_packer import Wave
+
+DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse rate-limit reset durations such as ``"6m0s"``, ``"1.5s"`` or ``"20ms"`` into seconds."""
+    if not value:
+        return None
+    parts = DURATION.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def permanent_rate_limit(error: openai.RateLimitError) -> str | None:
+    """
+    Why a 429 will never succeed on retry (no quota left, or a request larger
+    than the whole tokens-per-minute limit), or None for an ordinary rate limit.
+    """
+    if error.code == "insufficient_quota":
+        return "insufficient quota"
+    if "request too large" in str(error).lower():
+        return "request larger than the tokens-per-minute limit"
+    return None
+
+
+class LLMDispatcher:
+    """
+    Send prompt waves concurrently within requests-per-minute and
+    tokens-per-minute budgets.
+
+    Each wave reserves one request and its estimated tokens up front. Once the
+    response arrives, the estimate is corrected with the reported usage and
+    the budgets are lowered to whatever the rate-limit headers say is left.
+    429s, 5xx errors and connection errors are retried with exponential
+    backoff, honouring Retry-After, instead of dropping the wave. A wave
+    larger than the tokens-per-minute limit, and 429s that say so or that
+    the quota is used up, fail at once, since no retry can succeed.
+
+    Backends without structured outputs (``structured=False``, e.g. DeepSeek)
+    are asked for a JSON object described in the system prompt, and their
+    replies are validated into the same job list JSON.
+    """
+
+    def __init__(self, client: AsyncOpenAI, model: str = "gpt-4o", requests_per_minute: int = 500,
+                 tokens_per_minute: int = 30_000, max_concurrency: int = 4, max_retries: int = 6,
+                 structured: bool = True) -> None:
+        if client is None:
+            raise ValueError("OpenAI client must be provided")
+
+        # Retries are handled here, against the shared budgets
+        self.client = client.with_options(max_retries=0)
+        self.model = model
+        self.structured = structured
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+
+    @contextlib.asynccontextmanager
+    async def pooled(self) -> AsyncIterator[None]:
+        """Give the client a connection pool of the running event loop, for the duration of the block."""
+        client = self.client
+        async with openai.DefaultAsyncHttpxClient() as http_client:
+            self.client = client.with_options(http_client=http_client)
+            try:
+                yield
+            finally:
+                self.client = client
+
+    def _update_limits(self, headers) -> None:
+        remaining_requests = headers.get('x-ratelimit-remaining-requests')
+        if remaining_requests is not None:
+            self.requests.limit(float(remaining_requests), parse_duration(headers.get('x-ratelimit-reset-requests')))
+
+        remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+        if remaining_tokens is not None:
+            self.tokens.limit(float(remaining_tokens), parse_duration(headers.get('x-ratelimit-reset-tokens')))
+
+    def _check_size(self, wave: Wave, max_tokens: int) -> None:
+        # The API charges the prompt plus max_tokens against the limit up front
+        size = wave.input_tokens + max_tokens
+        if size > self.tokens_per_minute:
+            metrics.inc("llm_requests_total", model=self.model, api="chat", outcome="rejected")
+            raise ValueError(f"Wave of {len(wave)} postings needs ~{size} tokens, over the limit of "
+                             f"{self.tokens_per_minute} tokens per minute")
+
+    def _reject(self, wave: Wave, error: openai.RateLimitError) -> None:
+        """Raise instead of retrying a 429 that can never succeed."""
+        reason = permanent_rate_limit(error)
+        if reason is not None:
+            metrics.inc("llm_requests_total", model=self.model, api="chat", outcome="rejected")
+            raise RuntimeError(f"Wave of {len(wave)} postings rejected ({reason}): {error}") from error
+
+    def _retry_delay(self, attempt: int, headers=None) -> float:
+        if headers is not None:
+            retry_after_ms = headers.get('retry-after-ms')
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000
+            retry_after = parse_duration(headers.get('retry-after'))
+            if retry_after:
+                return retry_after
+        return min(60.0, 2 ** attempt) + random.random()
+
+    async def prompt(self, wave: Wave, semaphore: asyncio.Semaphore, max_tokens: int = 15000) -> str:
+        """Send one wave, retrying transient failures, and return the raw JSON content."""
+        self._check_size(wave, max_tokens)
+        messages = Prompt.build_messages(wave.messages, self.structured)
+        estimate = wave.input_tokens + wave.output_tokens
+
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(estimate)
+
+            try:
+                async with semaphore:
+                    with metrics.timed("prompt", model=self.model):
+                        if self.structured:
+                            raw = await self.client.beta.chat.completions.with_raw_response.parse(
+                                model=self.model, messages=messages, max_tokens=max_tokens, response_format=JobList
+                            )
+                        else:
+                            raw = await self.client.chat.completions.with_raw_response.create(
+                                model=self.model, messages=messages, max_tokens=max_tokens,
+                                response_format={"type": "json_object"}
+                            )
+            except openai.RateLimitError as e:
+                self._reject(wave, e)
+                self._update_limits(e.response.headers)
+                delay = self._retry_delay(attempt, e.response.headers)
+                metrics.inc("llm_retries_total", model=self.model, reason="rate_limit")
+                logging.warning(f"Rate limited, retrying wave of {len(wave)} in {delay:.1f}s")
+            except openai.InternalServerError as e:
+                delay = self._retry_delay(attempt, e.response.headers)
+                metrics.inc("llm_retries_total", model=self.model, reason="server_error")
+                logging.warning(f"Server error {e.status_code}, retrying wave of {len(wave)} in {delay:.1f}s")
+            except (openai.APIConnectionError, openai.APITimeoutError) as e:
+                delay = self._retry_delay(attempt)
+                metrics.inc("llm_retries_total", model=self.model, reason="connection")
+                logging.warning(f"Connection error ({e}), retrying wave of {len(wave)} in {delay:.1f}s")
+            else:
+                self._update_limits(raw.headers)
+                completion = raw.parse()
+                if inspect.isawaitable(completion):
+                    completion = await completion
+                metrics.inc("llm_requests_total", model=self.model, api="chat", outcome="ok")
+                if completion.usage is not None:
+                    self.tokens.refund(estimate - completion.usage.total_tokens)
+                    metrics.record_usage(self.model, completion.usage)
+
+                if not completion.choices:
+                    raise ValueError("No response received from OpenAI")
+                content = completion.choices[0].message.content
+                wave.model = self.model
+                return content if self.structured else Prompt.normalize_content(content)
+
+            await asyncio.sleep(delay)
+
+        metrics.inc("llm_requests_total", model=self.model, api="chat", outcome="error")
+        raise RuntimeError(f"Wave of {len(wave)} postings still failing after {self.max_retries} retries")
+
+    async def stream(self, wave: Wave, semaphore: asyncio.Semaphore,
+                     on_job: Callable[[DTUJobPosting | None, Job], Awaitable[None] | None],
+                     max_tokens: int = 15000) -> list[DTUJobPosting]:
+        """
+        Send one wave as a stream and hand every job to ``on_job(posting, job)``
+        as soon as its object is complete and valid.
+
+        Returns the postings left unanswered when the stream ended, e.g. after
+        a truncated or interrupted response, so only those are sent again.
+        Failures before any job arrived are retried here like :meth:`prompt`.
+        """
+        self._check_size(wave, max_tokens)
+        messages = Prompt.build_messages(wave.messages, self.structured)
+        response_format = Prompt.RESPONSE_FORMAT if self.structured else {"type": "json_object"}
+        estimate = wave.input_tokens + wave.output_tokens
+
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(estimate)
+            answered: set[int] = set()
+            finish_reason = None
+            wave.model = self.model
+
+            try:
+                async with semaphore:
+                    with metrics.timed("prompt", model=self.model, mode="stream"):
+                        raw = await self.client.chat.completions.with_raw_response.create(
+                            model=self.model, messages=messages, max_tokens=max_tokens,
+                            response_format=response_format, stream=True, stream_options={"include_usage": True}
+                        )
+                        self._update_limits(raw.headers)
+                        stream = raw.parse()
+                        if inspect.isawaitable(stream):
+                            stream = await stream
+
+                        parser = JobStreamParser()
+                        async for chunk in stream:
+                            if chunk.usage is not None:
+                                self.tokens.refund(estimate - chunk.usage.total_tokens)
+                                metrics.record_usage(self.model, chunk.usage)
+                            for choice in chunk.choices:
+                                finish_reason = choice.finish_reason or finish_reason
+                                for item in parser.feed(choice.delta.content or ""):
+                                    job = Prompt.validate_job(item)
+                                    if job is None:
+                                        continue
+                                    posting = wave.match(job, answered)
+                                    if posting is None:
+                                        logging.warning(f"Streamed job {job.apply_uri} matches no posting of the wave")
+                                    result = on_job(posting, job)
+                                    if inspect.isawaitable(result):
+                                        await result
+            except openai.RateLimitError as e:
+                self._reject(wave, e)
+                self._update_limits(e.response.headers)
+                delay = self._retry_delay(attempt, e.response.headers)
+                metrics.inc("llm_retries_total", model=self.model, reason="rate_limit")
+                logging.warning(f"Rate limited, retrying wave of {len(wave)} in {delay:.1f}s")
+            except openai.InternalServerError as e:
+                delay = self._retry_delay(attempt, e.response.headers)
+                metrics.inc("llm_retries_total", model=self.model, reason="server_error")
+                logging.warning(f"Server error {e.status_code}, retrying wave of {len(wave)} in {delay:.1f}s")
+            except (openai.APIConnectionError, openai.APITimeoutError, httpx.HTTPError) as e:
+                if answered:
+                    # Keep what was saved; the caller sends the rest again
+                    finish_reason = "interrupted"
+                    logging.warning(f"Stream interrupted ({e}) after {len(answered)} of {len(wave)} jobs")
+                else:
+                    delay = self._retry_delay(attempt)
+                    metrics.inc("llm_retries_total", model=self.model, reason="connection")
+                    logging.warning(f"Connection error ({e}), retrying wave of {len(wave)} in {delay:.1f}s")
+
+            if answered or finish_reason is not None:
+                outcome = "ok" if finish_reason == "stop" else "truncated"
+                metrics.inc("llm_requests_total", model=self.model, api="chat", outcome=outcome)
+                return [posting for index, posting in enumerate(wave.postings) if index not in answered]
+
+            await asyncio.sleep(delay)
+
+        metrics.inc("llm_requests_total", model=self.model, api="chat", outcome="error")
+        raise RuntimeError(f"Wave of {len(wave)} postings still failing after {self.max_retries} retries")
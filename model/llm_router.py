@@ -0,0 +1,309 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+from openai import AsyncOpenAI
+
+from .Job import Job
+from .job_posting import DTUJobPosting
+from .llm_dispatcher import LLMDispatcher
+from .metrics import PRICES, metrics
+from .wave_packer import BUDGETS, ModelBudget, Wave
+
+
+@dataclass
+class ProviderSpec:
+    """How to reach one OpenAI-compatible backend, and what it costs."""
+    name: str
+    model: str
+    base_url: str | None = None
+    api_key_env: str = "OPENAI_API_KEY"
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 30_000
+    max_concurrency: int = 4
+    # False for backends that only have JSON mode (response_format json_object)
+    structured: bool = True
+    # USD per million prompt and completion tokens, by default from metrics.PRICES
+    prompt_price: float | None = None
+    completion_price: float | None = None
+
+
+PROVIDERS = {
+    "openai": ProviderSpec("openai", "gpt-4o"),
+    "openai-mini": ProviderSpec("openai-mini", "gpt-4o-mini"),
+    "deepseek": ProviderSpec("deepseek", "deepseek-chat", base_url="https://api.deepseek.com",
+                             api_key_env="DEEPSEEK_API_KEY", tokens_per_minute=200_000, structured=False),
+}
+
+
+def load_providers(names: list[str], path: Path | str | None = None) -> list[ProviderSpec]:
+    """
+    Look up providers by name, in order. A JSON file of provider objects (the
+    fields of :class:`ProviderSpec`) adds providers or overrides the built-in ones.
+    """
+    specs = dict(PROVIDERS)
+    if path is not None:
+        known = {spec_field.name for spec_field in fields(ProviderSpec)}
+        for entry in json.loads(Path(path).read_text(encoding='utf-8')):
+            unknown = set(entry) - known
+            if unknown:
+                raise ValueError(f"Unknown provider fields: {', '.join(sorted(unknown))}")
+            specs[entry['name']] = ProviderSpec(**entry)
+
+    missing = [name for name in names if name not in specs]
+    if missing:
+        raise ValueError(f"Unknown providers: {', '.join(missing)} (known: {', '.join(specs)})")
+    return [specs[name] for name in names]
+
+
+class ProviderHealth:
+    """Latency and error rate of a provider over the last ``window`` seconds."""
+
+    def __init__(self, window: float = 300.0, min_samples: int = 3) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self.samples: deque[tuple[float, float, bool]] = deque()
+
+    def _prune(self) -> None:
+        horizon = time.monotonic() - self.window
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.popleft()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.samples.append((time.monotonic(), seconds, ok))
+        self._prune()
+
+    def error_rate(self) -> float:
+        """Share of failed requests, 0 until there are ``min_samples`` of them."""
+        self._prune()
+        if len(self.samples) < self.min_samples:
+            return 0.0
+        return sum(not ok for _, _, ok in self.samples) / len(self.samples)
+
+    def latency(self, fraction: float = 0.9) -> float | None:
+        """The ``fraction`` quantile of successful request latencies, None without any."""
+        self._prune()
+        latencies = sorted(seconds for _, seconds, ok in self.samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+
+class Provider:
+    """A backend with its own dispatcher (and so its own rate limits) and health."""
+
+    def __init__(self, spec: ProviderSpec, client: AsyncOpenAI | None = None, max_retries: int = 1) -> None:
+        if client is None:
+            api_key = os.getenv(spec.api_key_env)
+            if not api_key:
+                raise ValueError(f"Provider {spec.name} needs {spec.api_key_env} to be set")
+            client = AsyncOpenAI(api_key=api_key, base_url=spec.base_url)
+
+        self.spec = spec
+        self.name = spec.name
+        # Few retries: failing over to another provider beats backing off on this one
+        self.dispatcher = LLMDispatcher(client, spec.model, requests_per_minute=spec.requests_per_minute,
+                                        tokens_per_minute=spec.tokens_per_minute,
+                                        max_concurrency=spec.max_concurrency, max_retries=max_retries,
+                                        structured=spec.structured)
+        self.budget = BUDGETS.get(spec.model, BUDGETS["gpt-4o"]).within(spec.tokens_per_minute)
+        default_prices = PRICES.get(spec.model, (0.0, 0.0))
+        self.prompt_price = spec.prompt_price if spec.prompt_price is not None else default_prices[0]
+        self.completion_price = spec.completion_price if spec.completion_price is not None else default_prices[1]
+        self.health = ProviderHealth()
+        self.semaphore: asyncio.Semaphore | None = None
+
+    def cost(self, wave: Wave) -> float:
+        """Estimated USD cost of sending ``wave`` here."""
+        return (wave.input_tokens * self.prompt_price + wave.output_tokens * self.completion_price) / 1_000_000
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.health.record(seconds, ok)
+        metrics.set("llm_provider_error_rate", self.health.error_rate(), provider=self.name)
+        latency = self.health.latency()
+        if latency is not None:
+            metrics.set("llm_provider_latency_seconds", latency, provider=self.name)
+
+    def describe(self) -> str:
+        latency = self.health.latency()
+        latency = f"p90 {latency:.1f}s" if latency is not None else "no latency yet"
+        return (f"{self.name} ({self.spec.model}): {len(self.health.samples)} recent requests, {latency}, "
+                f"{self.health.error_rate():.0%} errors")
+
+
+class LLMRouter:
+    """
+    Route prompt waves over several OpenAI-compatible providers.
+
+    Each wave goes to the cheapest healthy provider. A provider is unhealthy
+    while its recent error rate exceeds ``max_error_rate`` or its p90 latency
+    exceeds ``max_latency``; unhealthy providers are only tried once every
+    healthy one failed, and recover as their bad samples age out. A failed
+    wave fails over to the next provider. With ``hedge_after``, a wave still
+    unanswered after that many seconds is also sent to the next healthy
+    provider, and the first answer wins.
+
+    The router has the dispatcher interface (``prompt``, ``stream``,
+    ``pooled``, ``max_concurrency``), so a :class:`Pipeline` can use it in
+    place of a single :class:`LLMDispatcher`.
+    """
+
+    def __init__(self, providers: list[Provider], hedge_after: float | None = None, max_error_rate: float = 0.5,
+                 max_latency: float | None = None) -> None:
+        if not providers:
+            raise ValueError("At least one provider is required")
+        if hedge_after is not None and hedge_after <= 0:
+            raise ValueError("Hedge delay must be positive")
+
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.max_concurrency = sum(provider.spec.max_concurrency for provider in providers)
+
+    @classmethod
+    def from_specs(cls, specs: list[ProviderSpec], **kwargs) -> 'LLMRouter':
+        return cls([Provider(spec) for spec in specs], **kwargs)
+
+    @property
+    def models(self) -> list[str]:
+        """The models of the providers, in the order they were given."""
+        return list(dict.fromkeys(provider.spec.model for provider in self.providers))
+
+    @property
+    def budget(self) -> ModelBudget:
+        """The tightest budgets of all providers, so every wave fits wherever it is sent."""
+        budgets = [provider.budget for provider in self.providers]
+        return ModelBudget(
+            input_tokens=min(budget.input_tokens for budget in budgets),
+            output_tokens=min(budget.output_tokens for budget in budgets),
+            max_tokens=min(budget.max_tokens for budget in budgets),
+            output_tokens_per_posting=max(budget.output_tokens_per_posting for budget in budgets)
+        )
+
+    def healthy(self, provider: Provider) -> bool:
+        if provider.health.error_rate() > self.max_error_rate:
+            return False
+        latency = provider.health.latency()
+        return self.max_latency is None or latency is None or latency <= self.max_latency
+
+    def rank(self, wave: Wave) -> tuple[list[Provider], int]:
+        """Providers in the order to try them, and how many of them are healthy."""
+        healthy = [provider for provider in self.providers if self.healthy(provider)]
+        healthy.sort(key=lambda provider: (provider.cost(wave), provider.health.latency() or 0.0))
+        unhealthy = [provider for provider in self.providers if provider not in healthy]
+        unhealthy.sort(key=lambda provider: provider.health.error_rate())
+        return healthy + unhealthy, len(healthy)
+
+    @contextlib.asynccontextmanager
+    async def pooled(self) -> AsyncIterator[None]:
+        """Give every provider a connection pool and a concurrency limit in the running event loop."""
+        async with contextlib.AsyncExitStack() as stack:
+            for provider in self.providers:
+                await stack.enter_async_context(provider.dispatcher.pooled())
+                provider.semaphore = asyncio.Semaphore(provider.spec.max_concurrency)
+            yield
+
+    async def _attempt(self, provider: Provider, wave: Wave, max_tokens: int) -> str:
+        start = time.monotonic()
+        try:
+            content = await provider.dispatcher.prompt(wave, provider.semaphore,
+                                                       min(max_tokens, provider.budget.max_tokens))
+        except asyncio.CancelledError:
+            # Lost to a hedge: how long it took so far is still a (lower bound) latency sample
+            provider.record(time.monotonic() - start, True)
+            raise
+        except Exception:
+            provider.record(time.monotonic() - start, False)
+            raise
+        provider.record(time.monotonic() - start, True)
+        return content
+
+    async def prompt(self, wave: Wave, semaphore: asyncio.Semaphore, max_tokens: int = 15000) -> str:
+        """
+        Send one wave, failing over and hedging as configured, and return the
+        job list JSON. ``wave.model`` is set to the model that answered.
+        """
+        ranked, healthy = self.rank(wave)
+        pending: dict[asyncio.Task, Provider] = {}
+        errors = []
+        tried = 0
+        hedged = False
+
+        def launch() -> None:
+            nonlocal tried
+            provider = ranked[tried]
+            tried += 1
+            pending[asyncio.create_task(self._attempt(provider, wave, max_tokens))] = provider
+
+        async with semaphore:
+            launch()
+            try:
+                while pending:
+                    can_hedge = self.hedge_after is not None and not hedged and tried < healthy
+                    done, _ = await asyncio.wait(pending, timeout=self.hedge_after if can_hedge else None,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        hedged = True
+                        slow = next(iter(pending.values()))
+                        logging.info(f"Wave of {len(wave)} slow on {slow.name}, hedging to {ranked[tried].name}")
+                        metrics.inc("llm_hedges_total", provider=ranked[tried].name)
+                        launch()
+                        continue
+
+                    for task in done:
+                        provider = pending.pop(task)
+                        try:
+                            content = task.result()
+                        except Exception as e:
+                            errors.append(f"{provider.name}: {e}")
+                            logging.warning(f"Wave of {len(wave)} failed on {provider.name}: {e}")
+                            continue
+                        # A hedge that finished too may have set its own model
+                        wave.model = provider.spec.model
+                        return content
+                    if not pending and tried < len(ranked):
+                        metrics.inc("llm_failovers_total", provider=ranked[tried].name)
+                        launch()
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        raise RuntimeError(f"Every provider failed for a wave of {len(wave)}: {'; '.join(errors)}")
+
+    async def stream(self, wave: Wave, semaphore: asyncio.Semaphore,
+                     on_job: Callable[[DTUJobPosting | None, Job], Awaitable[None] | None],
+                     max_tokens: int = 15000) -> list[DTUJobPosting]:
+        """
+        Stream one wave from the best provider, failing over while nothing was
+        handed over. Streams are not hedged, since two streams would save
+        every job twice.
+        """
+        ranked, _ = self.rank(wave)
+        errors = []
+        async with semaphore:
+            for provider in ranked:
+                start = time.monotonic()
+                try:
+                    unanswered = await provider.dispatcher.stream(wave, provider.semaphore, on_job,
+                                                                  min(max_tokens, provider.budget.max_tokens))
+                except Exception as e:
+                    provider.record(time.monotonic() - start, False)
+                    errors.append(f"{provider.name}: {e}")
+                    logging.warning(f"Wave of {len(wave)} failed on {provider.name}: {e}")
+                    metrics.inc("llm_failovers_total", provider=provider.name)
+                    continue
+                provider.record(time.monotonic() - start, len(unanswered) < len(wave))
+                return unanswered
+
+        raise RuntimeError(f"Every provider failed for a wave of {len(wave)}: {'; '.join(errors)}")
+
+    def describe(self) -> list[str]:
+        return [provider.describe() for provider in self.providers]
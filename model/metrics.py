@@ -0,0 +1,259 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+NAMESPACE = "job_analyzer"
+
+# Upper bounds in seconds, from a cache hit to a slow LLM wave
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# USD per million prompt and completion tokens
+PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "deepseek-chat": (0.27, 1.10),
+}
+# The Batch API bills half the synchronous price
+BATCH_DISCOUNT = 0.5
+
+HELP = {
+    "stage_seconds": "Time spent in each stage",
+    "http_requests_total": "HTTP requests by source and status",
+    "http_retries_total": "HTTP requests retried",
+    "http_cache_total": "Conditional requests answered from the HTTP cache (hit) or downloaded (miss)",
+    "llm_requests_total": "LLM requests by outcome",
+    "llm_retries_total": "LLM requests retried, by reason",
+    "llm_tokens_total": "Tokens reported by the API usage fields",
+    "llm_cost_usd_total": "Estimated cost of the reported tokens",
+    "llm_hedges_total": "Waves also sent to a second provider because the first was slow",
+    "llm_failovers_total": "Waves sent to another provider after one failed",
+    "llm_provider_latency_seconds": "Recent p90 latency of each provider",
+    "llm_provider_error_rate": "Recent share of failed requests of each provider",
+    "llm_cache_total": "Postings answered from the response cache (hit) or sent to the model (miss)",
+    "jobs_saved_total": "Jobs upserted into the job store",
+    "validation_errors_total": "Responses that did not validate as a job list",
+    "duplicates_total": "Near-duplicate postings found",
+    "compaction_tokens_total": "Estimated description tokens before (original) and after (compacted) compaction",
+    "pipeline_queue_depth": "Items waiting in front of each pipeline stage",
+    "pipeline_throughput_per_minute": "Items each pipeline stage finished per minute",
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int, api: str = "chat") -> float:
+    """Estimated USD cost of a request, or 0 for a model without a known price."""
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    total = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return total * BATCH_DISCOUNT if api == "batch" else total
+
+
+class Histogram:
+    """Observation counts in fixed buckets, plus their sum."""
+
+    def __init__(self, buckets: tuple[float, ...] = TIME_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self) -> 'Histogram':
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.sum = self.sum
+        histogram.count = self.count
+        return histogram
+
+    def quantile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the ``fraction`` quantile (inf past the last bucket)."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms keyed by name and labels.
+
+    Recording is a dictionary update under a lock, cheap enough to stay on in
+    every run. The registry is written out as a Prometheus text file (for the
+    node exporter's textfile collector) or as a JSON run report.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.gauges: dict[tuple[str, Labels], float] = {}
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timed(self, stage: str, **labels) -> Iterator[None]:
+        """Record the duration of the block in ``stage_seconds``, failed or not."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def record_usage(self, model: str, usage, api: str = "chat") -> None:
+        """Count the tokens and estimated cost of an API ``usage`` object or dictionary."""
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        self.inc("llm_tokens_total", prompt_tokens, model=model, api=api, kind="prompt")
+        self.inc("llm_tokens_total", completion_tokens, model=model, api=api, kind="completion")
+        self.inc("llm_cost_usd_total", cost(model, prompt_tokens, completion_tokens, api), model=model, api=api)
+
+    def total(self, name: str, **labels) -> float:
+        """Sum of a counter over every label set that includes ``labels``."""
+        wanted = set(_labels(labels))
+        with self._lock:
+            return sum(value for (metric, key), value in self.counters.items()
+                       if metric == name and wanted <= set(key))
+
+    def hit_ratio(self, name: str) -> float | None:
+        hits = self.total(name, result="hit")
+        lookups = hits + self.total(name, result="miss")
+        return hits / lookups if lookups else None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+        pairs = labels + (extra,) if extra else labels
+        if not pairs:
+            return ""
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def to_prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(((key, h.copy()) for key, h in self.histograms.items()), key=lambda item: item[0])
+
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str) -> str:
+            full = f"{NAMESPACE}_{name}"
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {full} {HELP[name]}")
+                lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for (name, labels), value in counters:
+            lines.append(f"{describe(name, 'counter')}{self._format_labels(labels)} {_number(value)}")
+        for (name, labels), value in gauges:
+            lines.append(f"{describe(name, 'gauge')}{self._format_labels(labels)} {_number(value)}")
+        for (name, labels), histogram in histograms:
+            full = describe(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                lines.append(f"{full}_bucket{self._format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{full}_sum{self._format_labels(labels)} {_number(histogram.sum)}")
+            lines.append(f"{full}_count{self._format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        """A run report: raw metrics plus per-model cost and cache hit ratios."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            gauges = [{"name": name, "labels": dict(labels), "value": value}
+                      for (name, labels), value in sorted(self.gauges.items())]
+            histograms = [
+                {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                 "mean": h.sum / h.count if h.count else 0.0,
+                 "p50": h.quantile(0.5), "p90": h.quantile(0.9), "p99": h.quantile(0.99)}
+                for (name, labels), h in sorted(((key, h.copy()) for key, h in self.histograms.items()),
+                                                key=lambda item: item[0])
+            ]
+
+        models: dict[str, dict] = {}
+        for counter in counters:
+            if counter["name"] not in ("llm_tokens_total", "llm_cost_usd_total"):
+                continue
+            model = models.setdefault(counter["labels"]["model"],
+                                      {"prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+            if counter["name"] == "llm_cost_usd_total":
+                model["cost_usd"] += counter["value"]
+            else:
+                model[f"{counter['labels']['kind']}_tokens"] += int(counter["value"])
+
+        return {
+            "started": self.started,
+            "duration": time.time() - self.started,
+            "models": models,
+            "cost_usd": sum(model["cost_usd"] for model in models.values()),
+            "cache_hit_ratio": {"http": self.hit_ratio("http_cache_total"), "llm": self.hit_ratio("llm_cache_total")},
+            "retries": {"http": self.total("http_retries_total"), "llm": self.total("llm_retries_total")},
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms,
+        }
+
+    def write(self, path: Path | str) -> None:
+        """Write a JSON report for ``.json`` paths, otherwise a Prometheus text file, atomically."""
+        path = Path(path)
+        text = json.dumps(self.to_dict(), indent=2) if path.suffix == '.json' else self.to_prometheus()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(text, encoding='utf-8')
+        tmp_path.replace(path)
+
+
+# Process-wide registry every instrumented module records into
+metrics = MetricsRegistry()
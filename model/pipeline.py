@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .fetch_engine import FetchEngine
+from .Job import Job
+from .job_posting import DTUJobPosting
+from .llm_dispatcher import LLMDispatcher
+from .metrics import metrics
+from .run_checkpoint import RunCheckpoint
+from .wave_packer import Wave, WavePacker
+
+# Marks the end of a stage's input
+DONE = None
+
+
+@dataclass
+class StageStats:
+    """Counters of one pipeline stage and the depth of the queue feeding it."""
+    name: str
+    queue: asyncio.Queue | None = None
+    processed: int = 0
+    failed: int = 0
+    busy: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        self.busy += seconds
+        if ok:
+            self.processed += 1
+        else:
+            self.failed += 1
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def throughput(self) -> float:
+        """Items finished per minute since the pipeline started."""
+        elapsed = time.monotonic() - self.started
+        return (self.processed + self.failed) / elapsed * 60 if elapsed > 0 else 0.0
+
+    def describe(self) -> str:
+        if self.queue is None:
+            queue = ""
+        elif self.queue.maxsize:
+            queue = f"queue {self.depth}/{self.queue.maxsize}, "
+        else:
+            queue = f"{self.depth} queued, "
+        return (f"{self.name}: {queue}{self.processed} done, {self.failed} failed, "
+                f"{self.throughput():.1f}/min, {self.busy:.1f}s busy")
+
+
+class Pipeline:
+    """
+    Fetch, extract, analyze and persist postings as overlapping stages.
+
+    Stages are joined by bounded queues, so a wave is analyzed while the next
+    postings are still being scraped, and a slow stage holds back the ones
+    feeding it instead of letting work pile up in memory.
+
+    ``prepare(posting)`` runs on every extracted posting and returns False to
+    keep it out of the analysis (e.g. when it was answered from a cache).
+    ``persist(wave, content)`` saves the response of a wave (``wave.model``
+    tells which model answered). With ``persist_job(posting, job, model)``,
+    waves are streamed instead and every job is saved as soon as its object
+    is complete; postings a cut-off stream left
+    unanswered are sent again, up to ``resends`` times. These callbacks run on
+    the event loop thread, so they may use the caller's SQLite connections.
+
+    With a ``checkpoint``, every posting's progress is recorded as it moves
+    through the stages: descriptions and responses are staged on disk before
+    they are passed on, so an interrupted run can be resumed.
+    """
+
+    def __init__(self, engine: FetchEngine, packer: WavePacker, dispatcher: LLMDispatcher,
+                 persist: Callable[[Wave, str], None], prepare: Callable[[DTUJobPosting], bool] | None = None,
+                 max_tokens: int = 15000, queue_size: int = 20, flush_after: float = 5.0,
+                 report_every: float = 30.0,
+                 persist_job: Callable[[DTUJobPosting | None, Job, str | None], None] | None = None,
+                 resends: int = 2,
+                 checkpoint: RunCheckpoint | None = None) -> None:
+        if queue_size < 1:
+            raise ValueError("Queue size must be at least 1")
+
+        self.engine = engine
+        self.packer = packer
+        self.dispatcher = dispatcher
+        self.persist = persist
+        self.prepare = prepare
+        self.persist_job = persist_job
+        self.resends = resends
+        self.checkpoint = checkpoint
+        self.max_tokens = max_tokens
+        self.queue_size = queue_size
+        self.flush_after = flush_after
+        self.report_every = report_every
+        self.stats: dict[str, StageStats] = {}
+
+    async def _fetch_stage(self, uris: asyncio.Queue, pages: asyncio.Queue) -> None:
+        stats = self.stats['fetch']
+        semaphore = asyncio.Semaphore(self.engine.max_concurrency)
+
+        async def worker(client) -> None:
+            while True:
+                try:
+                    uri = uris.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.monotonic()
+                html = await self.engine.fetch(client, semaphore, uri)
+                stats.record(time.monotonic() - start, html is not None)
+                await pages.put((uri, html))
+
+        async with self.engine.open_client() as client:
+            await asyncio.gather(*(worker(client) for _ in range(self.engine.max_concurrency)))
+        await pages.put(DONE)
+
+    async def _extract_stage(self, pages: asyncio.Queue, postings: asyncio.Queue,
+                             staged: list[DTUJobPosting]) -> None:
+        stats = self.stats['extract']
+
+        async def offer(posting: DTUJobPosting) -> None:
+            if self.prepare is None or self.prepare(posting):
+                await postings.put(posting)
+            elif self.checkpoint is not None:
+                self.checkpoint.skipped([posting.uri])
+
+        # Postings extracted by an earlier, interrupted run
+        for posting in staged:
+            await offer(posting)
+
+        while (item := await pages.get()) is not DONE:
+            uri, html = item
+            start = time.monotonic()
+            posting = DTUJobPosting(uri, self.engine.cache)
+            try:
+                if html is None:
+                    # Fall back to the Cloudflare-aware scraper for pages the engine could not get
+                    await asyncio.to_thread(posting.extract_job_description)
+                else:
+                    await asyncio.to_thread(posting.parse_html, html)
+            except Exception as e:
+                logging.error(f"Failed to process {uri}: {str(e)}")
+                stats.record(time.monotonic() - start, ok=False)
+                continue
+
+            if not posting.job_description:
+                logging.warning(f"Skipping {uri}: Empty job description")
+                stats.record(time.monotonic() - start, ok=False)
+                if self.checkpoint is not None:
+                    self.checkpoint.skipped([uri])
+                continue
+
+            stats.record(time.monotonic() - start)
+            if self.checkpoint is not None:
+                self.checkpoint.fetched(posting)
+            await offer(posting)
+        await postings.put(DONE)
+
+    async def _analyze_stage(self, postings: asyncio.Queue, responses: asyncio.Queue) -> None:
+        stats = self.stats['analyze']
+        # Bounds the waves in flight, so a slow model stops the stage from draining its queue
+        in_flight = asyncio.Semaphore(self.dispatcher.max_concurrency)
+        requests = asyncio.Semaphore(self.dispatcher.max_concurrency)
+        tasks = set()
+
+        async def analyze(wave: Wave) -> None:
+            start = time.monotonic()
+            try:
+                content = await self.dispatcher.prompt(wave, requests, self.max_tokens)
+                if self.checkpoint is not None:
+                    self.checkpoint.analyzed(wave.uris, content)
+            except Exception as e:
+                logging.error(f"Wave of {len(wave)} postings failed: {e}")
+                content = None
+            finally:
+                in_flight.release()
+            stats.record(time.monotonic() - start, content is not None)
+            await responses.put((wave, content, wave.model))
+
+        async def analyze_streaming(wave: Wave, resend: int) -> None:
+            start = time.monotonic()
+            unanswered = None
+            try:
+                unanswered = await self.dispatcher.stream(
+                    wave, requests, lambda posting, job: responses.put((posting, job, wave.model)), self.max_tokens
+                )
+            except Exception as e:
+                logging.error(f"Wave of {len(wave)} postings failed: {e}")
+            finally:
+                in_flight.release()
+            stats.record(time.monotonic() - start, unanswered is not None)
+            if not unanswered:
+                return
+
+            logging.warning(f"Streamed wave saved {len(wave) - len(unanswered)} of {len(wave)} postings; "
+                            f"unanswered: {', '.join(posting.uri for posting in unanswered)}")
+            if resend < self.resends:
+                retry = self.packer.new_wave()
+                for posting in unanswered:
+                    self.packer.add(retry, posting, *self.packer.measure(posting))
+                await send(retry, resend + 1)
+
+        async def send(wave: Wave, resend: int = 0) -> None:
+            await in_flight.acquire()
+            logging.info(f"Sending wave: {self.packer.describe(wave)}")
+            if self.persist_job is None:
+                task = asyncio.create_task(analyze(wave))
+            else:
+                task = asyncio.create_task(analyze_streaming(wave, resend))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        wave = self.packer.new_wave()
+        while True:
+            try:
+                posting = await asyncio.wait_for(postings.get(), self.flush_after)
+            except asyncio.TimeoutError:
+                # Nothing new for a while: send what we have rather than idle
+                if len(wave):
+                    await send(wave)
+                    wave = self.packer.new_wave()
+                continue
+
+            if posting is DONE:
+                break
+
+            input_tokens, output_tokens = self.packer.measure(posting)
+            if len(wave) and not self.packer.fits(wave, input_tokens, output_tokens):
+                await send(wave)
+                wave = self.packer.new_wave()
+            self.packer.add(wave, posting, input_tokens, output_tokens)
+
+        if len(wave):
+            await send(wave)
+        # Streamed waves may send their unanswered postings again while we wait
+        while tasks:
+            await asyncio.gather(*tasks)
+        await responses.put(DONE)
+
+    async def _persist_stage(self, responses: asyncio.Queue) -> None:
+        stats = self.stats['persist']
+        while (item := await responses.get()) is not DONE:
+            wave, content, model = item
+            if content is None:
+                continue
+            start = time.monotonic()
+            try:
+                if isinstance(content, Job):
+                    # A streamed job, with the posting it answers in place of the wave
+                    self.persist_job(wave, content, model)
+                    uris = [wave.uri] if wave is not None else []
+                else:
+                    self.persist(wave, content)
+                    uris = wave.uris
+                stats.record(time.monotonic() - start)
+                if self.checkpoint is not None:
+                    self.checkpoint.saved(uris)
+            except Exception as e:
+                logging.error(f"Failed to save results: {str(e)}")
+                stats.record(time.monotonic() - start, ok=False)
+                if self.checkpoint is not None and not isinstance(content, Job):
+                    # Analyze the wave again on resume rather than save the same response again
+                    self.checkpoint.requeue(wave.uris)
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_every)
+            self.log_stats()
+
+    def log_stats(self) -> None:
+        for stats in self.stats.values():
+            logging.info(stats.describe())
+            metrics.set("pipeline_queue_depth", stats.depth, stage=stats.name)
+            metrics.set("pipeline_throughput_per_minute", stats.throughput(), stage=stats.name)
+
+    async def run_async(self, uris: list[str], staged: list[DTUJobPosting] = ()) -> dict[str, StageStats]:
+        """
+        Run every URI through all stages and return the stats of each stage.
+        ``staged`` postings are already extracted and skip the fetch stage.
+        """
+        source = asyncio.Queue()
+        for uri in dict.fromkeys(uris):
+            source.put_nowait(uri)
+        pages = asyncio.Queue(self.queue_size)
+        postings = asyncio.Queue(self.queue_size)
+        responses = asyncio.Queue(self.queue_size)
+
+        self.stats = {
+            'fetch': StageStats('fetch', source),
+            'extract': StageStats('extract', pages),
+            'analyze': StageStats('analyze', postings),
+            'persist': StageStats('persist', responses),
+        }
+
+        stages = [
+            asyncio.create_task(self._fetch_stage(source, pages)),
+            asyncio.create_task(self._extract_stage(pages, postings, list(staged))),
+            asyncio.create_task(self._analyze_stage(postings, responses)),
+            asyncio.create_task(self._persist_stage(responses)),
+        ]
+        reporter = asyncio.create_task(self._report())
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            # A failed stage would leave its neighbours blocked on a queue forever
+            for task in stages + [reporter]:
+                task.cancel()
+        self.log_stats()
+        return self.stats
+
+    def run(self, uris: list[str], staged: list[DTUJobPosting] = ()) -> dict[str, StageStats]:
+        """Blocking wrapper around :meth:`run_async` with a connection pool for this event loop."""
+        async def run() -> dict[str, StageStats]:
+            async with self.dispatcher.pooled():
+                return await self.run_async(uris, staged)
+
+        return asyncio.run(run())
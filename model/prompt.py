@@ -1,9 +1,16 @@
+import hashlib
+import json
+import logging
+
 from openai import OpenAI
+from openai.lib._parsing import type_to_response_format_param
+from pydantic import ValidationError
 import openai
 
 from .batch_request import Message
 
-from model import JobList
+from .Job import Job, JobList
+from .metrics import metrics
 
 class Prompt:
 
@@ -30,6 +37,15 @@ class Prompt:
     "If some of the information is missing, please write 'Not mentioned'." \
     "You should only reply with the JSON content, without any additional text."
 
+    # Changes whenever the instructions change, so cached answers to an older prompt are not reused
+    PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
+
+    # Structured output schema for requests that stream raw chunks instead of using parse()
+    RESPONSE_FORMAT = type_to_response_format_param(JobList)
+
+    # Backends without structured outputs only get JSON mode, so they are shown the schema instead
+    JSON_OBJECT_INSTRUCTIONS = "\n\nReply with a single JSON object, with the jobs in its \"jobs\" array, " \
+        "that validates against this JSON schema (use these exact field names):\n" + json.dumps(JobList.model_json_schema())
 
     def __init__(self, client: OpenAI):
         """Initialize the Prompt class with an OpenAI client."""
@@ -38,24 +54,63 @@ class Prompt:
 
         self.client = client
 
-    def prompt(self, user_messages: list[Message], model: str = "gpt-4o") -> str:
+    @classmethod
+    def build_messages(cls, user_messages: list[Message], structured: bool = True) -> list[dict]:
+        """
+        Prepend the system prompt and convert the messages to API dictionaries.
+        Without ``structured`` outputs, the system prompt also spells out the schema.
+        """
+        system_prompt = cls.SYSTEM_PROMPT if structured else cls.SYSTEM_PROMPT + cls.JSON_OBJECT_INSTRUCTIONS
+        system_message = Message("system", system_prompt)
+        messages = [system_message] + user_messages
+        return [message.to_dict() for message in messages]
+
+    def prompt(self, user_messages: list[Message], model: str = "gpt-4o", max_tokens: int = 15000) -> str:
         """
         Send a prompt to OpenAI and get the response.
         
         Args:
             message: The message to send to the model
             model: The model to use (defaults to gpt-3.5-turbo)
+            max_tokens: Upper limit on the number of tokens in the response
             
         Returns:
             str: The model's response
         """
-        system_message = Message("system", self.SYSTEM_PROMPT)
-        messages = [system_message] + user_messages
-        messages = [message.to_dict() for message in messages]
+        messages = self.build_messages(user_messages)
         
-        response = self.client.beta.chat.completions.parse(model=model,messages=messages,max_tokens=15000,response_format=JobList)
+        try:
+            with metrics.timed("prompt", model=model):
+                response = self.client.beta.chat.completions.parse(model=model,messages=messages,max_tokens=max_tokens,response_format=JobList)
+        except openai.OpenAIError:
+            metrics.inc("llm_requests_total", model=model, api="chat", outcome="error")
+            raise
+        metrics.inc("llm_requests_total", model=model, api="chat", outcome="ok")
+        metrics.record_usage(model, response.usage)
 
         if response.choices is None or len(response.choices) == 0:
             raise ValueError("No response received from OpenAI")
     
-        return response.choices[0].message.content
\ No newline at end of file
+        return response.choices[0].message.content
+
+    @staticmethod
+    def normalize_content(content: str) -> str:
+        """
+        Turn a JSON mode reply (a job array or an object with a "jobs" array)
+        into job list JSON. Raises ValueError if it does not validate.
+        """
+        data = json.loads(content)
+        if isinstance(data, list):
+            data = {"jobs": data}
+        return JobList.model_validate(data).model_dump_json()
+
+    @staticmethod
+    def validate_job(item: dict) -> Job | None:
+        """Validate one streamed job object, or log and return None."""
+        try:
+            with metrics.timed("validation"):
+                return Job.model_validate(item)
+        except ValidationError as e:
+            metrics.inc("validation_errors_total")
+            logging.warning(f"Dropping an invalid job from a streamed response: {e.error_count()} errors")
+            return None
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Reservation-based token bucket for asyncio code.
+
+    ``rate`` tokens are added per second up to ``capacity``. A caller takes its
+    tokens immediately and, if that leaves the bucket in debt, sleeps until the
+    debt is repaid, so concurrent callers are spaced out in arrival order without
+    needing a lock bound to a particular event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` and return how many seconds the caller must wait."""
+        self._refill()
+        self.tokens -= tokens
+        return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def refund(self, tokens: float) -> None:
+        """Give back tokens that were reserved but not used (negative to charge more)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def limit(self, available: float, reset_after: float | None = None) -> None:
+        """
+        Lower the bucket to what the server reports as still available. With
+        nothing left, hold callers back until the server's window resets.
+        """
+        self._refill()
+        self.tokens = min(self.tokens, available)
+        if available <= 0 and reset_after:
+            self.tokens = min(self.tokens, -reset_after * self.rate)
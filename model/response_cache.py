@@ -0,0 +1,129 @@
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+from .Job import Job, JobList
+from .job_posting import DTUJobPosting
+from .metrics import metrics
+from .uri_memory import normalize_uri
+
+
+class ResponseCache:
+    """
+    Persistent cache of per-posting LLM results.
+
+    Entries are keyed on a hash of the model, the system prompt version and the
+    normalized job description, so an unchanged posting is never billed twice,
+    even under a different URL. Entries expire after ``ttl`` seconds. Beyond
+    ``max_entries``, the least recently used ones are evicted.
+    """
+
+    DATABASE = Path(__file__).parent.parent / '.data' / 'cache' / 'llm.db'
+
+    def __init__(self, path: Path | None = None, prompt_version: str = "",
+                 ttl: float = 30 * 24 * 3600, max_entries: int = 50_000) -> None:
+        self.path = Path(path) if path is not None else self.DATABASE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.prompt_version = prompt_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "model TEXT NOT NULL, "
+            "job TEXT NOT NULL, "
+            "created REAL NOT NULL, "
+            "accessed REAL NOT NULL"
+            ")"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.connection.commit()
+
+    @staticmethod
+    def normalize(description: str) -> str:
+        return " ".join(description.split()).casefold()
+
+    def key(self, model: str, description: str) -> str:
+        material = "\0".join([model, self.prompt_version, self.normalize(description)])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, model: str, description: str) -> Job | None:
+        return self.get_any([model], description)
+
+    def get_any(self, models: list[str], description: str) -> Job | None:
+        """The cached job of the first of ``models`` that answered the description, counted as one lookup."""
+        for model in models:
+            job = self._lookup(model, description)
+            if job is not None:
+                self.hits += 1
+                metrics.inc("llm_cache_total", result="hit")
+                return job
+
+        self.misses += 1
+        metrics.inc("llm_cache_total", result="miss")
+        return None
+
+    def _lookup(self, model: str, description: str) -> Job | None:
+        key = self.key(model, description)
+        row = self.connection.execute(
+            "SELECT job, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None or time.time() - row[1] > self.ttl:
+            if row is not None:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.connection.commit()
+            return None
+
+        self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return Job.model_validate_json(row[0])
+
+    def put(self, model: str, description: str, job: Job) -> None:
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, model, job, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (self.key(model, description), model, job.model_dump_json(), now, now)
+        )
+        self._evict()
+        self.connection.commit()
+
+    def put_wave(self, model: str, postings: list[DTUJobPosting], job_list: JobList) -> int:
+        """
+        Cache the jobs of a wave response under the postings they answer.
+
+        Jobs are matched to postings by apply URI only, as streamed jobs are (see
+        :meth:`Wave.match`): a job matching no posting is not cached, since one
+        cached under the wrong posting would be served for the whole TTL.
+        Returns the number of cached jobs.
+        """
+        by_uri = {normalize_uri(posting.uri): posting for posting in postings}
+        cached = 0
+        for job in job_list.jobs:
+            posting = by_uri.pop(normalize_uri(job.apply_uri), None)
+            if posting is not None:
+                self.put(model, posting.job_description, job)
+                cached += 1
+        return cached
+
+    def _evict(self) -> None:
+        self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        count = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable
+
+from .job_posting import DTUJobPosting
+from .uri_memory import normalize_uri
+
+STATES = ('queued', 'fetched', 'analyzed', 'saved', 'skipped')
+UNFINISHED = ('queued', 'fetched', 'analyzed')
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    tmp_path.replace(path)
+
+
+class RunCheckpoint:
+    """
+    Crash-safe progress of an analyze.py run, one state per posting URI.
+
+    Every URI of the run starts ``queued``. It is ``fetched`` once its
+    description is staged on disk, ``analyzed`` once the model's response
+    for it is staged too, and ``saved`` once its jobs are stored (or
+    ``skipped`` when there was nothing to analyze). States live in SQLite in
+    WAL mode and files are staged before their state changes, so a killed
+    run loses at most the step it was in. Resuming saves the staged
+    responses, analyzes the staged descriptions, and fetches only the URIs
+    still queued.
+    """
+
+    BASE = Path(__file__).parent.parent / '.data' / 'checkpoint'
+
+    def __init__(self, directory: Path | None = None) -> None:
+        self.directory = Path(directory) if directory is not None else self.BASE
+        self.descriptions = self.directory / 'descriptions'
+        self.responses = self.directory / 'responses'
+        for path in (self.descriptions, self.responses):
+            path.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.directory / 'run.db')
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "uri TEXT PRIMARY KEY, "
+            "original TEXT NOT NULL, "
+            "position INTEGER NOT NULL, "
+            "state TEXT NOT NULL, "
+            "response TEXT, "
+            "updated REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS postings_state ON postings (state)")
+        self.connection.commit()
+
+    @staticmethod
+    def _name(uri: str) -> str:
+        return hashlib.blake2b(normalize_uri(uri).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _set_state(self, uris: Iterable[str], state: str, response: str | None = None) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE postings SET state = ?, response = ?, updated = ? WHERE uri = ?",
+                ((state, response, now, normalize_uri(uri)) for uri in uris)
+            )
+
+    def start(self, uris: list[str]) -> None:
+        """Begin a new run of ``uris``, discarding whatever an earlier run left."""
+        with self.connection:
+            self.connection.execute("DELETE FROM postings")
+            now = time.time()
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO postings (uri, original, position, state, updated) VALUES (?, ?, ?, 'queued', ?)",
+                ((normalize_uri(uri), uri, position, now) for position, uri in enumerate(uris))
+            )
+        for path in list(self.descriptions.iterdir()) + list(self.responses.iterdir()):
+            path.unlink()
+
+    def counts(self) -> dict[str, int]:
+        rows = self.connection.execute("SELECT state, COUNT(*) FROM postings GROUP BY state")
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def unfinished(self) -> int:
+        """Number of URIs of the run not saved or skipped yet."""
+        counts = self.counts()
+        return sum(counts[state] for state in UNFINISHED)
+
+    def uris(self, state: str) -> list[str]:
+        """URIs in ``state``, in the order of the run's input."""
+        rows = self.connection.execute("SELECT original FROM postings WHERE state = ? ORDER BY position", (state,))
+        return [original for (original,) in rows]
+
+    def fetched(self, posting: DTUJobPosting) -> None:
+        """Stage the extracted description of a posting."""
+        record = {"uri": posting.uri, "blocks": posting.blocks, "job_description": posting.job_description}
+        _write_atomically(self.descriptions / f"{self._name(posting.uri)}.json", json.dumps(record))
+        self._set_state([posting.uri], 'fetched')
+
+    def staged(self) -> list[DTUJobPosting]:
+        """The fetched postings, rebuilt from their staged descriptions."""
+        postings = []
+        for uri in self.uris('fetched'):
+            path = self.descriptions / f"{self._name(uri)}.json"
+            if not path.exists():
+                self._set_state([uri], 'queued')
+                continue
+            record = json.loads(path.read_text(encoding='utf-8'))
+            posting = DTUJobPosting(uri)
+            posting.blocks = record["blocks"]
+            posting.job_description = record["job_description"]
+            postings.append(posting)
+        return postings
+
+    def analyzed(self, uris: list[str], content: str) -> None:
+        """Stage the response to a wave of postings before it is saved."""
+        name = f"{self._name(' '.join(sorted(uris)))}.json"
+        _write_atomically(self.responses / name, json.dumps({"uris": uris, "content": content}))
+        self._set_state(uris, 'analyzed', name)
+
+    def staged_responses(self) -> list[tuple[list[str], str]]:
+        """(URIs, response) of every staged response not saved yet."""
+        names = [name for (name,) in self.connection.execute(
+            "SELECT DISTINCT response FROM postings WHERE state = 'analyzed'"
+        )]
+        responses = []
+        for name in names:
+            path = self.responses / name
+            uris = [original for (original,) in self.connection.execute(
+                "SELECT original FROM postings WHERE state = 'analyzed' AND response = ? ORDER BY position", (name,)
+            )]
+            if not path.exists():
+                self.requeue(uris)
+                continue
+            responses.append((uris, json.loads(path.read_text(encoding='utf-8'))["content"]))
+        return responses
+
+    def requeue(self, uris: list[str]) -> None:
+        """Send postings back to be analyzed again, e.g. after an invalid response."""
+        self._move(uris, 'fetched')
+
+    def saved(self, uris: list[str]) -> None:
+        self._move(uris, 'saved')
+
+    def skipped(self, uris: list[str]) -> None:
+        self._move(uris, 'skipped')
+
+    def _move(self, uris: list[str], state: str) -> None:
+        """Change the state of postings, dropping the staged files they no longer need."""
+        if not uris:
+            return
+        responses = {response for (response,) in self.connection.execute(
+            f"SELECT response FROM postings WHERE response IS NOT NULL AND uri IN ({', '.join('?' * len(uris))})",
+            [normalize_uri(uri) for uri in uris]
+        )}
+        self._set_state(uris, state)
+        if state != 'fetched':
+            for uri in uris:
+                (self.descriptions / f"{self._name(uri)}.json").unlink(missing_ok=True)
+        for response in responses:
+            if not self.connection.execute("SELECT 1 FROM postings WHERE response = ?", (response,)).fetchone():
+                (self.responses / response).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,192 @@
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import cloudscraper
+from requests import Response, Session
+
+from .http_cache import HttpCache
+from .metrics import metrics
+
+
+class SessionPool:
+    """
+    Bounded pool of reusable cloudscraper sessions.
+
+    Sessions keep their connections alive between requests and share one
+    persisted cookie jar and User-Agent, so a solved Cloudflare challenge
+    (``cf_clearance``) is reused by every session and survives restarts.
+    A session that keeps failing is evicted and replaced by a fresh one.
+    """
+
+    COOKIES = Path(__file__).parent.parent / '.data' / 'sessions' / 'cookies.json'
+
+    # Responses that usually mean the session was challenged or throttled
+    UNHEALTHY_STATUSES = {403, 429, 503}
+
+    def __init__(self, size: int = 4, max_failures: int = 3, cookie_file: Path | None = None) -> None:
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.size = size
+        self.max_failures = max_failures
+        self.cookie_file = Path(cookie_file) if cookie_file is not None else self.COOKIES
+
+        self._condition = threading.Condition()
+        self._idle: list[Session] = []
+        self._created = 0
+        self._failures: dict[int, int] = {}
+
+        self._state = self._load_state()
+
+    def _load_state(self) -> dict:
+        if self.cookie_file.exists():
+            try:
+                with open(self.cookie_file, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {'user_agent': None, 'cookies': []}
+
+    def _save_state(self, session: Session) -> None:
+        """Persist the cookies and User-Agent of a session that just succeeded."""
+        cookies = [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'expires': cookie.expires,
+            }
+            for cookie in session.cookies
+        ]
+        state = {'user_agent': session.headers.get('User-Agent'), 'cookies': cookies}
+        with self._condition:
+            if state == self._state:
+                return
+            self._state = state
+            self.cookie_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cookie_file, 'w') as f:
+                json.dump(self._state, f, indent=2)
+
+    def _create_session(self) -> Session:
+        session = cloudscraper.create_scraper()
+        # Clearance cookies are only honoured together with the User-Agent that earned them
+        if self._state.get('user_agent'):
+            session.headers['User-Agent'] = self._state['user_agent']
+        for cookie in self._state.get('cookies', []):
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                path=cookie['path'], expires=cookie['expires'])
+        return session
+
+    def _acquire(self) -> Session:
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                self._condition.wait()
+
+        try:
+            return self._create_session()
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, session: Session, healthy: bool) -> None:
+        with self._condition:
+            key = id(session)
+            if healthy:
+                self._failures.pop(key, None)
+            else:
+                self._failures[key] = self._failures.get(key, 0) + 1
+
+            if self._failures.get(key, 0) >= self.max_failures:
+                # Evict: the next acquire creates a replacement with the shared cookies
+                self._failures.pop(key, None)
+                self._created -= 1
+                session.close()
+            else:
+                self._idle.append(session)
+            self._condition.notify()
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        """Borrow a session. It counts as failed if the block raises."""
+        session = self._acquire()
+        healthy = False
+        try:
+            yield session
+            healthy = True
+        finally:
+            self._release(session, healthy)
+
+    def get(self, url: str, cache: HttpCache | None = None, **kwargs) -> Response:
+        """
+        GET ``url`` on a pooled session, tracking the session's health.
+
+        With a ``cache``, the request is made conditional on the cached copy and a
+        304 is answered from disk as a 200 with the cached body.
+        """
+        if cache is not None:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **cache.conditional_headers(url)}
+
+        session = self._acquire()
+        healthy = False
+        try:
+            response = session.get(url, **kwargs)
+            metrics.inc("http_requests_total", source="session", status=response.status_code)
+            healthy = response.status_code not in self.UNHEALTHY_STATUSES
+            if healthy:
+                self._save_state(session)
+        finally:
+            self._release(session, healthy)
+
+        if cache is None:
+            return response
+
+        if response.status_code == 304:
+            cached = cache.load(url)
+            if cached is None:
+                # Validators without a body: ask again unconditionally, and store the answer.
+                # Passing the cache on would only make the request conditional again.
+                headers = dict(kwargs['headers'])
+                headers.pop('If-None-Match', None)
+                headers.pop('If-Modified-Since', None)
+                response = self.get(url, **{**kwargs, 'headers': headers})
+            else:
+                metrics.inc("http_cache_total", result="hit")
+                response.status_code = 200
+                response._content, response.encoding = cached
+                return response
+        if response.status_code == 200:
+            metrics.inc("http_cache_total", result="miss")
+            cache.store(url, response.content, response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'), response.encoding)
+        return response
+
+    def close(self) -> None:
+        with self._condition:
+            for session in self._idle:
+                session.close()
+            self._created -= len(self._idle)
+            self._idle.clear()
+
+
+_shared_pool: SessionPool | None = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool() -> SessionPool:
+    """Return the process-wide session pool used by the scraper and job postings."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SessionPool()
+        return _shared_pool
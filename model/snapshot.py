@@ -0,0 +1,264 @@
+import json
+import mmap
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from .Job import Job, JobType
+from .job_store import parse_date
+
+MAGIC = b"JOBSNAP1"
+VERSION = 1
+
+DICTIONARY_COLUMNS = ("job_type", "company_name", "location", "language", "contract")
+STRING_COLUMNS = ("published", "deadline", "start", "job_title", "description", "contacts",
+                  "cv_photo_details", "apply_uri")
+LIST_COLUMNS = ("requirements", "key_skills")
+# Parsed dates as days since 1970-01-01, for range scans without decoding strings
+DAY_COLUMNS = {"deadline_day": "deadline", "published_day": "published"}
+
+NO_DAY = -(2 ** 31)
+EPOCH = date(1970, 1, 1)
+
+
+def to_day(text: str) -> int:
+    iso = parse_date(text)
+    return (date.fromisoformat(iso) - EPOCH).days if iso else NO_DAY
+
+
+class _Writer:
+    """Appends 8-byte aligned sections to a snapshot body and remembers where they are."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.size = 0
+
+    def section(self, data: bytes | array) -> list[int]:
+        if isinstance(data, array):
+            if sys.byteorder != 'little':
+                data = array(data.typecode, data)
+                data.byteswap()
+            data = data.tobytes()
+        offset = self.size
+        self.chunks.append(data)
+        padding = -len(data) % 8
+        self.chunks.append(b"\0" * padding)
+        self.size += len(data) + padding
+        return [offset, len(data)]
+
+    def strings(self, values: list[str]) -> dict:
+        offsets = array('Q', [0])
+        blob = bytearray()
+        for value in values:
+            blob += value.encode('utf-8')
+            offsets.append(len(blob))
+        return {"offsets": self.section(offsets), "data": self.section(bytes(blob))}
+
+
+def write_snapshot(jobs: Iterable[Job], path: Path | str) -> int:
+    """
+    Write jobs as a columnar snapshot and return the number of rows.
+
+    Enums and repetitive fields are dictionary-encoded, strings are stored as
+    one UTF-8 blob with an offset array, and lists as offsets into a string
+    column of their items. Every section is 8-byte aligned so the file can be
+    memory-mapped and read in place by :class:`Snapshot`.
+    """
+    columns: dict[str, list] = {name: [] for name in DICTIONARY_COLUMNS + STRING_COLUMNS + LIST_COLUMNS}
+    for job in jobs:
+        for name in columns:
+            value = getattr(job, name)
+            columns[name].append(value.value if isinstance(value, JobType) else value)
+    rows = len(columns["job_title"])
+
+    writer = _Writer()
+    header = {"version": VERSION, "rows": rows, "columns": {}}
+
+    for name in DICTIONARY_COLUMNS:
+        dictionary: dict[str, int] = {}
+        codes = array('I', (dictionary.setdefault(value, len(dictionary)) for value in columns[name]))
+        header["columns"][name] = {"kind": "dictionary", "codes": writer.section(codes),
+                                   "dictionary": writer.strings(list(dictionary))}
+    for name in STRING_COLUMNS:
+        header["columns"][name] = {"kind": "string", **writer.strings(columns[name])}
+    for name in LIST_COLUMNS:
+        offsets = array('Q', [0])
+        items = []
+        for values in columns[name]:
+            items.extend(values)
+            offsets.append(len(items))
+        header["columns"][name] = {"kind": "list", "offsets": writer.section(offsets), "items": writer.strings(items)}
+    for name, source in DAY_COLUMNS.items():
+        days = array('i', (to_day(value) for value in columns[source]))
+        header["columns"][name] = {"kind": "day", "values": writer.section(days)}
+
+    encoded = json.dumps(header).encode('utf-8')
+    encoded += b" " * (-(len(MAGIC) + 8 + len(encoded)) % 8)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        for chunk in writer.chunks:
+            f.write(chunk)
+    tmp_path.replace(path)
+    return rows
+
+
+class StringColumn:
+    def __init__(self, offsets: memoryview, data: memoryview) -> None:
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+
+
+class DictionaryColumn:
+    def __init__(self, codes: memoryview, dictionary: StringColumn) -> None:
+        self.codes = codes
+        self.values = [dictionary[code] for code in range(len(dictionary))]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    def code(self, value: str) -> int | None:
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return None
+
+
+class ListColumn:
+    def __init__(self, offsets: memoryview, items: StringColumn) -> None:
+        self.offsets = offsets
+        self.items = items
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> list[str]:
+        return [self.items[item] for item in range(self.offsets[row], self.offsets[row + 1])]
+
+
+class Snapshot:
+    """
+    Memory-mapped, read-only view of a snapshot written by :func:`write_snapshot`.
+
+    Nothing is decoded up front: ``snapshot[i]`` materializes one :class:`Job`,
+    and the scans (:meth:`with_job_type`, :meth:`with_company`,
+    :meth:`deadline_between`) read the encoded columns directly, returning row
+    numbers without building per-row objects.
+    """
+
+    PATH = Path(__file__).parent.parent / 'results' / 'jobs.snapshot'
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path) if path is not None else self.PATH
+        self.file: BinaryIO = open(self.path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.map)
+        self._views: list[memoryview] = []
+
+        if bytes(self.buffer[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a job snapshot")
+        header_size = int.from_bytes(self.buffer[len(MAGIC):len(MAGIC) + 8], 'little')
+        body = len(MAGIC) + 8 + header_size
+        header = json.loads(bytes(self.buffer[len(MAGIC) + 8:body]))
+        if header["version"] != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported snapshot version {header['version']}")
+        if sys.byteorder != 'little':
+            self.close()
+            raise ValueError("Snapshots can only be memory-mapped on little-endian machines")
+
+        self.rows = header["rows"]
+        self.body = body
+        self.columns = {name: self._column(spec) for name, spec in header["columns"].items()}
+
+    def _section(self, location: list[int], typecode: str) -> memoryview:
+        offset, size = location
+        view = self.buffer[self.body + offset:self.body + offset + size]
+        if typecode != 'B':
+            view = view.cast(typecode)
+        self._views.append(view)
+        return view
+
+    def _strings(self, spec: dict) -> StringColumn:
+        return StringColumn(self._section(spec["offsets"], 'Q'), self._section(spec["data"], 'B'))
+
+    def _column(self, spec: dict):
+        kind = spec["kind"]
+        if kind == "dictionary":
+            return DictionaryColumn(self._section(spec["codes"], 'I'), self._strings(spec["dictionary"]))
+        if kind == "string":
+            return self._strings(spec)
+        if kind == "list":
+            return ListColumn(self._section(spec["offsets"], 'Q'), self._strings(spec["items"]))
+        if kind == "day":
+            return self._section(spec["values"], 'i')
+        raise ValueError(f"Unknown column kind {kind}")
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, row: int) -> Job:
+        if not -self.rows <= row < self.rows:
+            raise IndexError("snapshot row out of range")
+        row %= self.rows
+        fields = {name: self.columns[name][row] for name in DICTIONARY_COLUMNS + STRING_COLUMNS + LIST_COLUMNS}
+        fields["job_type"] = JobType(fields["job_type"])
+        # Rows were validated when they were stored
+        return Job.model_construct(**fields)
+
+    def jobs(self, rows: Iterable[int]) -> Iterator[Job]:
+        """Materialize the jobs of the given rows only."""
+        return (self[row] for row in rows)
+
+    def column(self, name: str):
+        return self.columns[name]
+
+    def _matching(self, column: DictionaryColumn, value: str) -> list[int]:
+        code = column.code(value)
+        if code is None:
+            return []
+        return [row for row, row_code in enumerate(column.codes) if row_code == code]
+
+    def with_job_type(self, job_type: JobType) -> list[int]:
+        return self._matching(self.columns["job_type"], job_type.value)
+
+    def with_company(self, company: str) -> list[int]:
+        return self._matching(self.columns["company_name"], company)
+
+    def deadline_between(self, start: str | None = None, end: str | None = None) -> list[int]:
+        """Rows whose parsed deadline falls within ``[start, end]`` (ISO dates, either may be open)."""
+        low = (date.fromisoformat(start) - EPOCH).days if start else NO_DAY + 1
+        high = (date.fromisoformat(end) - EPOCH).days if end else 2 ** 31 - 1
+        return [row for row, day in enumerate(self.columns["deadline_day"]) if low <= day <= high]
+
+    def close(self) -> None:
+        # Exported views must be released before the map can be closed
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self.buffer.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
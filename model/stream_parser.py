@@ -0,0 +1,85 @@
+import json
+import re
+from typing import Iterator
+
+# What can change the nesting outside a string, and what can end a string inside one
+STRUCTURE = re.compile(r'[\[\]{}"]')
+STRING_END = re.compile(r'["\\]')
+
+
+class JobStreamParser:
+    """
+    Incremental parser of a streamed job list response.
+
+    Accepts the response text in arbitrary chunks and yields every job object
+    as a dictionary as soon as its closing brace arrives. Jobs are the objects
+    directly inside the top-level array, or inside an array of the top-level
+    object (``{"jobs": [...]}``). Text is scanned once; only a job's own text
+    is decoded, and consumed text is dropped from the buffer.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.position = 0
+        # Open containers, as '[' and '{'
+        self.stack: list[str] = []
+        self.in_string = False
+        self.job_start: int | None = None
+        self.jobs = 0
+
+    def _is_job_level(self) -> bool:
+        """Whether an object opening now is a job."""
+        if not self.stack or self.stack[-1] != '[':
+            return False
+        return len(self.stack) == 1 or (len(self.stack) == 2 and self.stack[0] == '{')
+
+    def feed(self, chunk: str) -> Iterator[dict]:
+        """Add a chunk of the response and yield the jobs it completes."""
+        self.buffer += chunk
+        buffer = self.buffer
+
+        while self.position < len(buffer):
+            if self.in_string:
+                match = STRING_END.search(buffer, self.position)
+                if match is None:
+                    self.position = len(buffer)
+                    break
+                if match.group() == '\\':
+                    if match.end() >= len(buffer):
+                        # The escaped character has not arrived yet
+                        self.position = match.start()
+                        break
+                    self.position = match.end() + 1
+                    continue
+                self.in_string = False
+                self.position = match.end()
+                continue
+
+            match = STRUCTURE.search(buffer, self.position)
+            if match is None:
+                self.position = len(buffer)
+                break
+            char = match.group()
+            self.position = match.end()
+
+            if char == '"':
+                self.in_string = True
+            elif char in '[{':
+                if char == '{' and self._is_job_level():
+                    self.job_start = match.start()
+                self.stack.append(char)
+            elif self.stack:
+                self.stack.pop()
+                if char == '}' and self.job_start is not None and self._is_job_level():
+                    text = buffer[self.job_start:self.position]
+                    self.job_start = None
+                    self.jobs += 1
+                    yield json.loads(text)
+
+        # Keep only what an unfinished job still needs
+        keep = self.job_start if self.job_start is not None else self.position
+        if keep:
+            self.buffer = buffer[keep:]
+            self.position -= keep
+            if self.job_start is not None:
+                self.job_start = 0
@@ -0,0 +1,117 @@
+import sqlite3
+from pathlib import Path
+from typing import Iterable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+LOCALE_PREFIXES = {"da", "en", "fr", "de", "sv", "nb", "fi"}
+
+
+def normalize_uri(uri: str, keep_query: bool = False, keep_locale: bool = False) -> str:
+    """
+    Normalize a job posting URI so the same posting always maps to the same key.
+
+    Lower-cases scheme and host, drops fragments, trailing slashes and a leading
+    locale segment (``/da/``, ``/en/``...) unless ``keep_locale`` is set. Query
+    strings are dropped unless ``keep_query`` is set, in which case parameters
+    are sorted.
+    """
+    parts = urlsplit(uri.strip())
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if not keep_locale and segments and segments[0].lower() in LOCALE_PREFIXES:
+        segments = segments[1:]
+    path = '/' + '/'.join(segments)
+
+    query = ""
+    if keep_query:
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+class AnalyzedUriStore:
+    """SQLite-backed memory of job posting URIs that were already analyzed."""
+
+    BASE = Path(__file__).parent.parent / '.data' / 'memory'
+    DATABASE = BASE / 'analyzed_uris.db'
+    LEGACY_FILE = BASE / 'analyzed_uris.txt'
+
+    def __init__(self, path: Path | None = None, legacy_file: Path | None = None) -> None:
+        self.path = Path(path) if path is not None else self.DATABASE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS analyzed_uris ("
+            "uri TEXT PRIMARY KEY, "
+            "original TEXT NOT NULL, "
+            "added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP"
+            ") WITHOUT ROWID"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)")
+        self.connection.commit()
+
+        self._migrate_legacy_file(Path(legacy_file) if legacy_file is not None else self.LEGACY_FILE)
+
+    def _migrate_legacy_file(self, legacy_file: Path) -> None:
+        """Import the old one-URI-per-line text memory, once."""
+        done = self.connection.execute(
+            "SELECT 1 FROM migrations WHERE name = 'analyzed_uris.txt'"
+        ).fetchone()
+        if done:
+            return
+
+        if legacy_file.exists():
+            with open(legacy_file, 'r') as f:
+                self.add_many(line.strip() for line in f if line.strip())
+
+        self.connection.execute("INSERT INTO migrations (name) VALUES ('analyzed_uris.txt')")
+        self.connection.commit()
+
+    def __contains__(self, uri: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM analyzed_uris WHERE uri = ?", (normalize_uri(uri),)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM analyzed_uris").fetchone()[0]
+
+    def contains_many(self, uris: Iterable[str]) -> set[str]:
+        """Return the subset of ``uris`` (as given) that were already analyzed."""
+        by_key: dict[str, list[str]] = {}
+        for uri in uris:
+            by_key.setdefault(normalize_uri(uri), []).append(uri)
+
+        found = set()
+        keys = list(by_key)
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT uri FROM analyzed_uris WHERE uri IN ({placeholders})", chunk
+            )
+            for (key,) in rows:
+                found.update(by_key[key])
+        return found
+
+    def add(self, uri: str) -> None:
+        self.add_many([uri])
+
+    def add_many(self, uris: Iterable[str]) -> None:
+        """Record analyzed URIs in a single transaction."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO analyzed_uris (uri, original) VALUES (?, ?)",
+                ((normalize_uri(uri), uri) for uri in uris)
+            )
+
+    def remove_many(self, uris: Iterable[str]) -> None:
+        """Forget URIs, so the next run analyzes them again."""
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM analyzed_uris WHERE uri = ?", ((normalize_uri(uri),) for uri in uris)
+            )
+
+    def close(self) -> None:
+        self.connection.close()
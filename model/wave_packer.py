@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from .batch_request import Message
+from .Job import Job
+from .job_posting import DTUJobPosting
+from .uri_memory import normalize_uri
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough characters-per-token ratio for mixed Danish/English text without tiktoken
+CHARS_PER_TOKEN = 3.5
+
+# Chat formatting overhead added by the API around every message
+TOKENS_PER_MESSAGE = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate from length."""
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def estimate_message_tokens(message: Message, model: str = "gpt-4o") -> int:
+    return estimate_tokens(message.content, model) + TOKENS_PER_MESSAGE
+
+
+@dataclass
+class ModelBudget:
+    """Per-wave token budgets for one model."""
+    input_tokens: int
+    output_tokens: int
+    # Hard completion limit sent as max_tokens; kept above output_tokens as headroom
+    max_tokens: int
+    # Expected size of one structured Job in the response
+    output_tokens_per_posting: int = 600
+
+    def within(self, tokens_per_minute: int) -> 'ModelBudget':
+        """
+        Scale the budgets down so one full wave (its input plus ``max_tokens``,
+        which is what the API charges against the limit) fits in a minute's tokens.
+        """
+        if self.input_tokens + self.max_tokens <= tokens_per_minute:
+            return self
+        scale = tokens_per_minute / (self.input_tokens + self.max_tokens)
+        budget = ModelBudget(
+            input_tokens=int(self.input_tokens * scale),
+            output_tokens=int(self.output_tokens * scale),
+            max_tokens=int(self.max_tokens * scale),
+            output_tokens_per_posting=self.output_tokens_per_posting
+        )
+        if budget.output_tokens < budget.output_tokens_per_posting:
+            raise ValueError(f"{tokens_per_minute} tokens per minute is too little for a wave of one posting")
+        return budget
+
+
+BUDGETS = {
+    "gpt-4o": ModelBudget(input_tokens=60_000, output_tokens=12_000, max_tokens=16_000),
+    "gpt-4o-mini": ModelBudget(input_tokens=60_000, output_tokens=12_000, max_tokens=16_000),
+    "deepseek-chat": ModelBudget(input_tokens=40_000, output_tokens=6_000, max_tokens=8_000),
+}
+
+
+@dataclass
+class Wave:
+    postings: list[DTUJobPosting] = field(default_factory=list)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # The model answering the wave, set by the dispatcher once it is sent
+    model: str | None = None
+
+    @property
+    def uris(self) -> list[str]:
+        return [posting.uri for posting in self.postings]
+
+    @property
+    def tokens_saved(self) -> int:
+        """Description tokens taken out of the wave's postings by compaction."""
+        return sum(posting.tokens_saved for posting in self.postings)
+
+    @property
+    def messages(self) -> list[Message]:
+        return [posting.to_message() for posting in self.postings]
+
+    def match(self, job: Job, answered: set[int]) -> DTUJobPosting | None:
+        """
+        Return the posting with a streamed job's apply URI and mark it in
+        ``answered``. A job matching no unanswered posting returns None and
+        marks nothing: guessing by position could credit the wrong posting,
+        while leaving it unanswered only sends it again.
+        """
+        uri = normalize_uri(job.apply_uri)
+        for index, posting in enumerate(self.postings):
+            if index not in answered and normalize_uri(posting.uri) == uri:
+                answered.add(index)
+                return posting
+        return None
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+
+class WavePacker:
+    """
+    Group postings into prompt waves that fit a model's token budgets.
+
+    Each posting's input is counted (or estimated) from its message and its
+    output is estimated from that. A posting that exceeds the budgets on its
+    own gets a wave to itself.
+    """
+
+    def __init__(self, model: str = "gpt-4o", budget: ModelBudget | None = None, system_prompt: str = "") -> None:
+        if budget is None:
+            budget = BUDGETS.get(model, BUDGETS["gpt-4o"])
+
+        self.model = model
+        self.budget = budget
+        self.system_tokens = estimate_tokens(system_prompt, model) + TOKENS_PER_MESSAGE if system_prompt else 0
+
+    def output_estimate(self, input_tokens: int) -> int:
+        # Summaries are short, but long postings tend to list more requirements and skills
+        return self.budget.output_tokens_per_posting + input_tokens // 20
+
+    def measure(self, posting: DTUJobPosting) -> tuple[int, int]:
+        """Return the estimated input and output tokens of a posting."""
+        input_tokens = estimate_message_tokens(posting.to_message(), self.model)
+        return input_tokens, self.output_estimate(input_tokens)
+
+    def new_wave(self) -> Wave:
+        return Wave(input_tokens=self.system_tokens)
+
+    def fits(self, wave: Wave, input_tokens: int, output_tokens: int) -> bool:
+        return wave.input_tokens + input_tokens <= self.budget.input_tokens \
+            and wave.output_tokens + output_tokens <= self.budget.output_tokens
+
+    def add(self, wave: Wave, posting: DTUJobPosting, input_tokens: int, output_tokens: int) -> None:
+        wave.postings.append(posting)
+        wave.input_tokens += input_tokens
+        wave.output_tokens += output_tokens
+
+    def pack(self, postings: list[DTUJobPosting]) -> list[Wave]:
+        """Pack postings first-fit decreasing: largest postings first, each into the first wave it fits."""
+        sized = [(*self.measure(posting), posting) for posting in postings]
+        sized.sort(key=lambda item: item[0], reverse=True)
+
+        waves: list[Wave] = []
+        for input_tokens, output_tokens, posting in sized:
+            for wave in waves:
+                if self.fits(wave, input_tokens, output_tokens):
+                    break
+            else:
+                wave = self.new_wave()
+                waves.append(wave)
+
+            self.add(wave, posting, input_tokens, output_tokens)
+
+        return waves
+
+    def describe(self, wave: Wave) -> str:
+        """One-line packing report for a wave."""
+        input_fill = wave.input_tokens / self.budget.input_tokens
+        output_fill = wave.output_tokens / self.budget.output_tokens
+        description = (f"{len(wave)} postings, "
+                       f"~{wave.input_tokens}/{self.budget.input_tokens} input tokens ({input_fill:.0%}), "
+                       f"~{wave.output_tokens}/{self.budget.output_tokens} expected output tokens ({output_fill:.0%})")
+        if wave.tokens_saved:
+            description += f", ~{wave.tokens_saved} tokens saved by compaction"
+        return description
@@ -0,0 +1,46 @@
+#!.venv/bin/python
+
+import argparse
+import sys
+import time
+
+from model import JobStore, JobType, QueryError, parse_date
+
+
+def iso_date(value: str) -> str:
+    date = parse_date(value)
+    if date is None:
+        raise argparse.ArgumentTypeError(f"unrecognized date: {value}")
+    return date
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Search the analyzed jobs",
+        epilog="Example usage:\n"
+               "  python query.py 'python AND (kubernetes OR docker)' \n"
+               "  python query.py '\"machine learning\" NOT phd' --type SOFTWARE_DEVELOPMENT --deadline-after 2025-03-01 \n"
+               "  python query.py 'company:\"novo nordisk\" location:bagsværd' \n",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('query', type=str, nargs='+', help='Boolean query over skills, requirement terms, company: and location:')
+    parser.add_argument('--type', type=str, choices=[job_type.value for job_type in JobType], help='Only jobs of this type')
+    parser.add_argument('--deadline-after', type=iso_date, help='Only jobs with a deadline on or after this date')
+    parser.add_argument('--published-after', type=iso_date, help='Only jobs published on or after this date')
+    parser.add_argument('--limit', type=int, default=50, help='Maximum number of jobs printed (default: 50)')
+    parser.add_argument('--db', type=str, help='Job database (default: results/jobs.db)')
+    args = parser.parse_args()
+
+    store = JobStore(args.db)
+    start = time.perf_counter()
+    try:
+        jobs, total = store.search(" ".join(args.query), JobType(args.type) if args.type else None,
+                                   args.deadline_after, args.published_after, args.limit)
+    except QueryError as e:
+        parser.error(f"invalid query: {e}")
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for job in jobs:
+        print(f"{job.deadline or '-':<12} {job.job_type.value:<20} {job.company_name} | {job.job_title}\n"
+              f"{'':<12} {job.apply_uri}")
+    print(f"{total} of {len(store)} jobs matched in {elapsed:.1f} ms", file=sys.stderr)
@@ -1,11 +1,17 @@
-from requests import Response
-import cloudscraper
-from bs4 import BeautifulSoup
-import brotli
 from typing import List
 import argparse
-
-def fetch_page_html(page_number: int, url: str) -> str:
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from model.crawl_watermark import CrawlResult, CrawlWatermarks
+from model.http_cache import HttpCache
+from model.metrics import metrics
+from model.html_extract import BASE_URL, extract_last_page, extract_posting_cards, extract_posting_links
+from model.uri_memory import AnalyzedUriStore
+from model.session_pool import shared_pool
+
+def fetch_page_html(page_number: int, url: str, cache: HttpCache | None = None) -> str:
     # Headers
     headers = {
         'Host': 'dtu.jobteaser.com',
@@ -23,61 +29,149 @@ def fetch_page_html(page_number: int, url: str) -> str:
         'Te': 'trailers',
         'Cookie': ''
     }
+    # An empty Cookie header would hide the pooled session's cookie jar
+    if not headers['Cookie']:
+        del headers['Cookie']
     
     url = url +  f"&page={page_number}"
 
-    scraper = cloudscraper.create_scraper()
-    response = scraper.get(url, headers=headers)
+    with metrics.timed("fetch", source="search_page"):
+        response = shared_pool().get(url, cache=cache, headers=headers)
     response.raise_for_status()  # Raise an exception for bad status codes
 
     return response.text
 
-def fetch_dtu_job_offers(url: str) -> Response:
-    try:
-        # figure out number of pages
-        html = fetch_page_html(1, url)
-
-        last_page_num = 1
-
-        soup = BeautifulSoup(html, 'html.parser')
-        nav = soup.find('nav', class_=lambda x: x and x.startswith('Pagination_main__'))
-        if nav:
-            last_link = nav.find('a', class_=lambda x: x and 'Pagination_item___last__' in x)
-            if last_link:
-                last_page_text = last_link.get_text()
+def fetch_dtu_job_offers(url: str, out: str | None = None, max_workers: int = 4,
+                         cache: HttpCache | None = None) -> List[str]:
+    """
+    Crawl every search page of ``url`` and return the unique job posting URLs.
+
+    Page 1 is fetched once to find the number of pages; the remaining pages are
+    fetched concurrently by up to ``max_workers`` threads. When ``out`` is given,
+    new URLs are appended to it as soon as each page completes, so pages that
+    finished before a crash are kept.
+    """
+    urls = []
+    seen = set()
+    # Posting links are relative to the site that was searched
+    base_url = "{0.scheme}://{0.netloc}".format(urlsplit(url))
+    out_file = open(out, 'w') if out else None
+
+    def collect(page_number: int, html: str) -> None:
+        new_urls = [link for link in fetch_job_posting_urls(html, base_url) if link not in seen]
+        seen.update(new_urls)
+        urls.extend(new_urls)
+        if out_file:
+            out_file.writelines(link + '\n' for link in new_urls)
+            out_file.flush()
+        print(f"Found {len(new_urls)} new job offers on page {page_number}")
+        print("Current size of urls list:", len(urls))
 
-                last_page_num = int(last_page_text) if last_page_text else 1
+    try:
+        html = fetch_page_html(1, url, cache)
+        last_page_num = extract_last_page(html)
         print(f"Total search pages are: {last_page_num}")
+        collect(1, html)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch_page_html, page_number, url, cache): page_number
+                for page_number in range(2, last_page_num + 1)
+            }
+            for future in as_completed(futures):
+                page_number = futures[future]
+                try:
+                    collect(page_number, future.result())
+                except Exception as e:
+                    print(f"Error fetching search page {page_number}: {e}")
 
-        urls = []
-        for page_number in range(1, last_page_num + 1):
-            html = fetch_page_html(page_number, url)
-            new_urls = fetch_job_posting_urls(html)
-            print(f"Found {len(new_urls)} job offers on page {page_number}")
-            urls.extend(new_urls)
-            print("Current size of urls list:", len(urls))
-
         return urls
     except Exception as e:
         print(f"Error fetching job offers: {e}")
-        return None
+        return urls
+    finally:
+        if out_file:
+            out_file.close()
+
+def crawl_incremental(url: str, watermarks: CrawlWatermarks, out: str | None = None, max_workers: int = 4,
+                      cache: HttpCache | None = None, full_every: float | None = None,
+                      full: bool = False) -> CrawlResult:
+    """
+    Crawl ``url`` only as far as it changed since the last crawl.
+
+    Search results list the newest postings first, so pages are fetched in
+    order and pagination stops at the first page whose postings are all known
+    and unchanged. A full crawl (``full``, the first crawl of a search, or one
+    older than ``full_every`` seconds) fetches every page concurrently like
+    :func:`fetch_dtu_job_offers` and also finds the postings no longer listed.
+    Only new and edited posting URLs are returned and written to ``out``.
+    """
+    full = full or watermarks.full_crawl_due(url, full_every)
+    result = CrawlResult(full=full)
+    started = time.time()
+    complete = True
+    base_url = "{0.scheme}://{0.netloc}".format(urlsplit(url))
+    out_file = open(out, 'w') if out else None
+
+    def collect(page_number: int, html: str) -> bool:
+        """Record a page and return whether it listed anything new or edited."""
+        cards = extract_posting_cards(html, base_url)
+        if cards is None:
+            print(f"No results <ul> element found on page {page_number}")
+            cards = []
+        new, edited = watermarks.observe(url, cards)
+        result.new.extend(new)
+        result.edited.extend(edited)
+        result.pages += 1
+        if out_file:
+            out_file.writelines(link + '\n' for link in new + edited)
+            out_file.flush()
+        print(f"Found {len(new)} new and {len(edited)} edited job offers on page {page_number}")
+        return bool(new or edited)
+
+    try:
+        html = fetch_page_html(1, url, cache)
+        last_page_num = extract_last_page(html)
+        print(f"Total search pages are: {last_page_num} ({'full' if full else 'incremental'} crawl)")
+        changed = collect(1, html)
+
+        if full:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(fetch_page_html, page_number, url, cache): page_number
+                    for page_number in range(2, last_page_num + 1)
+                }
+                for future in as_completed(futures):
+                    page_number = futures[future]
+                    try:
+                        collect(page_number, future.result())
+                    except Exception as e:
+                        # A page missing from a full crawl would make its postings look removed
+                        complete = False
+                        print(f"Error fetching search page {page_number}: {e}")
+        else:
+            page_number = 2
+            while changed and page_number <= last_page_num:
+                changed = collect(page_number, fetch_page_html(page_number, url, cache))
+                page_number += 1
+            if page_number <= last_page_num:
+                print(f"Stopped after page {page_number - 1} of {last_page_num}: the rest is known")
+    except Exception as e:
+        complete = False
+        print(f"Error fetching job offers: {e}")
+    finally:
+        if out_file:
+            out_file.close()
 
-def fetch_job_posting_urls(html: str) -> List[str]:
-    base_url = "https://dtu.jobteaser.com"
+    if complete:
+        result.removed = watermarks.finish(url, started, full)
+    return result
 
-    soup = BeautifulSoup(html, 'html.parser')
-    # Find ul element with class that starts with PageContent_results
-    results_ul = soup.find('ul', class_=lambda x: x and x.startswith('PageContent_results'))
-    if not results_ul:
+def fetch_job_posting_urls(html: str, base_url: str = BASE_URL) -> List[str]:
+    links = extract_posting_links(html, base_url)
+    if links is None:
         print("No results <ul> element found")
-
-    # Extract all href values from the results
-    links = []
-    if results_ul:
-        for a_tag in results_ul.find_all('a'):
-            href = a_tag.get('href')
-            if href:
-                links.append(base_url + href)
+        return []
 
     return links
 
@@ -85,13 +179,30 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Scrape job postings from DTU Career Hub')
     parser.add_argument('--url', help='Full URL of the search from DTU Career Hub', required=True)
     parser.add_argument('--out', help='Output file to store URLs', required=True)
+    parser.add_argument('--workers', type=int, default=4, help='Number of search pages fetched concurrently (default: 4)')
+    parser.add_argument('--cache-dir', help='Directory of the HTTP response cache (default: .data/cache/http)')
+    parser.add_argument('--no-cache', action='store_true', help='Always download search pages, bypassing the cache')
+    parser.add_argument('--incremental', action='store_true', help='Stop at the first page of known postings and write only new or edited ones')
+    parser.add_argument('--full-every', type=float, metavar='HOURS', help='With --incremental, crawl every page when the last full crawl is older than this')
+    parser.add_argument('--full', action='store_true', help='With --incremental, crawl every page now, finding removed postings')
     args = parser.parse_args()
 
-    urls = fetch_dtu_job_offers(args.url)
-
-    with open(args.out, 'w') as f:
-        for url in urls:
-            f.write(url + '\n')
-
-    print(f"Job URLs written to {args.out}")
-    
\ No newline at end of file
+    cache = None if args.no_cache else HttpCache(args.cache_dir)
+    if not args.incremental:
+        urls = fetch_dtu_job_offers(args.url, args.out, args.workers, cache)
+        print(f"{len(urls)} job URLs written to {args.out}")
+    else:
+        watermarks = CrawlWatermarks()
+        full_every = args.full_every * 3600 if args.full_every is not None else None
+        result = crawl_incremental(args.url, watermarks, args.out, args.workers, cache, full_every, args.full)
+        watermarks.close()
+
+        if result.edited:
+            # Edited postings were analyzed before; forget them so analyze.py looks at them again
+            store = AnalyzedUriStore()
+            store.remove_many(result.edited)
+            store.close()
+        for link in result.removed:
+            print(f"No longer listed: {link}")
+        print(f"{len(result.new)} new and {len(result.edited)} edited job URLs written to {args.out} "
+              f"after {result.pages} pages, {len(result.removed)} postings removed")
\ No newline at end of file
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from model.html_extract import BASE_URL, extract_job_blocks, extract_job_text, extract_last_page, extract_posting_links
+
+FIXTURES = Path(__file__).parent.parent / 'benchmarks' / 'fixtures'
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding='utf-8')
+
+
+def full_tree_job_text(html: str) -> str:
+    """The job description as the full-tree parse extracted it before the targeted extraction."""
+    soup = BeautifulSoup(html, 'html.parser')
+    main_content = soup.find('main', id='job-ad-detail-content')
+    if not main_content:
+        return ""
+    return " ".join(main_content.get_text(strip=True, separator=' ').split())
+
+
+def full_tree_posting_links(html: str) -> list[str] | None:
+    soup = BeautifulSoup(html, 'html.parser')
+    results_ul = soup.find('ul', class_=lambda x: x and x.startswith('PageContent_results'))
+    if not results_ul:
+        return None
+    return [BASE_URL + a_tag.get('href') for a_tag in results_ul.find_all('a') if a_tag.get('href')]
+
+
+def full_tree_last_page(html: str) -> int:
+    soup = BeautifulSoup(html, 'html.parser')
+    nav = soup.find('nav', class_=lambda x: x and x.startswith('Pagination_main__'))
+    if nav:
+        last_link = nav.find('a', class_=lambda x: x and 'Pagination_item___last__' in x)
+        if last_link:
+            last_page_text = last_link.get_text()
+            return int(last_page_text) if last_page_text else 1
+    return 1
+
+
+@pytest.mark.parametrize('name', ['job_posting.html', 'search_results.html'])
+def test_job_text_matches_full_tree(name):
+    html = fixture(name)
+    assert extract_job_text(html) == full_tree_job_text(html)
+
+
+@pytest.mark.parametrize('name', ['job_posting.html', 'search_results.html'])
+def test_job_blocks_join_to_full_tree_text(name):
+    # DTUJobPosting.parse_html keeps the blocks and sends them joined as the description
+    html = fixture(name)
+    assert " ".join(extract_job_blocks(html)) == full_tree_job_text(html)
+
+
+def test_job_blocks_are_split():
+    blocks = extract_job_blocks(fixture('job_posting.html'))
+    assert len(blocks) > 1
+    assert all(block and block == " ".join(block.split()) for block in blocks)
+
+
+def test_job_text_is_found():
+    assert extract_job_text(fixture('job_posting.html'))
+
+
+@pytest.mark.parametrize('name', ['job_posting.html', 'search_results.html'])
+def test_posting_links_match_full_tree(name):
+    html = fixture(name)
+    assert extract_posting_links(html) == full_tree_posting_links(html)
+
+
+def test_last_page_matches_full_tree():
+    html = fixture('search_results.html')
+    assert extract_last_page(html) == full_tree_last_page(html)
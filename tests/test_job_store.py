@@ -0,0 +1,53 @@
+from model.Job import Job
+from model.job_store import JobStore, job_key
+
+
+def make_job(**fields) -> Job:
+    job = {
+        "job_type": "SOFTWARE_DEVELOPMENT", "published": "03-02-2025", "deadline": "28-02-2025",
+        "start": "As soon as possible", "contract": "Student job", "language": "English",
+        "job_title": "Student Software Developer", "company_name": "Netcompany", "location": "Lyngby",
+        "description": "", "requirements": [], "key_skills": ["Python"], "contacts": "",
+        "cv_photo_details": "", "apply_uri": "https://www.dtu.dk/job/1",
+    }
+    job.update(fields)
+    return Job(**job)
+
+
+def test_job_key_uses_http_apply_uri():
+    assert job_key(make_job(apply_uri="https://www.dtu.dk/job/1?utm_source=x")) == job_key(make_job())
+
+
+def test_job_key_falls_back_to_hash_without_url():
+    for apply_uri in ("", "Not mentioned", "jobs@example.com", "www.example.com/apply"):
+        assert job_key(make_job(apply_uri=apply_uri)).startswith("sha1:")
+
+
+def test_jobs_without_apply_uri_do_not_overwrite_each_other(tmp_path):
+    store = JobStore(tmp_path / 'jobs.db', tmp_path / 'legacy')
+    store.upsert_many([
+        make_job(apply_uri="https://www.dtu.dk/job/1"),
+        make_job(apply_uri="https://www.dtu.dk/job/2"),
+        make_job(apply_uri="Not mentioned", job_title="Data Analyst", company_name="Novo Nordisk"),
+        make_job(apply_uri="Not mentioned", job_title="IT Supporter", company_name="Ørsted"),
+    ])
+    assert len(store) == 4
+    assert store.search("python")[1] == 4
+    store.close()
+
+
+def test_stored_jobs_are_rekeyed(tmp_path):
+    store = JobStore(tmp_path / 'jobs.db', tmp_path / 'legacy')
+    store.upsert(make_job(apply_uri="Not mentioned"))
+    # As stored before keys fell back to a hash for apply URIs that are no URL
+    with store.connection:
+        store.connection.execute("UPDATE jobs SET key = '/Not mentioned'")
+        store.connection.execute("UPDATE job_terms SET job = '/Not mentioned'")
+        store.connection.execute("DELETE FROM migrations WHERE name = 'job_keys'")
+    store.close()
+
+    store = JobStore(tmp_path / 'jobs.db', tmp_path / 'legacy')
+    key = job_key(make_job(apply_uri="Not mentioned"))
+    assert [row[0] for row in store.connection.execute("SELECT key FROM jobs")] == [key]
+    assert store.index.search("python") == {key}
+    store.close()
@@ -0,0 +1,28 @@
+from model.Job import Job, JobList
+from model.job_posting import DTUJobPosting
+from model.response_cache import ResponseCache
+
+
+def make_posting(uri: str, description: str) -> DTUJobPosting:
+    posting = DTUJobPosting(uri)
+    posting.job_description = description
+    return posting
+
+
+def make_job(apply_uri: str, job_title: str) -> Job:
+    return Job(job_type="OTHER", published="", deadline="", start="", contract="", language="English",
+               job_title=job_title, company_name="DTU", location="Lyngby", description="", requirements=[],
+               key_skills=[], contacts="", cv_photo_details="", apply_uri=apply_uri)
+
+
+def test_put_wave_matches_jobs_by_uri_only(tmp_path):
+    cache = ResponseCache(tmp_path / 'responses.db')
+    postings = [make_posting("https://www.dtu.dk/job/1", "First posting"),
+                make_posting("https://www.dtu.dk/job/2", "Second posting")]
+    # Same count as the postings, but the first job's URI was rewritten by the model
+    jobs = JobList(jobs=[make_job("Not mentioned", "First"), make_job("https://www.dtu.dk/job/2/", "Second")])
+
+    assert cache.put_wave("gpt-4o", postings, jobs) == 1
+    assert cache.get("gpt-4o", "First posting") is None
+    assert cache.get("gpt-4o", "Second posting").job_title == "Second"
+    cache.close()